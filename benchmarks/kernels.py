@@ -0,0 +1,202 @@
+"""Generator of synthetic SPICE kernels for the benchmarks, so that they run offline without the mission SPK files.
+The kernel set holds the LSK and PCK shipped with the tests, Keplerian heliocentric orbits of Venus and Mercury, MPO
+hyperbolic flybys alternating between both planets, optionally followed by a Mercury orbit, a frame kernel with the
+MPO name and a BC_MSM frame, and an MPO spacecraft clock kernel, which the computations do not use, as in the mission
+kernel sets.
+"""
+import os
+import os.path as path
+import shutil
+import numpy as np
+import spiceypy as spice
+
+
+_test_kernels = path.join(path.dirname(path.dirname(path.abspath(__file__))), 'tests', 'data', 'kernels')
+
+_gm_sun = 1.32712440018e11
+_au = 1.495978707e8
+
+# body, semi-major axis in AU, inclination in radians, GM, radius, flyby altitude, periapsis angle from the Sun
+# direction in degrees and hyperbolic excess velocity in km/s
+_planets = {'VENUS': (299, 0.723, 0.0, 324858.6, 6051.8, 552., 140., 5.0),
+            'MERCURY': (199, 0.387, 0.1, 22031.8, 2439.7, 200., 150., 2.0)}
+
+_frame_kernel = """KPL/FK
+\\begindata
+NAIF_BODY_NAME += ( 'MPO' )
+NAIF_BODY_CODE += ( -121 )
+FRAME_BC_MSM = -121911
+FRAME_-121911_NAME = 'BC_MSM'
+FRAME_-121911_CLASS = 5
+FRAME_-121911_CLASS_ID = -121911
+FRAME_-121911_CENTER = 199
+FRAME_-121911_RELATIVE = 'J2000'
+FRAME_-121911_DEF_STYLE = 'PARAMETERIZED'
+FRAME_-121911_FAMILY = 'TWO-VECTOR'
+FRAME_-121911_PRI_AXIS = 'X'
+FRAME_-121911_PRI_VECTOR_DEF = 'OBSERVER_TARGET_POSITION'
+FRAME_-121911_PRI_OBSERVER = 'MERCURY'
+FRAME_-121911_PRI_TARGET = 'SUN'
+FRAME_-121911_PRI_ABCORR = 'NONE'
+FRAME_-121911_SEC_AXIS = 'Y'
+FRAME_-121911_SEC_VECTOR_DEF = 'OBSERVER_TARGET_VELOCITY'
+FRAME_-121911_SEC_OBSERVER = 'MERCURY'
+FRAME_-121911_SEC_TARGET = 'SUN'
+FRAME_-121911_SEC_ABCORR = 'NONE'
+FRAME_-121911_SEC_FRAME = 'J2000'
+\\begintext
+"""
+
+_clock_kernel = """KPL/SCLK
+\\begindata
+SCLK_KERNEL_ID = ( @2021-01-01T00:00:00 )
+SCLK_DATA_TYPE_121 = ( 1 )
+SCLK01_TIME_SYSTEM_121 = ( 2 )
+SCLK01_N_FIELDS_121 = ( 2 )
+SCLK01_MODULI_121 = ( 4294967296 65536 )
+SCLK01_OFFSETS_121 = ( 0 0 )
+SCLK01_OUTPUT_DELIM_121 = ( 1 )
+SCLK_PARTITION_START_121 = ( 0.0 )
+SCLK_PARTITION_END_121 = ( 2.81474976710655E+14 )
+SCLK01_COEFFICIENTS_121 = ( 0.0 0.0 1.0 )
+\\begintext
+"""
+
+_metakernel = """KPL/MK
+\\begindata
+PATH_VALUES = ( '..' )
+PATH_SYMBOLS = ( 'KERNELS' )
+KERNELS_TO_LOAD = ( '$KERNELS/lsk/naif0012.tls'
+                    '$KERNELS/pck/pck00010.tpc'
+                    '$KERNELS/fk/synth.tf'
+                    '$KERNELS/sclk/synth.tsc'
+                    '$KERNELS/spk/planets.bsp'
+                    '$KERNELS/spk/mpo.bsp' )
+\\begintext
+"""
+
+
+def _propagate(gm, state, epoch, epochs):
+    return np.array([spice.prop2b(gm, state, et - epoch) for et in epochs])
+
+
+def _flyby_state(planet, tca):
+    """Returns the MPO state relative to the planet at the closest approach, with the periapsis at the flyby
+    altitude, rotated from the Sun direction within the planet orbital plane.
+    """
+    code, _, _, gm, radius, altitude, angle, vinf = _planets[planet]
+    sun = spice.spkezr('SUN', tca, 'J2000', 'NONE', str(code))[0][:3]
+    x = sun / np.linalg.norm(sun)
+    y = np.cross([0., 0., 1.], x)
+    y /= np.linalg.norm(y)
+    z = np.cross(x, y)
+
+    theta = np.radians(angle)
+    direction = np.cos(theta) * x + np.sin(theta) * y
+    motion = -np.sin(theta) * x + np.cos(theta) * y + 0.225 * z
+    motion = np.cross(np.cross(direction, motion), direction)
+    rp = radius + altitude
+    vp = np.sqrt(vinf ** 2 + 2 * gm / rp)
+    return np.hstack((rp * direction, vp * motion / np.linalg.norm(motion)))
+
+
+def flyby_schedule(flybys, start='2021-02-01T00:00:00', spacing=10):
+    """Returns the (body, closest approach UTC time) of the synthetic flybys, alternating Venus and Mercury every
+    `spacing` days.
+    """
+    schedule = []
+    for i in range(flybys):
+        body = 'VENUS' if i % 2 == 0 else 'MERCURY'
+        epoch = np.datetime64(start) + np.timedelta64(i * spacing, 'D') + np.timedelta64(13 * 3600 + 51 * 60, 's')
+        schedule.append((body, str(epoch)))
+    return schedule
+
+
+def _orbit_state(tca):
+    """Returns the MPO state relative to Mercury at a periapsis of a polar 480 x 1500 km orbit, with the periapsis
+    45 degrees north of the night side direction.
+    """
+    code, _, _, gm, radius, *_ = _planets['MERCURY']
+    sun = spice.spkezr('SUN', tca, 'J2000', 'NONE', str(code))[0][:3]
+    x = sun / np.linalg.norm(sun)
+    y = np.cross([0., 0., 1.], x)
+    z = np.cross(x, y / np.linalg.norm(y))
+    direction = (z - x) / np.sqrt(2)
+    rp, ra = radius + 480., radius + 1500.
+    vp = np.sqrt(gm * (2 / rp - 2 / (rp + ra)))
+    return np.hstack((rp * direction, vp * (z + x) / np.sqrt(2)))
+
+
+def orbit_start(flybys):
+    """Returns the UTC time of the first periapsis of the Mercury orbit following `flybys` synthetic flybys.
+    """
+    return flyby_schedule(flybys + 1)[-1][1]
+
+
+def generate(directory, flybys=2, half_span=3 * 86400., orbit=0.):
+    """Writes a synthetic kernel set.
+    Params:
+        directory: output directory, which gets lsk, pck, fk, sclk, spk and mk subdirectories
+        flybys: number of MPO flybys, alternating Venus and Mercury every ten days from February 2021
+        half_span: time in seconds covered by the MPO trajectory before and after every closest approach
+        orbit: time in seconds covered by a MPO orbit around Mercury starting ten days after the last flyby, with a
+            period of about 8500 seconds
+    Returns:
+        The path to the metakernel of the kernel set.
+    """
+    if not 1 <= flybys <= 66:
+        raise ValueError("Unsupported number of flybys {}".format(flybys))
+    for kind in ('lsk', 'pck', 'fk', 'sclk', 'spk', 'mk'):
+        os.makedirs(path.join(directory, kind), exist_ok=True)
+    shutil.copy(path.join(_test_kernels, 'lsk', 'naif0012.tls'), path.join(directory, 'lsk'))
+    shutil.copy(path.join(_test_kernels, 'pck', 'pck00010.tpc'), path.join(directory, 'pck'))
+    with open(path.join(directory, 'fk', 'synth.tf'), 'w') as fk:
+        fk.write(_frame_kernel)
+    with open(path.join(directory, 'sclk', 'synth.tsc'), 'w') as sclk:
+        sclk.write(_clock_kernel)
+
+    # only the kernels loaded here are unloaded afterwards, leaving those of the open Spice sessions
+    loaded = [path.join(directory, 'lsk', 'naif0012.tls')]
+    spice.furnsh(loaded[0])
+    planets = path.join(directory, 'spk', 'planets.bsp')
+    mpo = path.join(directory, 'spk', 'mpo.bsp')
+    try:
+        for spk in (planets, mpo):
+            if path.exists(spk):
+                os.remove(spk)
+
+        # heliocentric circular orbits sampled daily
+        epochs = np.arange(spice.utc2et('2021-01-01T00:00:00'), spice.utc2et('2023-01-01T00:00:00'), 86400.)
+        handle = spice.spkopn(planets, 'planets', 0)
+        for code, a, inclination, *_ in _planets.values():
+            v = np.sqrt(_gm_sun / (a * _au))
+            state = np.array([a * _au, 0., 0., 0., v * np.cos(inclination), v * np.sin(inclination)])
+            spice.spkw05(handle, code, 10, 'J2000', epochs[0], epochs[-1], 'planet', _gm_sun, len(epochs),
+                         _propagate(_gm_sun, state, epochs[0], epochs), epochs)
+        spice.spkcls(handle)
+        spice.furnsh(planets)
+        loaded.append(planets)
+
+        # planetocentric hyperbolic flybys sampled every 10 minutes
+        handle = spice.spkopn(mpo, 'mpo', 0)
+        for body, utc in flyby_schedule(flybys):
+            code, gm = _planets[body][0], _planets[body][3]
+            tca = spice.utc2et(utc)
+            epochs = tca + np.arange(-half_span, half_span + 1, 600.)
+            spice.spkw05(handle, -121, code, 'J2000', epochs[0], epochs[-1], 'mpo', gm, len(epochs),
+                         _propagate(gm, _flyby_state(body, tca), tca, epochs), epochs)
+        if orbit > 0:
+            code, gm = _planets['MERCURY'][0], _planets['MERCURY'][3]
+            start = spice.utc2et(orbit_start(flybys))
+            epochs = start + np.arange(0., orbit + 1, 600.)
+            spice.spkw05(handle, -121, code, 'J2000', epochs[0], epochs[-1], 'mpo', gm, len(epochs),
+                         _propagate(gm, _orbit_state(start), start, epochs), epochs)
+        spice.spkcls(handle)
+    finally:
+        for kernel in loaded:
+            spice.unload(kernel)
+
+    metakernel = path.join(directory, 'mk', 'synth.tm')
+    with open(metakernel, 'w') as mk:
+        mk.write(_metakernel)
+    return metakernel
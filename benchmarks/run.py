@@ -0,0 +1,173 @@
+"""Benchmarks of the stages of the crossing pipeline on synthetic kernels.
+Every stage is timed for several sizes, either numbers of samples or of flybys, keeping the best of a few repeats,
+and the results are written as JSON so that runs of different commits can be compared, e.g.:
+    python -m benchmarks.run --output before.json
+    python -m benchmarks.run --output after.json --compare before.json
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import numpy as np
+import spiceypy
+from flybys.spice import Spice
+from flybys.quaternion import Quaternion
+from flybys.helper import find_switch
+from flybys.boundaries import BoundarySet, models
+from flybys import venus, mercury
+from benchmarks.kernels import generate, flyby_schedule
+
+
+def _best(function, repeat):
+    """Returns the best wall time in seconds of several calls of a function.
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def _commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# modules whose import time is measured, in fresh interpreters
+import_modules = ('flybys', 'flybys.quaternion', 'flybys.boundaries', 'flybys.venus')
+
+
+def import_time(module):
+    """Returns the wall time in seconds of the import of a module in a fresh interpreter.
+    """
+    code = 'import time; start = time.perf_counter(); import {}; print(time.perf_counter() - start)'.format(module)
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    return float(subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True,
+                                cwd=root).stdout)
+
+
+def _window(utc, days=2):
+    center = np.datetime64(utc)
+    return str(center - np.timedelta64(days, 'D')), str(center + np.timedelta64(days, 'D'))
+
+
+def run(samples=(1000, 10000, 100000), flybys=(1, 2, 4), repeat=3, directory=None):
+    """Runs the benchmarks.
+    Params:
+        samples: numbers of samples of the sampling and vectorized stages
+        flybys: numbers of flybys of the kernel set for the closest approach and crossing stages
+        repeat: number of repeats of every measurement, the best one being kept
+        directory: directory of the synthetic kernels, a temporary one by default
+    Returns:
+        List of {'stage', 'size', 'seconds'} results.
+    """
+    directory = directory or tempfile.mkdtemp(prefix='flybys-benchmarks-')
+    results = []
+
+    def record(stage, size, function):
+        seconds = _best(function, repeat)
+        results.append({'stage': stage, 'size': int(size), 'seconds': seconds})
+        print('{:<32} {:>8} {:>12.6f} s'.format(stage, size, seconds))
+
+    for module in import_modules:
+        seconds = min(import_time(module) for _ in range(repeat))
+        results.append({'stage': 'import_' + module, 'size': 1, 'seconds': seconds})
+        print('{:<32} {:>8} {:>12.6f} s'.format('import_' + module, 1, seconds))
+
+    metakernel = generate(directory, max(flybys))
+    cache, Spice.ephemeris_cache = Spice.ephemeris_cache, None  # time SPICE itself, not the cache
+    record('load_metakernel', max(flybys), lambda: Spice.unload(Spice.load_metakernel(metakernel)))
+
+    with Spice.session(metakernel) as spice:
+        body, utc = flyby_schedule(1)[0]
+        etc = spice.utc2et(utc)
+        radius = spice.body_radius(body)
+        for n in samples:
+            et = etc + np.linspace(-7200., 7200., n)
+            record('position', n, lambda: spice.position('MPO', et, 'J2000', body))
+            record('state', n, lambda: spice.state('MPO', et, 'J2000', body))
+
+            vv = spice.position('MPO', et, 'J2000', body)
+            q = Quaternion(axis=np.array([0., 0., 1.]), degrees=-5)
+            record('quaternion_rotate', n, lambda: q.rotate(vv))
+
+            bowshock = BoundarySet('VENUS', [('bowshock', m) for m in models('VENUS', 'bowshock')])
+            record('inside_bowshock', n, lambda: bowshock.inside(vv / radius))
+            magnetopause = BoundarySet('MERCURY', [('magnetopause', 'korth')])
+            record('inside_magnetopause', n, lambda: magnetopause.inside(vv / radius))
+
+            condition = np.linalg.norm(vv, axis=1) < np.median(np.linalg.norm(vv, axis=1))
+            record('find_switch', n, lambda: find_switch(condition))
+
+            record('et2utc_cspice', n, lambda: spice.et2utc(et, 3))
+            leapseconds = spice.leapseconds()
+            record('et2utc_leapseconds', n, lambda: leapseconds.et2utc(et, 3))
+
+    Spice.evict()
+    for m in flybys:
+        schedule = flyby_schedule(m)
+
+        def closest_approaches(step=None):
+            Spice.distance_indexes.clear()
+            with Spice.session(metakernel) as spice:
+                for body, utc in schedule:
+                    spice.closest_approach('MPO', body, *_window(utc), False, step)
+
+        record('closest_approach_index', m, closest_approaches)
+        record('closest_approach_gfdist', m, lambda: closest_approaches(100))
+
+        def crossings(method):
+            for body, utc in schedule:
+                function = venus.venus_crossings if body == 'VENUS' else mercury.mercury_crossings
+                function(metakernel, *_window(utc), method=method)
+
+        record('crossings_grid', m, lambda: crossings('grid'))
+        record('crossings_adaptive', m, lambda: crossings('adaptive'))
+    Spice.evict()
+    Spice.ephemeris_cache = cache
+    return results
+
+
+def compare(results, baseline):
+    """Prints the ratio of the times of every stage and size to those of a baseline run.
+    """
+    base = {(r['stage'], r['size']): r['seconds'] for r in baseline['results']}
+    print('{:<32} {:>8} {:>12} {:>12} {:>8}'.format('stage', 'size', 'baseline', 'current', 'ratio'))
+    for r in results:
+        key = (r['stage'], r['size'])
+        if key in base:
+            print('{:<32} {:>8} {:>12.6f} {:>12.6f} {:>8.2f}'.format(r['stage'], r['size'], base[key], r['seconds'],
+                                                                     r['seconds'] / base[key]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmarks of the flybys crossing pipeline')
+    parser.add_argument('--samples', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--flybys', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--kernels', help='directory of the synthetic kernels, a temporary one by default')
+    parser.add_argument('--output', help='JSON file where the results are written')
+    parser.add_argument('--compare', help='JSON file of a baseline run to compare with')
+    args = parser.parse_args()
+
+    results = run(args.samples, args.flybys, args.repeat, args.kernels)
+    report = {'commit': _commit(), 'python': platform.python_version(), 'numpy': np.__version__,
+              'spiceypy': spiceypy.__version__, 'cspice': spiceypy.tkvrsn('TOOLKIT'), 'results': results}
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(report, output, indent=2)
+    if args.compare:
+        with open(args.compare) as baseline:
+            compare(results, json.load(baseline))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,2 +1,35 @@
-from flybys.venus import *
-from flybys.mercury import *
+"""Magnetopause and bowshock crossings of BepiColombo flybys to Venus and Mercury.
+The crossing functions and the submodules are imported on first access, so that importing the package, or a
+submodule such as flybys.quaternion, does not load SPICE until it is needed.
+"""
+import importlib
+
+
+# public functions, by submodule
+_functions = {'venus': ['venus_closest_approach', 'venus_crossings', 'venus_bowshock_crossings',
+                        'venus_crossing_events'],
+              'mercury': ['mercury_closest_approach', 'mercury_crossings', 'mercury_crossing_events',
+                          'mercury_bowshock_crossings', 'mercury_magnetopause_crossings']}
+
+_submodules = ['approach', 'batch', 'boundaries', 'cli', 'coverage', 'dependencies', 'ephemeris', 'events',
+               'executor', 'helper', 'leapseconds', 'mercury', 'profiling', 'quaternion', 'solarwind', 'spice',
+               'trajectory', 'venus']
+
+_modules = {name: module for module, names in _functions.items() for name in names}
+
+__all__ = [name for names in _functions.values() for name in names]
+
+
+def __getattr__(name):
+    module = _modules.get(name)
+    if module is not None:
+        value = getattr(importlib.import_module('flybys.' + module), name)
+        globals()[name] = value
+        return value
+    if name in _submodules:
+        return importlib.import_module('flybys.' + name)
+    raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__) | set(_submodules))
@@ -0,0 +1,112 @@
+import numpy as np
+
+
+class DistanceIndex:
+    """Coarse index of the distance between a target and an observer, used to find closest approach candidates
+    without scanning long time periods with a fixed small step.
+    The distance is sampled with a step adapted to the local orbital motion, a fraction of the time r / v the target
+    takes to travel its own distance to the observer, which is proportional to the orbital period for bound orbits.
+    The distance cannot change by more than about that fraction between consecutive samples, so every local minimum
+    of the distance falls between the neighbours of a local minimum of the samples. Samples are kept for the time
+    periods already indexed, so overlapping queries only sample the parts not indexed yet.
+    Attributes:
+        target: name of the target body
+        observer: name of the observing body
+        fraction: fraction of r / v taken as step
+        min_step: minimum step size in seconds
+        max_step: maximum step size in seconds
+        et: array of ephemeris times of the samples
+        distance: array of distances of the samples in km
+        covered: list of the (start, end) ephemeris times of the time periods indexed
+    """
+
+    def __init__(self, target, observer, fraction=0.05, min_step=1., max_step=86400.):
+        self.target = target
+        self.observer = observer
+        self.fraction = fraction
+        self.min_step = min_step
+        self.max_step = max_step
+        self.et = np.zeros(0)
+        self.distance = np.zeros(0)
+        self.covered = []
+
+    def _steps(self, spice, et):
+        """Returns the distances and the step sizes adapted to the local orbital motion at the times given.
+        """
+        position, velocity = spice.state(self.target, et, 'J2000', self.observer)
+        position, velocity = np.reshape(position, (-1, 3)), np.reshape(velocity, (-1, 3))
+        distance = np.linalg.norm(position, axis=1)
+        speed = np.maximum(np.linalg.norm(velocity, axis=1), 1e-12)
+        return distance, np.clip(self.fraction * distance / speed, self.min_step, self.max_step)
+
+    def _sample(self, spice, et_start, et_end):
+        """Samples the distance over a time period, refining every interval longer than the step of its ends.
+        """
+        et = np.append(np.arange(et_start, et_end, self.max_step), et_end)
+        distance, step = self._steps(spice, et)
+        while True:
+            pieces = np.ceil(np.diff(et) / np.minimum(step[:-1], step[1:])).astype(int)
+            split, = np.nonzero(pieces > 1)
+            if len(split) == 0:
+                return et, distance
+
+            # evenly spaced times within every interval to split
+            counts = pieces[split] - 1
+            interval = np.repeat(split, counts)
+            offset = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts) + 1
+            new_et = et[interval] + offset * (et[interval + 1] - et[interval]) / pieces[interval]
+            new_distance, new_step = self._steps(spice, new_et)
+
+            order = np.argsort(np.concatenate((et, new_et)), kind='stable')
+            et = np.concatenate((et, new_et))[order]
+            distance = np.concatenate((distance, new_distance))[order]
+            step = np.concatenate((step, new_step))[order]
+
+    def update(self, spice, et_start, et_end):
+        """Indexes the parts of a time period not indexed yet.
+        """
+        missing = [(et_start, et_end)]
+        for start, end in self.covered:
+            missing = [piece for a, b in missing
+                       for piece in ((a, min(b, start)), (max(a, end), b)) if piece[1] > piece[0]]
+        for a, b in missing:
+            et, distance = self._sample(spice, a, b)
+            self.et = np.concatenate((self.et, et))
+            self.distance = np.concatenate((self.distance, distance))
+            self.covered.append((a, b))
+
+        if missing:
+            self.et, unique = np.unique(self.et, return_index=True)
+            self.distance = self.distance[unique]
+            self.covered = _merge(self.covered)
+
+    def candidates(self, spice, et_start, et_end):
+        """Returns the brackets of the local minima of the distance within a time period, indexing it if needed.
+        Params:
+            spice: the Spice object
+            et_start: start ephemeris time of the time period
+            et_end: end ephemeris time of the time period
+        Returns:
+            Array of shape (n, 2) with the start and end ephemeris times of every bracket, each one holding a local
+            minimum of the distance within the time period.
+        """
+        self.update(spice, et_start, et_end)
+        inside = (self.et > et_start) & (self.et < et_end)
+        et = np.concatenate(([et_start], self.et[inside], [et_end]))
+        distance = np.concatenate((self._steps(spice, et_start)[0], self.distance[inside],
+                                   self._steps(spice, et_end)[0]))
+
+        minimum, = np.nonzero((distance[1:-1] < distance[:-2]) & (distance[1:-1] <= distance[2:]))
+        return np.column_stack((et[minimum], et[minimum + 2]))
+
+
+def _merge(intervals):
+    """Merges overlapping or contiguous (start, end) intervals.
+    """
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
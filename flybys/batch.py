@@ -0,0 +1,139 @@
+import os
+import numpy as np
+from flybys.spice import Spice
+from flybys.executor import SpiceExecutor
+from flybys.events import CrossingEvents, EventsWriter
+from flybys.venus import venus_crossings
+from flybys.mercury import mercury_crossings
+from flybys import boundaries
+
+
+# crossing function of every body, taking the models of each boundary as keyword arguments
+crossing_functions = {'VENUS': venus_crossings,
+                       'MERCURY': mercury_crossings}
+
+
+def flyby_windows(approaches, et_start, et_end):
+    """Splits a time period in one window per closest approach, bounded halfway between consecutive approaches.
+    Params:
+        approaches: sorted array of ephemeris times of the closest approaches
+        et_start: start ephemeris time of the time period
+        et_end: end ephemeris time of the time period
+    Returns:
+        Array of shape (n, 2) with the start and end ephemeris times of the window of each approach.
+    """
+    approaches = np.asarray(approaches, dtype=float)
+    bounds = np.concatenate(([et_start], 0.5 * (approaches[1:] + approaches[:-1]), [et_end]))
+    return np.column_stack((bounds[:-1], bounds[1:]))
+
+
+def flyby_crossings(metakernel, index, body, utc_ca, utc_start, utc_end, models, kwargs):
+    """Computes the crossings of a flyby, with the arguments of a task returned by `flyby_tasks`.
+    Params:
+        metakernel: path to the metakernel
+        index: index of the flyby
+        body: name of the body, in upper case
+        utc_ca: closest approach time in UTC format
+        utc_start: start time of the flyby window in UTC format
+        utc_end: end time of the flyby window in UTC format
+        models: list of (boundary, model) pairs
+        kwargs: further arguments of the crossing function of the body
+    Returns:
+        CrossingEvents with the crossings within the flyby window, labelled with the flyby index and closest approach.
+    """
+    # all the models of a flyby are evaluated in a single pass over the trajectory
+    selection = {boundary: [] for boundary in boundaries.boundaries(body)}
+    for boundary, model in models:
+        selection[boundary].append(model)
+    events = crossing_functions[body](metakernel, utc_start, utc_end, **selection, events=True, **kwargs)
+    # the grid method searches 10000 seconds around the approach, longer than the flyby windows of short orbits, so
+    # crossings belonging to the windows of the neighbouring flybys are left to them
+    with Spice.session(metakernel) as spice:
+        et_start, et_end = spice.utc2et(utc_start), spice.utc2et(utc_end)
+    events = events[(events['et'] >= et_start) & (events['et'] < et_end)]
+    events.data['flyby'] = index
+    events.data['closest_approach'] = utc_ca
+    return events
+
+
+def select_models(body, models=None):
+    """Checks a selection of boundary models of a body.
+    Params:
+        body: name of the body, in upper case
+        models: list of (boundary, model) pairs, all models of the body if None
+    Returns:
+        The list of (boundary, model) pairs.
+    """
+    if models is None:
+        return [(boundary, model) for boundary in boundaries.boundaries(body)
+                for model in boundaries.models(body, boundary)]
+    models = [tuple(model) for model in models]
+    for boundary, model in models:
+        if model not in boundaries.models(body, boundary):
+            raise ValueError("Unknown {} {} model {}".format(body.lower(), boundary, model))
+    return models
+
+
+def flyby_tasks(spice, metakernel, body, utc_start, utc_end, models, step=None, kwargs=None, first=0):
+    """Finds the flybys of MPO to a body during a time period, and returns the arguments of the computation of the
+    crossings of every flyby by `flyby_crossings`.
+    Params:
+        spice: the Spice object, with the kernels of the metakernel loaded
+        first: index of the first flyby, see `scan` for the rest
+    Returns:
+        List of tuples (metakernel, index, body, utc_ca, utc_start, utc_end, models, kwargs), one per flyby.
+    """
+    approaches = spice.closest_approach('MPO', body, utc_start, utc_end, True, step) or []
+    windows = flyby_windows(approaches, spice.utc2et(utc_start), spice.utc2et(utc_end))
+    if len(approaches):
+        # a flyby window does not extend over the SPK gaps around its approach
+        covered = spice.coverage('MPO', body, 'SUN').clip(spice.utc2et(utc_start), spice.utc2et(utc_end))
+        i = np.searchsorted(covered[:, 0], approaches, side='right') - 1
+        windows = np.column_stack((np.maximum(windows[:, 0], covered[i, 0]),
+                                   np.minimum(windows[:, 1], covered[i, 1])))
+    return [(metakernel, first + i, body, spice.et2utc(etc), spice.et2utc(et_start), spice.et2utc(et_end), models,
+             kwargs or {}) for i, (etc, (et_start, et_end)) in enumerate(zip(approaches, windows))]
+
+
+def scan(metakernel, body, utc_start, utc_end, models=None, step=None, processes=None, output=None, **kwargs):
+    """Finds all the flybys of MPO to a body during a time period, and computes the boundary crossings of each flyby
+    in parallel over a pool of worker processes, each one holding its own SPICE kernel pool.
+    Params:
+        metakernel: path to the metakernel
+        body: name of the body, either 'VENUS' or 'MERCURY'
+        utc_start: start time of the time period in UTC format, e.g. 2021-08-09T14:00:00
+        utc_end: end time of the time period in UTC format, e.g. 2021-10-02T23:59:00
+        models: list of (boundary, model) pairs, e.g. [('bowshock', 'slavin')], all models of the body by default
+        step: step size in seconds of a plain closest approaches search, shorter than half the orbital period, or
+            None to search them from the cached distance index with an adaptive step, see `Spice.closest_approach`
+        processes: number of worker processes, the number of CPUs by default. A single process runs in-process.
+        output: path of a CSV, Parquet or Arrow file (see `EventsWriter`) where the crossings of every flyby are
+            written as soon as they are computed, instead of being collected in memory
+        kwargs: further arguments of the crossing functions, e.g. method='adaptive' or aberration=True for Venus
+    Returns:
+        CrossingEvents with one row per crossing, sorted by flyby and time, with the flyby index, body, closest
+        approach time, boundary, model, crossing type ('entry' or 'exit'), ephemeris time, UTC time and position of
+        the crossing. If an output file is given, the number of crossings written instead.
+    """
+    body = body.upper()
+    models = select_models(body, models)
+    with Spice.session(metakernel) as spice:
+        tasks = flyby_tasks(spice, metakernel, body, utc_start, utc_end, models, step, kwargs)
+
+    processes = processes or os.cpu_count()
+    if processes == 1:
+        results = (flyby_crossings(*task) for task in tasks)
+        return _collect(results, output)
+    with SpiceExecutor(metakernel, min(processes, max(len(tasks), 1))) as executor:
+        return _collect(executor.map(flyby_crossings, *zip(*tasks)), output)
+
+
+def _collect(results, output):
+    """Gathers the crossing events of every flyby in flyby order, or writes them to the output file.
+    """
+    if output is None:
+        return CrossingEvents.concatenate(list(results)).sort()
+    with EventsWriter(output) as writer:
+        for events in results:
+            writer.write(events)
+    return writer.count
@@ -0,0 +1,228 @@
+"""Registry of the bowshock and magnetopause models of every body.
+Models are objects with an `inside(vv, out=None)` test and a signed `distance(vv)`, evaluated over arrays of
+positions of shape (n, 3) in body radii in the frame of the model, and a `stack(models)` class method building a
+single model whose parameters are column arrays, so that one evaluation broadcasts over all of them, giving one row
+per model. Further models are added with `register`, e.g.:
+    register('MERCURY', 'magnetopause', 'shue', Shue(rss=1.45, alpha=0.5))
+Models registered at run time are only known to worker processes of batch runs started afterwards with the fork
+start method.
+"""
+import numpy as np
+from flybys.events import events_dtype
+
+
+class Conic:
+    """Conic section boundary with its focus at (x0, 0, 0) and its axis along x, r = L / (1 + eps cos(theta)), with r
+    the distance to the focus and theta the angle to the x axis. Since r cos(theta) = x - x0, the inside test
+    r^2 < (L / (1 + eps cos(theta)))^2 reduces to |r + eps (x - x0)| < L, which needs no trigonometry.
+    Attributes:
+        l: semi-latus rectum in body radii
+        eps: eccentricity
+        x0: x coordinate of the focus in body radii
+    """
+
+    def __init__(self, l, eps, x0=0.):
+        self.l = np.asarray(l, dtype=float)
+        self.eps = np.asarray(eps, dtype=float)
+        self.x0 = np.asarray(x0, dtype=float)
+
+    @classmethod
+    def stack(cls, models):
+        return cls(*[np.array([[getattr(m, p)] for m in models]) for p in ('l', 'eps', 'x0')])
+
+    def _polar(self, vv):
+        """Returns the x coordinates and distances relative to the focus, one row per model if stacked.
+        """
+        x = np.subtract(vv[:, 0], self.x0)
+        r = x * x
+        r += vv[:, 1] * vv[:, 1]
+        r += vv[:, 2] * vv[:, 2]
+        return x, np.sqrt(r, out=r)
+
+    def inside(self, vv, out=None):
+        """Returns whether positions are inside the boundary.
+        Params:
+            vv: array of shape (n, 3) of positions in body radii
+            out: optional boolean array where the result is written
+        Returns:
+            Boolean array of shape (n, ), or (m, n) for m stacked models.
+        """
+        x, r = self._polar(vv)
+        x *= self.eps
+        x += r
+        return np.less(np.abs(x, out=x), self.l, out=out)
+
+    def distance(self, vv):
+        """Returns the signed distance of positions to the boundary along the direction from the focus, negative
+        inside, e.g. for root finding. Positions at the focus are given the distance to the nose of the boundary.
+        """
+        x, r = self._polar(vv)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            distance = r - self.l * r / np.abs(r + self.eps * x)
+        return np.where(r > 0, distance, -self.l / (1 + self.eps))
+
+    def __repr__(self):
+        return 'Conic(l={}, eps={}, x0={})'.format(self.l, self.eps, self.x0)
+
+
+class Shue:
+    """Shue et al. 1997 type boundary centered at the origin, r = rss (2 / (1 + cos(theta)))^alpha. Since
+    r cos(theta) = x, the inside test r < rss (2 r / (r + x))^alpha needs no trigonometry, and for alpha = 0.5 it
+    reduces to r (r + x) < 2 rss^2, which needs no power either.
+    Attributes:
+        rss: subsolar standoff distance in body radii
+        alpha: flaring exponent
+    """
+
+    def __init__(self, rss, alpha):
+        self.rss = np.asarray(rss, dtype=float)
+        self.alpha = np.asarray(alpha, dtype=float)
+
+    @classmethod
+    def stack(cls, models):
+        return cls(*[np.array([[getattr(m, p)] for m in models]) for p in ('rss', 'alpha')])
+
+    @staticmethod
+    def _polar(vv):
+        r = vv[:, 0] * vv[:, 0]
+        r += vv[:, 1] * vv[:, 1]
+        r += vv[:, 2] * vv[:, 2]
+        return vv[:, 0], np.sqrt(r, out=r)
+
+    def inside(self, vv, out=None):
+        """Returns whether positions are inside the boundary.
+        Params:
+            vv: array of shape (n, 3) of positions in body radii
+            out: optional boolean array where the result is written
+        Returns:
+            Boolean array of shape (n, ), or (m, n) for m stacked models.
+        """
+        x, r = self._polar(vv)
+        if np.all(self.alpha == 0.5):
+            return np.less(r * (r + x), 2 * self.rss ** 2, out=out)
+        inside = np.less((r / self.rss) ** (1 / self.alpha) * (r + x), 2 * r, out=out)
+        inside |= r == 0
+        return inside
+
+    def distance(self, vv):
+        """Returns the signed distance of positions to the boundary along the direction from the origin, negative
+        inside, e.g. for root finding. Positions at the origin are given the distance to the nose of the boundary.
+        """
+        x, r = self._polar(vv)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            distance = r - self.rss * (2 * r / (r + x)) ** self.alpha
+        return np.where(r > 0, distance, -self.rss)
+
+    def __repr__(self):
+        return 'Shue(rss={}, alpha={})'.format(self.rss, self.alpha)
+
+
+# boundaries the crossing functions of every body evaluate
+evaluated = {'VENUS': ('bowshock', ),
+             'MERCURY': ('bowshock', 'magnetopause')}
+
+# models by body and boundary, in registration order
+_registry = {}
+
+
+def register(body, boundary, name, model, replace=False):
+    """Registers a boundary model, of one of the boundaries the crossing functions of the body evaluate, see
+    `evaluated`.
+    Params:
+        body: name of the body, e.g. 'MERCURY'
+        boundary: name of the boundary, e.g. 'magnetopause'
+        name: name of the model, at most as long as the model field of the crossing events
+        model: the model, e.g. a Conic or a Shue
+        replace: if true replaces a model already registered with the same name
+    """
+    if boundary not in evaluated.get(body.upper(), ()):
+        raise ValueError("Unknown {} boundary {}".format(body.lower(), boundary))
+    if len(name) > events_dtype['model'].itemsize // np.dtype('U1').itemsize:
+        raise ValueError("Boundary model name {} too long".format(name))
+    models = _registry.setdefault((body.upper(), boundary), {})
+    if name in models and not replace:
+        raise ValueError("Boundary model {} {} {} already registered".format(body.lower(), boundary, name))
+    models[name] = model
+
+
+def unregister(body, boundary, name):
+    _registry.get((body.upper(), boundary), {}).pop(name, None)
+
+
+def boundaries(body):
+    """Returns the names of the boundaries with models registered for a body.
+    """
+    return [boundary for (b, boundary), models in _registry.items() if b == body.upper() and models]
+
+
+def models(body, boundary):
+    """Returns a dictionary with the models registered for a boundary of a body, by name.
+    """
+    return dict(_registry.get((body.upper(), boundary), {}))
+
+
+def get(body, boundary, name):
+    model = _registry.get((body.upper(), boundary), {}).get(name)
+    if model is None:
+        raise ValueError("Unknown {} model {}".format(boundary, name))
+    return model
+
+
+class BoundarySet:
+    """Several boundary models of a body evaluated at once. Models of the same class are stacked and evaluated in a
+    single vectorized operation.
+    Attributes:
+        body: name of the body
+        keys: list of the (boundary, model) keys of the models, in the order of the rows of the results
+    """
+
+    def __init__(self, body, keys):
+        self.body = body.upper()
+        self.keys = [tuple(key) for key in keys]
+        if not self.keys:
+            raise ValueError("No boundary models to evaluate")
+
+        groups = {}
+        for i, (boundary, name) in enumerate(self.keys):
+            model = get(self.body, boundary, name)
+            groups.setdefault(type(model), []).append((i, model))
+        self._groups = [(np.array([i for i, _ in group]), cls.stack([m for _, m in group]))
+                        for cls, group in groups.items()]
+
+    def inside(self, vv):
+        """Returns whether positions are inside every model.
+        Params:
+            vv: array of shape (n, 3) of positions in body radii
+        Returns:
+            Boolean array of shape (len(keys), n).
+        """
+        vv = np.asarray(vv, dtype=float)
+        out = np.empty((len(self.keys), len(vv)), dtype=bool)
+        if len(self._groups) == 1:
+            return self._groups[0][1].inside(vv, out=out)
+        for rows, model in self._groups:
+            out[rows] = model.inside(vv)
+        return out
+
+    def distance(self, vv):
+        """Returns the signed distances of positions to every model, negative inside, as an array of shape
+        (len(keys), n).
+        """
+        vv = np.asarray(vv, dtype=float)
+        out = np.empty((len(self.keys), len(vv)))
+        for rows, model in self._groups:
+            out[rows] = model.distance(vv)
+        return out
+
+
+# Martinecz et al. 2008
+register('VENUS', 'bowshock', 'martinecz', Conic(l=1.303, eps=1.056, x0=0.788))
+register('VENUS', 'bowshock', 'slavin', Conic(l=1.68, eps=1.03, x0=0.45))
+register('VENUS', 'bowshock', 'russell', Conic(l=2.14, eps=0.609, x0=0.))
+register('VENUS', 'bowshock', 'zhang', Conic(l=2.131, eps=0.66, x0=0.))
+register('VENUS', 'bowshock', 'tricicle', Conic(l=1.515, eps=1.018, x0=0.664))
+
+# Winslow et al. 2013
+register('MERCURY', 'bowshock', 'slavin', Conic(l=2.40, eps=1.07, x0=0.5))
+register('MERCURY', 'bowshock', 'winslow', Conic(l=2.96, eps=1.02, x0=0.5))
+register('MERCURY', 'magnetopause', 'korth', Shue(rss=1.42, alpha=0.5))
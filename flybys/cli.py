@@ -0,0 +1,284 @@
+"""Command-line batch runner, installed as the `flybys` console script. It reads a manifest of the computations of
+a run, finds every flyby of every item, computes their crossings over a pool of worker processes and streams them
+to an events file:
+    flybys manifest.yaml --metakernel bc_plan.tm --output crossings.parquet
+Manifests are JSON, YAML (which needs pyyaml) or CSV files. JSON and YAML manifests hold a list of items, optionally
+under an `items` key next to the `metakernel`, the `output` file and `defaults` shared by all the items:
+    metakernel: /path/to/spice/dataset/mk/bc_plan.tm
+    output: crossings.parquet
+    defaults: {method: adaptive, tolerance: 0.1}
+    items:
+      - {body: VENUS, start: 2021-08-09T00:00:00, end: 2021-08-12T00:00:00, aberration: true}
+      - {body: MERCURY, start: 2021-10-01T00:00:00, end: 2026-12-31T00:00:00, models: [magnetopause/korth]}
+CSV manifests have one item per row, with `body`, `start` and `end` columns, the models separated by spaces and a
+column per further argument. Every item takes the `models` as boundary/model names, all of them by default,
+`approach_step` (see `batch.scan`) and the arguments of the crossing function of the body, e.g. `method`.
+The crossings of every flyby are saved to a results store as soon as they are computed, with the record of the kernel
+files and SPK segments they depend on, so a run that is interrupted and started again only computes the flybys
+missing, and a run with a new kernel set only the flybys whose kernel data changed. A line with the closest approach
+and the number of crossings of every flyby is printed as JSON as it is written.
+"""
+import argparse
+import csv
+import datetime
+import hashlib
+import inspect
+import json
+import os
+import os.path as path
+import shutil
+import sys
+import numpy as np
+from flybys.spice import Spice
+from flybys.executor import SpiceExecutor
+from flybys.events import CrossingEvents, EventsWriter
+from flybys.batch import crossing_functions, flyby_crossings, flyby_tasks, select_models
+
+
+_manifest_formats = {'.json': 'json', '.yaml': 'yaml', '.yml': 'yaml', '.csv': 'csv'}
+
+# manifest item keys which are not arguments of the crossing functions
+_item_keys = ('body', 'start', 'end', 'models', 'approach_step')
+
+
+def _import_yaml():
+    try:
+        import yaml
+    except ImportError:
+        raise ImportError("YAML manifests require the pyyaml package") from None
+    return yaml
+
+
+def _parse_value(value):
+    """Parses a CSV cell as a JSON number or boolean, or keeps it as a string.
+    """
+    try:
+        return json.loads(value)
+    except ValueError:
+        return value
+
+
+def _parse_models(models):
+    """Parses a model selection, either boundary/model names in a list or separated by spaces, or a dictionary with
+    the list of models of every boundary.
+    """
+    if models is None:
+        return None
+    if isinstance(models, dict):
+        return [(boundary, model) for boundary, names in models.items() for model in names]
+    if isinstance(models, str):
+        models = models.split()
+    pairs = [tuple(model.split('/')) for model in models]
+    for pair, model in zip(pairs, models):
+        if len(pair) != 2:
+            raise ValueError("Unknown model {}, expected as boundary/model".format(model))
+    return pairs
+
+
+def _utc(time):
+    return time.isoformat() if isinstance(time, (datetime.date, datetime.datetime)) else str(time)
+
+
+def read_manifest(file, format=None):
+    """Reads the manifest of a batch run.
+    Params:
+        file: path of the manifest
+        format: 'json', 'yaml' or 'csv', guessed from the file extension by default
+    Returns:
+        Dictionary with the list of `items`, and the `metakernel` and `output` if given. Every item is a dictionary
+        with the upper case body name, the start and end UTC times, the list of (boundary, model) pairs or None, the
+        approach step and the further arguments of the crossing function, the defaults applied.
+    """
+    format = format or _manifest_formats.get(path.splitext(file)[1].lower())
+    if format == 'csv':
+        with open(file, newline='') as stream:
+            manifest = [{key: _parse_value(value) for key, value in row.items() if value != ''}
+                        for row in csv.DictReader(stream)]
+    elif format == 'json':
+        with open(file) as stream:
+            manifest = json.load(stream)
+    elif format == 'yaml':
+        yaml = _import_yaml()
+        with open(file) as stream:
+            manifest = yaml.safe_load(stream)
+    else:
+        raise ValueError("Unknown manifest format {}".format(format or file))
+
+    if isinstance(manifest, list):
+        manifest = {'items': manifest}
+    defaults = manifest.get('defaults') or {}
+    items = []
+    for i, item in enumerate(manifest.get('items') or []):
+        item = dict(defaults, **item)
+        missing = [key for key in ('body', 'start', 'end') if key not in item]
+        if missing:
+            raise ValueError("Manifest item {} lacks {}".format(i, ', '.join(missing)))
+        item['body'] = item['body'].upper()
+        if item['body'] not in crossing_functions:
+            raise ValueError("Unknown body {}".format(item['body']))
+        item['start'], item['end'] = _utc(item['start']), _utc(item['end'])
+        item['models'] = _parse_models(item.get('models'))
+        item.setdefault('approach_step', None)
+
+        parameters = inspect.signature(crossing_functions[item['body']]).parameters
+        unknown = [key for key in item if key not in _item_keys and (key not in parameters or key == 'events')]
+        if unknown:
+            raise ValueError("Unknown argument {} of manifest item {}".format(', '.join(unknown), i))
+        items.append(item)
+    return dict(manifest, items=items)
+
+
+def _flyby_key(task):
+    """Returns the key of the crossings of a flyby in the results store, which only depends on the inputs of their
+    computation, the kernels aside.
+    """
+    _, _, body, _, utc_start, utc_end, models, kwargs = task
+    inputs = [body, utc_start, utc_end, [list(model) for model in models], kwargs]
+    return hashlib.sha1(json.dumps(inputs, sort_keys=True).encode()).hexdigest()
+
+
+def _replace(file, write, mode):
+    """Writes a file atomically, so that an interrupted run leaves no partial files.
+    """
+    with open(file + '.tmp', mode) as stream:
+        write(stream)
+    os.replace(file + '.tmp', file)
+
+
+def _save(file, events, record):
+    """Saves the events of a flyby to the results store, followed by the record of their kernel dependencies.
+    """
+    _replace(file + '.npy', lambda stream: np.save(stream, events.data), 'wb')
+    _replace(file + '.json', lambda stream: json.dump(record, stream, indent=1), 'w')
+
+
+def _stored(file, record):
+    """Returns whether the events of a flyby are stored, 'changed' if they are but their kernel dependencies changed.
+    """
+    try:
+        with open(file + '.json') as stream:
+            digest = json.load(stream)['dependencies']['digest']
+    except (OSError, ValueError, KeyError):
+        return False
+    if not path.exists(file + '.npy'):
+        return False
+    return digest == record['dependencies']['digest'] or 'changed'
+
+
+def _checkpoint(file, record):
+    def save(future):
+        if not future.cancelled() and future.exception() is None:
+            _save(file, future.result(), record)
+    return save
+
+
+def run(manifest, metakernel, output, checkpoint=None, processes=None, restart=False, stream=None):
+    """Runs the items of a manifest, writing their crossings to an events file in flyby order. The crossings of
+    every flyby are kept in a results store together with the record of the kernel data they depend on (see
+    `Spice.dependencies`), and are only computed again when their inputs or the kernel data change, so that
+    interrupted runs resume where they stopped and runs with a new kernel set only compute the flybys affected.
+    Params:
+        manifest: the manifest, see `read_manifest`
+        metakernel: path to the metakernel
+        output: path of the CSV, Parquet or Arrow output file, see `EventsWriter`
+        checkpoint: results store directory, the output path followed by .checkpoint by default
+        processes: number of worker processes, the number of CPUs by default. A single process runs in-process.
+        restart: if true discards the results store and computes every flyby again
+        stream: text stream where the JSON line of every flyby is printed, none by default
+    Returns:
+        The number of flybys whose computation failed.
+    """
+    metakernel = path.abspath(metakernel)
+    checkpoint = checkpoint or output + '.checkpoint'
+    if restart and path.isdir(checkpoint):
+        shutil.rmtree(checkpoint)
+    os.makedirs(checkpoint, exist_ok=True)
+
+    tasks, items, records = [], [], []
+    with Spice.session(metakernel) as spice:
+        for i, item in enumerate(manifest['items']):
+            kwargs = {key: value for key, value in item.items() if key not in _item_keys}
+            flybys = flyby_tasks(spice, metakernel, item['body'], item['start'], item['end'],
+                                 select_models(item['body'], item['models']), item['approach_step'], kwargs, len(tasks))
+            tasks += flybys
+            items += [i] * len(flybys)
+            records += [{'inputs': {'body': body, 'start': utc_start, 'end': utc_end, 'models': models,
+                                    'arguments': kwargs},
+                         'metakernel': metakernel,
+                         'dependencies': spice.dependencies(('MPO', body, 'SUN'), spice.utc2et(utc_start),
+                                                            spice.utc2et(utc_end))}
+                        for _, _, body, _, utc_start, utc_end, models, kwargs in flybys]
+    files = [path.join(checkpoint, _flyby_key(task)) for task in tasks]
+    stored = [_stored(file, record) for file, record in zip(files, records)]
+    pending = [n for n, status in enumerate(stored) if status is not True]
+
+    processes = min(processes or os.cpu_count(), len(pending))
+    executor = SpiceExecutor(metakernel, processes) if processes > 1 else None
+    futures = {}
+    try:
+        if executor is not None:
+            for n in pending:
+                futures[n] = executor.submit(flyby_crossings, *tasks[n])
+                futures[n].add_done_callback(_checkpoint(files[n], records[n]))
+
+        failures = 0
+        with EventsWriter(output) as writer:
+            for n, (task, file) in enumerate(zip(tasks, files)):
+                _, index, body, utc_ca = task[:4]
+                line = {'item': items[n], 'flyby': index, 'body': body, 'closest_approach': utc_ca}
+                try:
+                    if n in futures:
+                        events = futures[n].result()
+                    elif stored[n] is not True:
+                        events = flyby_crossings(*task)
+                        _save(file, events, records[n])
+                    else:
+                        events = CrossingEvents(np.load(file + '.npy'))
+                        events.data['flyby'] = index
+                        events.data['closest_approach'] = utc_ca
+                        line['reused'] = True
+                    if stored[n] == 'changed':
+                        line['changed'] = True
+                except Exception as e:
+                    failures += 1
+                    line['error'] = '{}: {}'.format(type(e).__name__, e)
+                else:
+                    writer.write(events)
+                    line['crossings'] = len(events)
+                if stream is not None:
+                    print(json.dumps(line), file=stream, flush=True)
+    finally:
+        if executor is not None:
+            for future in futures.values():
+                future.cancel()
+            executor.shutdown()
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='flybys', description='Computes the closest approaches and boundary '
+                                     'crossings of MPO flybys listed in a manifest.')
+    parser.add_argument('manifest', help='JSON, YAML or CSV manifest of the flybys to compute')
+    parser.add_argument('--metakernel', help='path to the metakernel, overriding the one of the manifest')
+    parser.add_argument('--output', help='CSV, Parquet or Arrow events file, overriding the one of the manifest')
+    parser.add_argument('--checkpoint', help='results store directory, the output path followed by .checkpoint '
+                        'by default')
+    parser.add_argument('--processes', type=int, help='number of worker processes, the number of CPUs by default')
+    parser.add_argument('--restart', action='store_true', help='discard the results store and compute every flyby')
+    args = parser.parse_args(argv)
+
+    manifest = read_manifest(args.manifest)
+    metakernel = args.metakernel or manifest.get('metakernel')
+    output = args.output or manifest.get('output')
+    if metakernel is None or output is None:
+        parser.error('the metakernel and the output file are required, in the manifest or as options')
+
+    failures = run(manifest, metakernel, output, args.checkpoint, args.processes, args.restart, sys.stdout)
+    if failures:
+        print('{} flybys failed'.format(failures), file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,77 @@
+import numpy as np
+import spiceypy as spice
+import spiceypy.utils.support_types as stypes
+
+
+class Coverage:
+    """Time coverage of ephemeris data, as sorted disjoint intervals of ephemeris times, with fast interval queries.
+    Attributes:
+        intervals: array of shape (n, 2) with the start and end ephemeris times of every interval
+    """
+
+    def __init__(self, intervals):
+        self.intervals = np.reshape(np.asarray(intervals, dtype=float), (-1, 2))
+
+    @classmethod
+    def unbounded(cls):
+        return cls([[-np.inf, np.inf]])
+
+    def contains(self, et):
+        """Returns whether ephemeris times are covered.
+        """
+        i = np.searchsorted(self.intervals[:, 0], et, side='right') - 1
+        return (i >= 0) & (np.asarray(et) <= self.intervals[np.maximum(i, 0), 1])
+
+    def clip(self, et_start, et_end):
+        """Returns the covered parts of a time window, as an array of shape (n, 2).
+        """
+        first = np.searchsorted(self.intervals[:, 1], et_start, side='left')
+        last = np.searchsorted(self.intervals[:, 0], et_end, side='right')
+        parts = self.intervals[first:last].copy()
+        if len(parts):
+            parts[0, 0] = max(parts[0, 0], et_start)
+            parts[-1, 1] = min(parts[-1, 1], et_end)
+        return parts[parts[:, 1] > parts[:, 0]]
+
+    def intersect(self, other):
+        """Returns the coverage of the times covered by both coverages.
+        """
+        a, b = self.intervals, other.intervals
+        parts = []
+        i = j = 0
+        while i < len(a) and j < len(b):
+            start, end = max(a[i, 0], b[j, 0]), min(a[i, 1], b[j, 1])
+            if end > start:
+                parts.append((start, end))
+            if a[i, 1] < b[j, 1]:
+                i += 1
+            else:
+                j += 1
+        return Coverage(parts)
+
+    def __len__(self):
+        return len(self.intervals)
+
+    def __repr__(self):
+        return 'Coverage({})'.format(self.intervals.tolist())
+
+
+def spk_coverages(intervals=10000):
+    """Reads the coverage of every body in the SPK kernels loaded, merging the segments of all the kernels.
+    Params:
+        intervals: maximum number of coverage intervals of a body
+    Returns:
+        Dictionary with the Coverage of every NAIF body code.
+    """
+    files = [spice.kdata(i, 'SPK')[0] for i in range(spice.ktotal('SPK'))]
+    windows = {}
+    for file in files:
+        ids = stypes.SPICEINT_CELL(1000)
+        spice.spkobj(file, ids)
+        for i in range(spice.card(ids)):
+            body = ids[i]
+            if body not in windows:
+                windows[body] = stypes.SPICEDOUBLE_CELL(2 * intervals)
+            spice.spkcov(file, body, windows[body])  # the union with the coverage of previous kernels
+    return {body: Coverage([spice.wnfetd(window, i) for i in range(spice.wncard(window))])
+            for body, window in windows.items()}
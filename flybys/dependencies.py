@@ -0,0 +1,166 @@
+"""Dependencies of results on the kernels loaded, so that results computed with a former kernel set are only
+recomputed when the data they depend on changes. A result computed for some bodies over a time window depends on:
+- the leapseconds, constants and frame kernels and binary PCKs loaded, by content checksum, text kernels being told
+  apart by the kernel pool variables they assign;
+- the SPK segments of the bodies, and of the centers they are given relative to, overlapping the time window, by a
+  checksum of the segment data within the time window, so that a new SPK version changing the trajectory after some
+  epoch leaves the results before that epoch untouched.
+Other kernels, e.g. CKs, SCLKs and instrument kernels, are not used by the computations and do not count as
+dependencies, so that the clock kernel updated by every kernel release does not invalidate any result.
+"""
+import hashlib
+import json
+import os
+import re
+import os.path as path
+import numpy as np
+import spiceypy as spice
+
+
+# prefixes of the kernel pool variables of leapseconds (DELTET), constants (BODY) and frame kernels, which the
+# computations read
+_prefixes = ('DELTET/', 'BODY', 'FRAME_', 'TKFRAME_', 'OBJECT_', 'NAIF_BODY_')
+
+# names of the variables assigned in the data sections of text kernels
+_assignment = re.compile(r'^\s*([^\s=+]+)\s*\+?=', re.MULTILINE)
+
+# checksums of the kernel files the computations depend on, None for the others, by path, size and modification time
+_checksums = {}
+
+
+class Segment:
+    """Segment of an SPK file.
+    Attributes:
+        file: path of the SPK file
+        body: NAIF code of the target body
+        center: NAIF code of the center body
+        frame: NAIF code of the reference frame
+        type: SPK data type
+        start: start ephemeris time of the segment coverage
+        stop: end ephemeris time of the segment coverage
+    """
+
+    def __init__(self, file, handle, summary):
+        dc, ic = spice.dafus(summary, 2, 6)
+        self.start, self.stop = float(dc[0]), float(dc[1])
+        self.body, self.center, self.frame, self.type, self.begin, self.end = [int(i) for i in ic[:6]]
+        self.file = file
+        self.handle = handle
+        self._epochs = None
+
+    def overlaps(self, et_start, et_end):
+        return self.start <= et_end and self.stop >= et_start
+
+    def _words(self, first, last):
+        """Returns the data of the segment between two addresses, both included.
+        """
+        return np.asarray(spice.dafgda(self.handle, first, last), dtype=float)
+
+    def digest(self, et_start, et_end):
+        """Returns the SHA-1 checksum of the data the segment evaluates within a time window. Only the records
+        needed within the time window are read for the discrete states (types 5, 9 and 13) and Chebyshev (types 2
+        and 3) segments, the whole segment data otherwise.
+        """
+        sha1 = hashlib.sha1(repr((self.body, self.center, self.frame, self.type)).encode())
+        if self.type in (5, 9, 13):
+            # 6 n states, n epochs, the epoch directory, and the GM or interpolation degree followed by n
+            parameter, n = self._words(self.end - 1, self.end)
+            n = int(n)
+            if self._epochs is None:
+                self._epochs = self._words(self.begin + 6 * n, self.begin + 7 * n - 1)
+            margin = 1 if self.type == 5 else int(parameter) + 1
+            first = max(int(np.searchsorted(self._epochs, et_start)) - margin, 0)
+            last = min(int(np.searchsorted(self._epochs, et_end, side='right')) + margin, n)
+            sha1.update(np.array([parameter]).tobytes())
+            sha1.update(self._words(self.begin + 6 * first, self.begin + 6 * last - 1).tobytes())
+            sha1.update(self._epochs[first:last].tobytes())
+        elif self.type in (2, 3):
+            # n records of size words, each one covering length seconds from init onwards
+            init, length, size, n = self._words(self.end - 3, self.end)
+            size, n = int(size), int(n)
+            first, last = np.clip(np.floor_divide([et_start - init, et_end - init], length), 0, n - 1).astype(int)
+            sha1.update(np.array([init, length, size]).tobytes())
+            sha1.update(self._words(self.begin + first * size, self.begin + (last + 1) * size - 1).tobytes())
+        else:
+            sha1.update(self._words(self.begin, self.end).tobytes())
+        return sha1.hexdigest()
+
+
+def spk_segments():
+    """Returns the segments of the SPK kernels loaded, in load order.
+    """
+    segments = []
+    for i in range(spice.ktotal('SPK')):
+        file, _, _, handle = spice.kdata(i, 'SPK')
+        spice.dafbfs(handle)
+        while spice.daffna():
+            segments.append(Segment(file, handle, spice.dafgs(5)))
+    return segments
+
+
+def text_variables(file):
+    """Returns the names of the kernel pool variables assigned by a text kernel.
+    """
+    with open(file, errors='replace') as stream:
+        sections = re.split(r'^\s*\\(begindata|begintext)\s*$', stream.read(), flags=re.MULTILINE)
+    # sections alternate between text and the name of the marker opening the next section
+    return {name for marker, section in zip(sections[1::2], sections[2::2]) if marker == 'begindata'
+            for name in _assignment.findall(section)}
+
+
+def kernel_checksums():
+    """Returns a list of (file, checksum) pairs with the SHA-1 checksum of the content of every leapseconds,
+    constants and frame kernel and binary PCK loaded, in load order.
+    """
+    checksums = []
+    for i in range(spice.ktotal('ALL')):
+        file, kind, _, _ = spice.kdata(i, 'ALL')
+        if kind not in ('TEXT', 'PCK'):
+            continue
+        stat = os.stat(file)
+        key = (path.abspath(file), stat.st_size, stat.st_mtime_ns)
+        if key not in _checksums:
+            _checksums[key] = None
+            if kind == 'PCK' or any(name.startswith(_prefixes) for name in text_variables(file)):
+                sha1 = hashlib.sha1()
+                with open(file, 'rb') as stream:
+                    for block in iter(lambda: stream.read(1 << 20), b''):
+                        sha1.update(block)
+                _checksums[key] = sha1.hexdigest()
+        if _checksums[key] is not None:
+            checksums.append((file, _checksums[key]))
+    return checksums
+
+
+def dependencies(segments, checksums, bodies, et_start, et_end):
+    """Returns the record of the kernel data a result computed for some bodies over a time window depends on.
+    Params:
+        segments: segments of the SPK kernels loaded, see `spk_segments`
+        checksums: checksums of the other kernels loaded, see `kernel_checksums`
+        bodies: NAIF codes of the bodies
+        et_start: start ephemeris time of the time window
+        et_end: end ephemeris time of the time window
+    Returns:
+        Dictionary with the `kernels` and their checksum, the `segments` with their body, center, frame, type,
+        coverage within the time window and checksum, and the `digest` of all of them, which only depends on the
+        data and not on the file names.
+    """
+    overlapping = [segment for segment in segments if segment.overlaps(et_start, et_end)]
+    codes, pending = set(bodies), list(bodies)
+    while pending:
+        code = pending.pop()
+        for segment in overlapping:
+            if segment.body == code and segment.center not in codes:
+                codes.add(segment.center)
+                pending.append(segment.center)
+
+    kernels = [{'file': path.basename(file), 'sha1': checksum} for file, checksum in checksums]
+    records = [{'file': path.basename(segment.file), 'body': segment.body, 'center': segment.center,
+                'frame': segment.frame, 'type': segment.type, 'start': max(segment.start, et_start),
+                'stop': min(segment.stop, et_end), 'sha1': segment.digest(et_start, et_end)}
+               for segment in overlapping if segment.body in codes]
+    data = [[kernel['sha1'] for kernel in kernels],
+            [[record[key] for key in ('body', 'center', 'frame', 'type', 'start', 'stop', 'sha1')]
+             for record in records]]
+    digest = hashlib.sha1(json.dumps(data).encode()).hexdigest()
+    return {'kernels': kernels, 'segments': records, 'digest': digest}
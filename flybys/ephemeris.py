@@ -0,0 +1,99 @@
+import hashlib
+import os
+import os.path as path
+import tempfile
+import numpy as np
+from collections import OrderedDict
+
+
+class EphemerisCache:
+    """Memoizing cache of sampled ephemeris arrays.
+    Arrays are keyed by the query (target, observer, frame and kind of data), the loaded kernel set and the sampled
+    time grid, and kept in memory with least-recently-used eviction under a memory cap. Optionally they are also
+    persisted to a directory as .npy files, memory-mapped when read back, so they can be shared across processes and
+    runs with the same kernels.
+    Attributes:
+        max_bytes: memory cap of the cached arrays in bytes
+        min_samples: minimum size of the time grids cached, smaller queries are not worth the hashing
+        directory: directory where arrays are persisted, None to keep them in memory only
+        hits: number of queries served from the cache
+        misses: number of queries not found in the cache
+    """
+
+    def __init__(self, max_bytes=256 * 2 ** 20, min_samples=1000, directory=None):
+        self.max_bytes = max_bytes
+        self.min_samples = min_samples
+        self.directory = directory
+        self.hits = 0
+        self.misses = 0
+        self._arrays = OrderedDict()
+        self._bytes = 0
+
+    def cacheable(self, et):
+        return np.ndim(et) == 1 and np.size(et) >= self.min_samples
+
+    @staticmethod
+    def key(query, kernels, et):
+        """Returns the cache key of a query.
+        Params:
+            query: tuple identifying the query, e.g. ('position', target, frame, observer)
+            kernels: identifier of the loaded kernel set
+            et: array of ephemeris times sampled
+        """
+        et = np.ascontiguousarray(et, dtype=float)
+        digest = hashlib.sha1(repr((query, kernels, et.shape)).encode('utf-8'))
+        digest.update(et.tobytes())
+        return digest.hexdigest()
+
+    def get(self, key):
+        """Returns a copy of the cached array of a key, or None if it is not cached.
+        """
+        array = self._arrays.get(key)
+        if array is not None:
+            self._arrays.move_to_end(key)
+        elif self.directory is not None and path.exists(self._file(key)):
+            array = np.load(self._file(key), mmap_mode='r')
+            self._store(key, array)
+
+        if array is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return np.array(array)
+
+    def put(self, key, array):
+        """Caches a copy of an array under a key, persisting it to disk if the cache has a directory.
+        """
+        array = np.array(array)
+        if self.directory is not None:
+            # write and rename so that a crashed or concurrent writer never leaves a partially written file
+            fd, file_tmp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'wb') as stream:
+                    np.save(stream, array)
+                os.replace(file_tmp, self._file(key))
+            except BaseException:
+                os.remove(file_tmp)
+                raise
+        self._store(key, array)
+
+    def clear(self):
+        self._arrays.clear()
+        self._bytes = 0
+
+    @property
+    def nbytes(self):
+        return self._bytes
+
+    def _store(self, key, array):
+        if array.nbytes > self.max_bytes:
+            return
+        self._bytes += array.nbytes - (self._arrays[key].nbytes if key in self._arrays else 0)
+        self._arrays[key] = array
+        self._arrays.move_to_end(key)
+        while self._bytes > self.max_bytes:
+            _, evicted = self._arrays.popitem(last=False)
+            self._bytes -= evicted.nbytes
+
+    def _file(self, key):
+        return path.join(self.directory, key + '.npy')
@@ -0,0 +1,203 @@
+import csv
+import os.path as path
+import numpy as np
+
+
+events_dtype = np.dtype([('flyby', 'i4'),
+                         ('body', 'U8'),
+                         ('closest_approach', 'U19'),
+                         ('boundary', 'U12'),
+                         ('model', 'U16'),
+                         ('crossing', 'U5'),
+                         ('et', 'f8'),
+                         ('utc', 'U29'),  # up to the 9 decimals of LeapSeconds.et2utc
+                         ('position', 'f8', (3, ))])
+
+# flat column names, with the position split in its components
+_columns = [name for name in events_dtype.names if name != 'position'] + ['x', 'y', 'z']
+
+_formats = {'.csv': 'csv', '.parquet': 'parquet', '.arrow': 'arrow', '.feather': 'arrow'}
+
+
+def _import_pyarrow():
+    try:
+        import pyarrow
+    except ImportError:
+        raise ImportError("Parquet and Arrow output require the pyarrow package") from None
+    return pyarrow
+
+
+class CrossingEvents:
+    """Columnar record of boundary crossing events, backed by a NumPy structured array with one row per event and
+    the columns of `events_dtype`: flyby index, body, closest approach UTC time, boundary, model, crossing type
+    ('entry' or 'exit'), ephemeris time, UTC time and position in body radii, in the frame of the boundary models.
+    Columns are accessed by name, e.g. events['utc'], and rows by index or mask.
+    Attributes:
+        data: the structured array
+    """
+
+    dtype = events_dtype
+
+    def __init__(self, data=None):
+        self.data = np.zeros(0, dtype=events_dtype) if data is None else np.asarray(data, dtype=events_dtype)
+
+    @classmethod
+    def concatenate(cls, events):
+        """Joins several CrossingEvents into one.
+        """
+        return cls(np.concatenate([e.data for e in events]) if events else None)
+
+    def sort(self, order=('flyby', 'et')):
+        """Returns the events sorted by the columns given.
+        """
+        return CrossingEvents(self.data[np.argsort(self.data, order=list(order), kind='stable')])
+
+    def columns(self):
+        """Returns a dictionary with the array of every flat column, the position being split in x, y and z. Columns
+        are views of the structured array.
+        """
+        columns = {name: self.data[name] for name in events_dtype.names if name != 'position'}
+        for i, axis in enumerate('xyz'):
+            columns[axis] = self.data['position'][:, i]
+        return columns
+
+    def to_numpy(self):
+        """Returns the structured array itself, without copying.
+        """
+        return self.data
+
+    def to_pandas(self):
+        """Returns a pandas DataFrame with the flat columns.
+        """
+        try:
+            import pandas
+        except ImportError:
+            raise ImportError("DataFrame output requires the pandas package") from None
+        return pandas.DataFrame(self.columns(), copy=False)
+
+    def to_arrow(self):
+        """Returns a pyarrow Table with the flat columns.
+        """
+        pyarrow = _import_pyarrow()
+        return pyarrow.table({name: pyarrow.array(column) for name, column in self.columns().items()})
+
+    def write(self, file, format=None):
+        """Writes the events to a file.
+        Params:
+            file: path of the output file
+            format: 'csv', 'parquet' or 'arrow' (IPC file format), guessed from the file extension by default
+        """
+        with EventsWriter(file, format) as writer:
+            writer.write(self)
+
+    def __len__(self):
+        return len(self.data)
+
+    def __getitem__(self, item):
+        if isinstance(item, str):
+            return self.data[item]
+        return CrossingEvents(np.atleast_1d(self.data[item]))
+
+    def __iter__(self):
+        return iter(self.data)
+
+    def __eq__(self, other):
+        if not isinstance(other, CrossingEvents):
+            return NotImplemented
+        return np.array_equal(self.data, other.data)
+
+    def __repr__(self):
+        return 'CrossingEvents({})'.format(repr(self.data))
+
+
+class EventsWriter:
+    """Incremental writer of crossing events to a CSV, Parquet or Arrow IPC file, so that long runs stream their
+    events to disk in batches instead of holding them in memory, e.g.:
+        with EventsWriter('crossings.parquet') as writer:
+            for events in batches:
+                writer.write(events)
+    Attributes:
+        file: path of the output file
+        format: 'csv', 'parquet' or 'arrow'
+        count: number of events written
+    """
+
+    def __init__(self, file, format=None):
+        self.file = file
+        self.format = format or _formats.get(path.splitext(file)[1].lower())
+        if self.format not in ('csv', 'parquet', 'arrow'):
+            raise ValueError("Unknown events file format {}".format(self.format or file))
+        self.count = 0
+        self._writer = None
+        self._stream = None
+
+        if self.format == 'csv':
+            self._stream = open(file, 'w', newline='')
+            self._writer = csv.writer(self._stream)
+            self._writer.writerow(_columns)
+        else:
+            pyarrow = _import_pyarrow()
+            schema = CrossingEvents().to_arrow().schema
+            if self.format == 'parquet':
+                import pyarrow.parquet
+                self._writer = pyarrow.parquet.ParquetWriter(file, schema)
+            else:
+                self._stream = pyarrow.OSFile(file, 'wb')
+                self._writer = pyarrow.ipc.new_file(self._stream, schema)
+
+    def write(self, events):
+        """Appends a batch of events to the file.
+        """
+        if self.format == 'csv':
+            columns = events.columns()
+            self._writer.writerows(zip(*[columns[name].tolist() for name in _columns]))
+        elif len(events):
+            self._writer.write_table(events.to_arrow())
+        self.count += len(events)
+
+    def close(self):
+        if self.format != 'csv' and self._writer is not None:
+            self._writer.close()
+        if self._stream is not None:
+            self._stream.close()
+        self._writer = self._stream = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def read_events(file, format=None):
+    """Reads crossing events written by `EventsWriter` or `CrossingEvents.write`.
+    Params:
+        file: path of the events file
+        format: 'csv', 'parquet' or 'arrow', guessed from the file extension by default
+    Returns:
+        The CrossingEvents.
+    """
+    format = format or _formats.get(path.splitext(file)[1].lower())
+    if format == 'csv':
+        with open(file, newline='') as stream:
+            rows = list(csv.reader(stream))
+        columns = {name: [row[i] for row in rows[1:]] for i, name in enumerate(rows[0])}
+    elif format in ('parquet', 'arrow'):
+        pyarrow = _import_pyarrow()
+        if format == 'parquet':
+            import pyarrow.parquet
+            table = pyarrow.parquet.read_table(file)
+        else:
+            with pyarrow.memory_map(file, 'r') as source:
+                table = pyarrow.ipc.open_file(source).read_all()
+        columns = {name: table.column(name).to_numpy(zero_copy_only=False) for name in table.column_names}
+    else:
+        raise ValueError("Unknown events file format {}".format(format or file))
+
+    data = np.zeros(len(columns['flyby']), dtype=events_dtype)
+    for name in events_dtype.names:
+        if name != 'position':
+            data[name] = columns[name]
+    data['position'] = np.column_stack([np.asarray(columns[axis], dtype=float) for axis in 'xyz']) \
+        if len(data) else np.zeros((0, 3))
+    return CrossingEvents(data)
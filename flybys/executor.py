@@ -0,0 +1,104 @@
+import os
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from flybys.spice import Spice
+
+
+# Spice methods changing the kernel pool, which would break the kernels loaded by the workers
+_kernel_methods = {'load', 'unload', 'load_metakernel', 'clear', 'session', 'evict'}
+
+
+# barrier of the workers started by the executor, set in every worker by the initializer
+_started = None
+
+
+def _load_kernels(metakernel, started):
+    """Worker initializer loading the kernels in the worker own kernel pool, kept for the worker lifetime.
+    """
+    global _started
+    _started = started
+    Spice.session(metakernel).acquire()
+
+
+def _wait_started():
+    """Blocks until every worker runs this task, so that each one runs it once, after its initializer.
+    """
+    _started.wait()
+
+
+def _call(function, args, kwargs):
+    if isinstance(function, str):
+        function = getattr(Spice(), function)
+    return function(*args, **kwargs)
+
+
+class SpiceExecutor:
+    """Pool of worker processes with the kernels of a metakernel already loaded.
+    CSPICE keeps a single global kernel pool and is not reentrant, so concurrent queries are served by separate
+    processes, each one with its own kernel pool, instead of serializing them behind a lock. Requests are routed to
+    the first idle worker, and can be submitted from any thread or awaited from asyncio tasks, e.g.:
+        with SpiceExecutor(metakernel) as executor:
+            pos = await executor.call('position', 'MPO', et, 'J2000', 'VENUS')
+    Attributes:
+        metakernel: path to the metakernel loaded by every worker
+        processes: number of worker processes
+    """
+
+    def __init__(self, metakernel, processes=None):
+        self.metakernel = os.path.abspath(metakernel)
+        self.processes = processes or os.cpu_count()
+        context = multiprocessing.get_context()
+        started = context.Barrier(self.processes)
+        self._executor = ProcessPoolExecutor(max_workers=self.processes, mp_context=context,
+                                             initializer=_load_kernels, initargs=(self.metakernel, started))
+
+        # start the workers upfront, so that no query pays the kernel loading time: no worker returns from its
+        # barrier task before all the others have loaded their kernels and joined it
+        for future in [self._executor.submit(_wait_started) for _ in range(self.processes)]:
+            future.result()
+
+    def submit(self, function, *args, **kwargs):
+        """Schedules a query on the worker pool.
+        Params:
+            function: name of a Spice method, e.g. 'position', or a module-level function such as
+                `venus_bowshock_crossings`, which runs with the worker kernels already loaded
+            args: positional arguments of the function
+            kwargs: keyword arguments of the function
+        Returns:
+            A concurrent.futures.Future with the result of the query.
+        """
+        if isinstance(function, str):
+            if function.startswith('_') or not hasattr(Spice, function):
+                raise ValueError("Unknown Spice method {}".format(function))
+            if function in _kernel_methods:
+                raise ValueError("Spice method {} cannot be run on the worker pool".format(function))
+        return self._executor.submit(_call, function, args, kwargs)
+
+    def map(self, function, *iterables):
+        """Runs a query for every set of arguments taken from the iterables, like the built-in `map`.
+        Returns:
+            An iterator over the results, in the same order as the arguments.
+        """
+        futures = [self.submit(function, *args) for args in zip(*iterables)]
+        return (future.result() for future in futures)
+
+    async def call(self, function, *args, **kwargs):
+        """Runs a query on the worker pool without blocking the event loop.
+        Params:
+            function: name of a Spice method or a module-level function, see `submit`
+            args: positional arguments of the function
+            kwargs: keyword arguments of the function
+        Returns:
+            The result of the query.
+        """
+        return await asyncio.wrap_future(self.submit(function, *args, **kwargs))
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.shutdown()
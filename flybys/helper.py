@@ -1,5 +1,8 @@
 import numpy as np
 from flybys.spice import Spice
+from flybys.trajectory import Trajectory
+from flybys.events import CrossingEvents
+from flybys import profiling
 
 
 def normalize(v):
@@ -9,32 +12,326 @@ def normalize(v):
     return v / norm
 
 
-def find_switch(condition):
+def find_switch(condition, axis=-1, out=None):
     """Finds the indexes where the condition array elements switch values
     Params:
-        condition: boolean array
+        condition: boolean array, either 1d or multi-dimensional (e.g. models x samples)
+        axis: axis along which the switches are searched for multi-dimensional arrays
+        out: optional boolean array receiving whether every element differs from the previous one along the axis,
+            of the same shape as the condition but one element shorter along the axis. Reusing it between calls
+            saves allocating a full-size temporary array each time.
     Returns:
         Two arrays, one with the indexes where condition elements switch from False to True, and another where they
-        switch from True to False
+        switch from True to False. For multi-dimensional arrays, two tuples of index arrays, one per dimension, as
+        given by `np.nonzero`.
     """
-    condition_prev = np.roll(condition, 1)
-    condition_prev[0] = condition[0]  # to fix circular shift
-    switch, = np.where(condition ^ condition_prev)  # true-to-false/false-to-true
+    condition = np.asarray(condition)
+    axis = axis % condition.ndim
+    before = (slice(None),) * axis
+    switched = np.not_equal(condition[before + (slice(1, None),)], condition[before + (slice(None, -1),)], out=out)
 
-    positive = switch[np.where(condition[switch])]
-    negative = switch[np.where(~condition[switch])]
-    return positive, negative
+    if condition.ndim == 1:
+        switch = np.flatnonzero(switched)
+        switch += 1  # index of the first element with the new value
+        # along a single axis switches alternate between positive and negative
+        first = 0 if len(switch) and condition[switch[0]] else 1
+        return switch[first::2], switch[1 - first::2]
 
+    switch = list(np.nonzero(switched))
+    switch[axis] += 1
+    value = condition[tuple(switch)]
+    return tuple(i[value] for i in switch), tuple(i[~value] for i in switch)
 
-def closest_approach(body, metakernel, utc_start, utc_end):
-    spice = Spice()
-    spice.load_metakernel(metakernel)
 
-    etc = spice.closest_approach('MPO', body, utc_start, utc_end, False, 100)
-    if etc is not None:
-        etc = etc[0]
+def _switch_brackets(rows, out=None):
+    """Returns the row, the index of the first sample with the new value, and the new value of every switch of a 2d
+    condition array along its samples.
+    """
+    (positive_row, positive), (negative_row, negative) = find_switch(rows, 1, out)
+    value = np.concatenate((np.ones(len(positive), dtype=bool), np.zeros(len(negative), dtype=bool)))
+    return np.concatenate((positive_row, negative_row)), np.concatenate((positive, negative)), value
+
+
+def find_transitions(condition, et_start, et_end, step, tolerance):
+    """Finds the times where a time-dependent boolean condition switches values within a time window.
+    The condition is first evaluated on a coarse grid, and every switch found is then refined by bisection of its
+    bracket, all brackets being refined together so that each bisection step is a single condition evaluation.
+    Params:
+        condition: function returning the boolean condition array for an array of ephemeris times, either a 1d
+            array or a 2d array with one row per condition evaluated on the same times (e.g. one per model)
+        et_start: start ephemeris time of the search window
+        et_end: end ephemeris time of the search window
+        step: step size of the coarse grid in seconds. The step must be shorter than the shortest interval over which
+            the condition keeps the same value.
+        tolerance: time tolerance of the switch times in seconds
+    Returns:
+        Two arrays of ephemeris times, one with the times where the condition switches from False to True, and
+        another where it switches from True to False. Each time is the first one, within the tolerance, with the
+        condition at its new value. For 2d conditions, a list with the two arrays of each row.
+    """
+    tt = np.append(np.arange(et_start, et_end, step), et_end)
+    condition_tt = condition(tt)
+    rows = np.atleast_2d(condition_tt)
+
+    row, switch, value = _switch_brackets(rows)
+    hi = _bisect_transitions(condition, tt[switch - 1], tt[switch], row, value, tolerance)
+
+    transitions = [(hi[(row == i) & value], hi[(row == i) & ~value]) for i in range(len(rows))]
+    return transitions[0] if np.ndim(condition_tt) == 1 else transitions
+
+
+def _bisect_transitions(condition, lo, hi, row, value, tolerance):
+    """Refines by bisection brackets [lo, hi] where a condition row switches to the value given at hi, all brackets
+    together, and returns the refined hi times.
+    """
+    bracket = np.arange(len(row))
+    while len(row) and (hi - lo).max() > tolerance:
+        mid = 0.5 * (lo + hi)
+        switched = np.atleast_2d(condition(mid))[row, bracket] == value
+        hi = np.where(switched, mid, hi)
+        lo = np.where(switched, lo, mid)
+    return hi
+
+
+def stream_transitions(condition, et_start, et_end, step, tolerance, chunk_size=86400):
+    """Finds the times where a time-dependent boolean condition switches values, walking the time window in chunks
+    of `chunk_size` samples so that memory use does not depend on the window length. The coarse grid and the
+    refinement are the same as in `find_transitions`, and the condition at the last sample of every chunk is
+    carried over to the next one, so switches at chunk edges are found exactly once.
+    Params:
+        condition: function returning the boolean condition array for an array of ephemeris times, either a 1d
+            array or a 2d array with one row per condition evaluated on the same times
+        et_start: start ephemeris time of the search window
+        et_end: end ephemeris time of the search window
+        step: step size of the coarse grid in seconds
+        tolerance: time tolerance of the switch times in seconds
+        chunk_size: number of coarse grid samples evaluated at once
+    Yields:
+        Tuples (row, et, value) in time order, with the condition row switching, 0 for 1d conditions, the ephemeris
+        time of the switch and the new value of the condition.
+    """
+    n = max(int(np.ceil((et_end - et_start) / step)), 0)  # length of np.arange(et_start, et_end, step)
+    last_tt = last_rows = out = None
+    for first in range(0, n + 1, chunk_size):
+        tt = et_start + np.arange(first, min(first + chunk_size, n)) * step
+        if first + chunk_size > n:
+            tt = np.append(tt, et_end)
+        rows = np.atleast_2d(condition(tt))
+        if last_tt is not None:
+            tt = np.append(last_tt, tt)
+            rows = np.hstack((last_rows, rows))
+
+        if out is None:
+            out = np.empty((len(rows), chunk_size), dtype=bool)  # reused by every chunk
+        row, switch, value = _switch_brackets(rows, out[:, :rows.shape[1] - 1])
+        hi = _bisect_transitions(condition, tt[switch - 1], tt[switch], row, value, tolerance)
+        for i in np.argsort(hi, kind='stable'):
+            yield int(row[i]), hi[i], bool(value[i])
+        last_tt, last_rows = tt[-1:], rows[:, -1:]
+
+
+def crossing_window(spice, body, utc_start, utc_end, method, before, etc=None):
+    """Returns the time window where crossings are searched for.
+    Params:
+        spice: the Spice object
+        body: name of the body
+        utc_start: start time of the applicable time period in UTC format
+        utc_end: end time of the applicable time period in UTC format
+        method: 'grid' for 10000 seconds starting `before` seconds before the closest approach,
+            'adaptive' or 'gf' for the whole applicable time period
+        before: seconds before the closest approach of the grid window
+        etc: ephemeris time of the closest approach, computed if not given
+    Returns:
+        The start and end ephemeris times of the window.
+    """
+    if method == 'grid':
+        if etc is None:
+            etc = approach_time(spice, body, utc_start, utc_end)
+        return etc - before, etc - before + 9999
+    elif method in ('adaptive', 'gf'):
+        return spice.utc2et(utc_start), spice.utc2et(utc_end)
+    raise ValueError("Unknown crossing search method {}".format(method))
+
+
+def covered_windows(spice, bodies, et_start, et_end):
+    """Returns the parts of a time window covered by the SPK kernels of all the bodies given, see `Spice.coverage`.
+    Returns:
+        Array of shape (n, 2) with the start and end ephemeris times of every covered part.
+    """
+    windows = spice.coverage(*bodies).clip(et_start, et_end)
+    if len(windows) == 0:
+        raise ValueError("No SPK coverage of {} between {} and {}".format(
+            ', '.join(bodies), spice.et2utc(et_start), spice.et2utc(et_end)))
+    return windows
+
+
+def approach_time(spice, body, utc_start, utc_end):
+    """Returns the ephemeris time of the closest approach of MPO to a body within a time period, raising a ValueError
+    if the time period is not covered by the SPK kernels.
+    """
+    approaches = spice.closest_approach('MPO', body, utc_start, utc_end, False)
+    if approaches is None:
+        raise ValueError("No SPK coverage of MPO and {} between {} and {}".format(body, utc_start, utc_end))
+    return approaches[0]
+
+
+def position_source(spice, frame, observer, et_start, et_end, trajectory_step=None, windows=None):
+    """Returns the function giving MPO positions for an array of ephemeris times within a time window.
+    Params:
+        spice: the Spice object
+        frame: reference frame of the positions
+        observer: name of the observing body
+        et_start: start ephemeris time of the time window
+        et_end: end ephemeris time of the time window
+        trajectory_step: if given positions are interpolated from a `Trajectory` with nodes every `trajectory_step`
+            seconds, otherwise they are computed by SPICE
+        windows: parts of the time window where positions are needed, e.g. those covered by the SPK kernels, each
+            one with its own trajectory, the whole window by default
+    """
+    if trajectory_step is None:
+        return lambda tt: spice.position('MPO', tt, frame, observer)
+    windows = np.array([[et_start, et_end]]) if windows is None else np.reshape(windows, (-1, 2))
+    with profiling.stage('trajectory'):
+        trajectories = [Trajectory(spice, 'MPO', start, end, frame, observer, trajectory_step)
+                        for start, end in windows]
+
+    def position(tt):
+        with profiling.stage('ephemeris', np.size(tt)) as stage:
+            if len(trajectories) == 1:
+                return stage.output(trajectories[0].position(tt))
+            tt = np.atleast_1d(np.asarray(tt, dtype=float))
+            part = np.clip(np.searchsorted(windows[:, 0], tt, side='right') - 1, 0, len(windows) - 1)
+            vv = np.empty((len(tt), 3))
+            for i in np.unique(part):
+                vv[part == i] = trajectories[i].position(tt[part == i])
+            return stage.output(vv)
+    return position
+
+
+def crossing_times(spice, condition, et_start, et_end, method, step, tolerance, windows=None):
+    """Finds the entry and exit ephemeris times into the region where the condition holds, see `crossings`.
+    Returns:
+        Two arrays of ephemeris times, one with the entry times and another with the exit times, or for 2d conditions
+        a list with the two arrays of each region.
+    """
+    with profiling.stage('crossing_search'):
+        # parts are searched separately, so crossings within the gaps between them are not found
+        windows = [(et_start, et_end)] if windows is None else windows
+        parts = [_crossing_times(spice, condition, start, end, method, step, tolerance) for start, end in windows]
+        if len(parts) == 1:
+            return parts[0]
+        single = isinstance(parts[0], tuple)
+        parts = [[part] for part in parts] if single else parts
+        transitions = [(np.concatenate([part[i][0] for part in parts]), np.concatenate([part[i][1] for part in parts]))
+                       for i in range(len(parts[0]))]
+        return transitions[0] if single else transitions
+
+
+def _crossing_times(spice, condition, et_start, et_end, method, step, tolerance):
+    if method == 'gf':
+        probe = condition(np.array([et_start]))
+        rows = [condition] if np.ndim(probe) == 1 else \
+            [lambda tt, i=i: condition(tt)[i] for i in range(len(probe))]
+        transitions = []
+        for row in rows:
+            intervals = spice.window_intervals(spice.condition_window(row, et_start, et_end, step, tolerance))
+            transitions.append((intervals[intervals[:, 0] > et_start, 0],
+                                intervals[intervals[:, 1] < et_end, 1]))
+        return transitions[0] if np.ndim(probe) == 1 else transitions
+    if method == 'grid':
+        step, tolerance = 1, 1
+    return find_transitions(condition, et_start, et_end, step, tolerance)
+
+
+def crossing_precision(method, tolerance):
+    """Returns the number of decimals of the crossing times, as many as the tolerance of the method requires, up to 9.
+    """
+    return 0 if method == 'grid' else min(9, max(0, int(np.ceil(-np.log10(tolerance)))))
+
+
+def crossings(spice, condition, et_start, et_end, method, step, tolerance, windows=None):
+    """Finds the entry and exit times into the region where the condition holds.
+    Params:
+        spice: the Spice object
+        condition: function returning the boolean condition array for an array of ephemeris times, either a 1d
+            array or a 2d array with one row per region
+        et_start: start ephemeris time of the search window
+        et_end: end ephemeris time of the search window
+        method: 'grid' evaluates the condition every second, 'adaptive' every `step` seconds refining each crossing,
+            and 'gf' runs a SPICE geometry finder search with the given `step`
+        step: step size in seconds of the adaptive and gf methods
+        tolerance: time tolerance in seconds of the adaptive and gf methods
+        windows: array of shape (n, 2) with the parts of the search window to search, e.g. those covered by the SPK
+            kernels, the whole window by default
+    Returns:
+        Two arrays of UTC times, one with the entry times and another with the exit times, or for 2d conditions a
+        list with the two arrays of each region. Times are given with as many decimals as the tolerance requires.
+    """
+    transitions = crossing_times(spice, condition, et_start, et_end, method, step, tolerance, windows)
+    single = isinstance(transitions, tuple)
+    precision = crossing_precision(method, tolerance)
+    with profiling.stage('format') as stage:
+        leapseconds = spice.leapseconds()
+        utc = [(leapseconds.et2utc(_entry, precision), leapseconds.et2utc(_exit, precision))
+               for _entry, _exit in ([transitions] if single else transitions)]
+        stage.add(sum(len(a) + len(b) for a, b in utc), sum(a.nbytes + b.nbytes for a, b in utc))
+    return utc[0] if single else utc
+
+
+def events_table(spice, body, keys, transitions, position, precision):
+    """Builds the columnar record of the crossings found for several regions.
+    Params:
+        spice: the Spice object
+        body: name of the body
+        keys: (boundary, model) key of every region
+        transitions: list with the entry and exit ephemeris time arrays of every region
+        position: function returning the positions in body radii for an array of ephemeris times
+        precision: number of decimals of the UTC times
+    Returns:
+        CrossingEvents sorted by time, with flyby index -1 and no closest approach time.
+    """
+    rows = [(boundary, model, crossing, et) for (boundary, model), (entries, exits) in zip(keys, transitions)
+            for crossing, times in (('entry', entries), ('exit', exits)) for et in times]
+    with profiling.stage('format', len(rows)) as stage:
+        data = np.zeros(len(rows), dtype=CrossingEvents.dtype)
+        data['flyby'] = -1
+        data['body'] = body
+        if rows:
+            data['boundary'], data['model'], data['crossing'], data['et'] = zip(*rows)
+            data['utc'] = spice.leapseconds().et2utc(data['et'], precision)
+            data['position'] = position(data['et'])
+        stage.output(data)
+    return CrossingEvents(data).sort(('et', ))
+
+
+def crossing_events(spice, condition, keys, et_start, et_end, step, tolerance, chunk_size=86400):
+    """Yields the entries and exits into the regions where the condition holds as they are found, walking the time
+    window in chunks, see `stream_transitions`.
+    Params:
+        spice: the Spice object
+        condition: function returning the boolean condition array for an array of ephemeris times, a 2d array with
+            one row per region
+        keys: key tuple of every region, e.g. ('bowshock', 'winslow')
+        et_start: start ephemeris time of the search window
+        et_end: end ephemeris time of the search window
+        step: step size in seconds of the scan
+        tolerance: time tolerance in seconds of the crossing times
+        chunk_size: number of samples evaluated at once
+    Yields:
+        Tuples with the region key followed by the crossing type ('entry' or 'exit') and its UTC time.
+    """
+    precision = crossing_precision('adaptive', tolerance)
+    leapseconds = spice.leapseconds()
+    for row, et, entry in stream_transitions(condition, et_start, et_end, step, tolerance, chunk_size):
+        yield tuple(keys[row]) + ('entry' if entry else 'exit', str(leapseconds.et2utc(et, precision)))
+
+
+def closest_approach(body, metakernel, utc_start, utc_end):
+    with Spice.session(metakernel) as spice:
+        etc = spice.closest_approach('MPO', body, utc_start, utc_end, False)
+        if etc is None:
+            return None
 
-    utc = spice.et2utc(etc)
-    spice.clear()
+        utc = spice.et2utc(etc[0])
     return utc
 
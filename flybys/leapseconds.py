@@ -0,0 +1,185 @@
+import re
+import numpy as np
+
+
+# calendar epoch of ephemeris time zero
+_j2000 = np.datetime64('2000-01-01T12:00:00', 'ns')
+
+_months = {'JAN': '01', 'FEB': '02', 'MAR': '03', 'APR': '04', 'MAY': '05', 'JUN': '06',
+           'JUL': '07', 'AUG': '08', 'SEP': '09', 'OCT': '10', 'NOV': '11', 'DEC': '12'}
+
+# datetime64 unit and its number of decimal places for each number of decimal places of the seconds
+_units = [('s', 0), ('ms', 3), ('ms', 3), ('ms', 3), ('us', 6), ('us', 6), ('us', 6), ('ns', 9), ('ns', 9), ('ns', 9)]
+
+
+def _calendar_seconds(dates):
+    """Returns the seconds of datetime64 dates past the J2000 calendar epoch, not counting leap seconds.
+    """
+    ns = (np.asarray(dates).astype('datetime64[ns]') - _j2000).astype(np.int64)
+    return (ns // 10 ** 9).astype(float) + (ns % 10 ** 9) * 1e-9
+
+
+def _kernel_numbers(content):
+    """Reads the numeric variables assigned in the data blocks of a text kernel.
+    Returns:
+        Dictionary with the list of values of each variable, with dates (e.g. @1972-JAN-1) given as seconds past the
+        J2000 calendar epoch, as they are stored in the kernel pool.
+    """
+    data = ''.join(re.findall(r'\\begindata(.*?)(?:\\begintext|$)', content, flags=re.S))
+    variables = {}
+    for name, operator, values in re.findall(r'([^\s=+()]+)\s*(\+?=)\s*(\([^()]*\)|[^\s()]+)', data):
+        numbers = []
+        for token in re.split(r'[\s,()]+', values):
+            if token.startswith('@'):
+                date = re.sub(r'-([A-Za-z]{3})-', lambda m: '-' + _months[m.group(1).upper()] + '-', token[1:])
+                year, month, day = date.split('T')[0].split('-')
+                date = '{}-{}-{:02d}'.format(year, month, int(day)) + date[len(year + month + day) + 2:]
+                numbers.append(_calendar_seconds(np.datetime64(date)))
+            elif token:
+                numbers.append(float(token.upper().replace('D', 'E')))
+        variables[name] = variables.get(name, []) + numbers if operator == '+=' else numbers
+    return variables
+
+
+class LeapSeconds:
+    """Conversion between ephemeris time and UTC for whole arrays at once, from the parameters of a leapseconds
+    kernel, following the same time model as CSPICE: ET - UTC = DELTA_T_A + DELTA_AT + K sin(E), where DELTA_AT is
+    the number of leap seconds, E = M + EB sin(M) and M = M0 + M1 t.
+    The parameters are read once, e.g. from a file with `LeapSeconds.from_kernel('naif0012.tls')`, and conversions
+    run in NumPy without going through the kernel pool.
+    Attributes:
+        delta_t_a: difference between TDT and TAI in seconds
+        k: amplitude in seconds of the periodic term
+        eb: eccentricity of the heliocentric orbit of the Earth-Moon barycenter
+        m: mean anomaly at J2000 and its rate
+        delta_at: array of leap second counts (TAI - UTC)
+        epochs: array of the UTC epochs, in seconds past the J2000 calendar epoch, where each count starts
+    """
+
+    def __init__(self, delta_t_a, k, eb, m, delta_at, epochs):
+        self.delta_t_a = float(delta_t_a)
+        self.k = float(k)
+        self.eb = float(eb)
+        self.m = np.asarray(m, dtype=float)
+        self.delta_at = np.asarray(delta_at, dtype=float)
+        self.epochs = np.asarray(epochs, dtype=float)
+
+        # TAI seconds, i.e. UTC seconds plus the count, of the start of each count
+        self._starts = self.epochs + self.delta_at
+
+    @classmethod
+    def from_variables(cls, variables):
+        """Builds the conversion from the DELTET variables of a leapseconds kernel.
+        Params:
+            variables: dictionary with the list of values of the DELTET/DELTA_T_A, DELTET/K, DELTET/EB, DELTET/M and
+                DELTET/DELTA_AT variables, with leap second epochs given as seconds past the J2000 calendar epoch
+        """
+        delta_at = np.reshape(variables['DELTET/DELTA_AT'], (-1, 2))
+        return cls(variables['DELTET/DELTA_T_A'][0], variables['DELTET/K'][0], variables['DELTET/EB'][0],
+                   variables['DELTET/M'], delta_at[:, 0], delta_at[:, 1])
+
+    @classmethod
+    def from_kernel(cls, kernel):
+        """Builds the conversion from a leapseconds kernel file, e.g. naif0012.tls.
+        """
+        with open(kernel, 'r') as lsk:
+            variables = _kernel_numbers(lsk.read())
+        for name in ('DELTET/DELTA_T_A', 'DELTET/K', 'DELTET/EB', 'DELTET/M', 'DELTET/DELTA_AT'):
+            if name not in variables:
+                raise ValueError("Leapseconds kernel {} lacks variable {}".format(kernel, name))
+        return cls.from_variables(variables)
+
+    def _periodic(self, t):
+        m = self.m[0] + self.m[1] * t
+        return self.k * np.sin(m + self.eb * np.sin(m))
+
+    def _count(self, tai):
+        """Returns the index of the leap second count applying at TAI seconds, -1 before the first count, when the
+        count is one less than the first one.
+        """
+        return np.searchsorted(self._starts, tai, side='right') - 1
+
+    def _delta_at(self, i):
+        return np.where(i < 0, self.delta_at[0] - 1, self.delta_at[np.maximum(i, 0)])
+
+    def _utc(self, et, scale=None):
+        """Converts ephemeris times into UTC times past the J2000 calendar epoch, rounded to integer units of
+        1 / `scale` seconds if a scale is given. Those within a leap second are given within the last second of the
+        day and flagged.
+        Returns:
+            The array of UTC times and the array of leap second flags.
+        """
+        et = np.atleast_1d(np.asarray(et, dtype=float))
+        periodic = self._periodic(et)
+        i = self._count(et - self.delta_t_a - periodic)
+        utc = et - (self.delta_t_a + self._delta_at(i) + periodic)
+        if scale is None:
+            scale = 1
+        else:
+            # round half up the fraction of second alone, which keeps all its digits
+            seconds = np.floor(utc)
+            utc = seconds.astype(np.int64) * scale + np.floor((utc - seconds) * scale + 0.5).astype(np.int64)
+
+        # the count changes at the end of the leap second, the previous count applying during it
+        following = np.append(self.epochs, np.inf)[i + 1] * scale
+        leap = utc >= following
+        utc = utc - leap * scale
+        ended = leap & (utc >= following)  # rounded up to the start of the next day
+        return np.where(ended, following, utc), leap & ~ended
+
+    def et2utc(self, et, precision=0):
+        """Converts ephemeris times to UTC strings in ISO calendar format, as CSPICE et2utc with the 'ISOC' format.
+        Params:
+            et: ephemeris time or array of ephemeris times
+            precision: number of decimal places of the seconds, up to 9, although double precision ephemeris times
+                only resolve microseconds
+        Returns:
+            UTC string or array of UTC strings, e.g. 2021-08-10T13:51:54.123 for a precision of 3. Epochs within a
+            leap second are given with 60 seconds.
+        """
+        if not 0 <= precision <= 9:
+            raise ValueError("Unsupported precision {}".format(precision))
+        scale = 10 ** precision
+        utc, leap = self._utc(et, scale)
+
+        unit, decimals = _units[precision]
+        dates = _j2000.astype('datetime64[{}]'.format(unit)) + \
+            (utc * 10 ** (decimals - precision)).astype('timedelta64[{}]'.format(unit))
+        strings = np.datetime_as_string(dates, unit=unit).astype('U{}'.format(19 + precision + (precision > 0)))
+        if leap.any():
+            chars = strings.view('U1').reshape(len(strings), -1)
+            chars[leap, 17:19] = ['6', '0']
+        return strings[0] if np.ndim(et) == 0 else strings
+
+    def et2datetime(self, et):
+        """Converts ephemeris times to UTC datetime64 values in nanoseconds. Leap seconds cannot be represented, and
+        epochs within one are given as the start of the next day.
+        """
+        utc, leap = self._utc(et)
+        utc = np.where(leap, np.floor(utc) + 1, utc)
+        dates = _j2000 + np.rint(utc * 1e9).astype(np.int64).astype('timedelta64[ns]')
+        return dates[0] if np.ndim(et) == 0 else dates
+
+    def utc2et(self, utc):
+        """Converts UTC times to ephemeris times, as CSPICE utc2et.
+        Params:
+            utc: UTC time or array of UTC times, either ISO strings such as 2021-08-10T13:51:54.123 (with 60 seconds
+                within a leap second) or datetime64 values
+        Returns:
+            Ephemeris time or array of ephemeris times.
+        """
+        scalar = np.ndim(utc) == 0
+        utc = np.atleast_1d(utc)
+        leap = np.zeros(utc.shape, dtype=bool)
+        if utc.dtype.kind in 'US':
+            utc = np.char.strip(utc.astype('U'))
+            leap = np.char.find(utc, ':60', 16) == 16
+            utc[leap] = np.char.replace(utc[leap], ':60', ':59', 1)
+            utc = utc.astype('datetime64[ns]')
+
+        # within a leap second the count is still the previous one
+        seconds = _calendar_seconds(utc)
+        delta_at = self._delta_at(np.searchsorted(self.epochs, seconds, side='right') - 1)
+        seconds = seconds + leap
+        et = seconds + (self.delta_t_a + delta_at + self._periodic(seconds + self.delta_t_a + delta_at))
+        return et[0] if scalar else et
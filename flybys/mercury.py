@@ -1,98 +1,182 @@
 import numpy as np
 from flybys.spice import Spice
-from flybys.quaternion import Quaternion
-from flybys.helper import normalize, closest_approach, find_switch
+from flybys import profiling
+from flybys.boundaries import BoundarySet, models
+from flybys.solarwind import orbital_speed, aberrate, mean_velocity
+from flybys.helper import closest_approach, crossing_window, crossings, crossing_events, \
+    position_source, crossing_times, crossing_precision, events_table, covered_windows
 
 
-# Winslow et al. 2013
-_bowshock_models = {"slavin": {"l": 2.40, "eps": 1.07, "x0": 0.5},
-                    "winslow": {"l": 2.96, "eps": 1.02, "x0": 0.5}}
-
-_magnetopause_models = {"korth": {"rss": 1.42, "alpha": 0.5}}
-
 _dipole_offset = 479
 
 
-def _inside_bowshock(vv, model):
-    xx = vv[:, 0] - model["x0"]
-    yy = np.sqrt(vv[:, 1] ** 2 + vv[:, 2] ** 2)
-    rr2 = xx ** 2 + yy ** 2
-    theta = np.arctan2(yy, xx)
-    rb = np.divide(model["l"], 1 + model["eps"] * np.cos(theta))
-    rb2 = rb ** 2
-    return rr2 < rb2
-
-
-def _inside_magnetopause(vv, model):
-    xx = vv[:, 0]
-    yy = np.sqrt(vv[:, 1] ** 2 + vv[:, 2] ** 2)
-    rr2 = xx ** 2 + yy ** 2
-    theta = np.arctan2(yy, xx)
-    rm = np.multiply(model["rss"], np.power(np.divide(2, 1 + np.cos(theta)), model["alpha"]))
-    rm2 = rm ** 2
-    return rr2 < rm2
-
-
 def _mso2msm(vv):
     vv[:, 2] = vv[:, 2] - _dipole_offset
     return vv
 
 
-def mercury_closest_approach(metakernel, utc_start, utc_end):
-    return closest_approach('MERCURY', metakernel, utc_start, utc_end)
-
-
-def mercury_bowshock_crossings(metakernel, utc_start, utc_end, model='winslow'):
-    spice = Spice()
-    spice.load_metakernel(metakernel)
-
-    # closest approach
-    etc = spice.closest_approach('MPO', 'MERCURY', utc_start, utc_end, False, 100)[0]
-
-    # compute spacecraft positions in Mercury Solar Magnetospheric coordinates
-    # starting two hours before the closest approach
-    tt = etc - 7200 + np.arange(10000)
-    vv = spice.position('MPO', tt, 'BC_MSM', 'MERCURY')
+def _msm_positions(spice, tt, position=None):
+    """Computes spacecraft positions in Mercury Solar Magnetospheric coordinates, in Mercury radii, optionally from
+    another source of positions in BC_MSM coordinates than SPICE.
+    """
+    vv = spice.position('MPO', tt, 'BC_MSM', 'MERCURY') if position is None else position(tt)
     vv = _mso2msm(vv)
-    vv = vv / spice.body_radius('MERCURY')
-
-    bowshock_model = _bowshock_models.get(model)
-    if bowshock_model is None:
-        raise ValueError("Unknown bowshock model {}".format(model))
+    return vv / spice.body_radius('MERCURY')
 
-    inside = _inside_bowshock(vv, bowshock_model)
-    _entry, _exit = find_switch(inside)
 
-    tte = spice.et2utc(tt[_entry])
-    ttx = spice.et2utc(tt[_exit])
+def _models_condition(bowshock, magnetopause):
+    """Returns the (boundary, model) keys of the boundary models given and the function evaluating whether an array
+    of MSM positions in Mercury radii is inside each model, with one row per model.
+    """
+    boundaries = BoundarySet('MERCURY', [('bowshock', model) for model in bowshock] +
+                             [('magnetopause', model) for model in magnetopause])
 
-    spice.clear()
-    return tte, ttx
+    def inside(vv):
+        with profiling.stage('boundary', len(vv)) as stage:
+            return stage.output(boundaries.inside(vv))
 
+    return boundaries.keys, inside
 
-def mercury_magnetopause_crossings(metakernel, utc_start, utc_end, model='korth'):
-    spice = Spice()
-    spice.load_metakernel(metakernel)
 
-    # closest approach
-    etc = spice.closest_approach('MPO', 'MERCURY', utc_start, utc_end, False, 100)[0]
-
-    # compute spacecraft positions in Mercury Solar Magnetospheric coordinates
-    # starting two hours before the closest approach
-    tt = etc - 7200 + np.arange(10000)
-    vv = spice.position('MPO', tt, 'BC_MSM', 'MERCURY')
-    vv = _mso2msm(vv)
-    vv = vv / spice.body_radius('MERCURY')
-
-    magnetopause_model = _magnetopause_models.get(model)
-    if magnetopause_model is None:
-        raise ValueError("Unknown magnetopause model {}".format(model))
-
-    inside = _inside_magnetopause(vv, magnetopause_model)
-    _entry, _exit = find_switch(inside)
+def mercury_closest_approach(metakernel, utc_start, utc_end):
+    return closest_approach('MERCURY', metakernel, utc_start, utc_end)
 
-    tte = spice.et2utc(tt[_entry])
-    ttx = spice.et2utc(tt[_exit])
 
-    spice.clear()
-    return tte, ttx
+def mercury_crossings(metakernel, utc_start, utc_end, bowshock=None, magnetopause=None, method='grid', step=60.,
+                      tolerance=1., trajectory_step=None, events=False, aberration=False, solar_wind=None):
+    """Finds the bowshock and magnetopause crossings of MPO during a Mercury flyby for several models at once.
+    The trajectory is sampled and transformed once, and every model is evaluated against it in a single vectorized
+    operation per boundary.
+    Params:
+        metakernel: path to the metakernel
+        utc_start: start time of the applicable time period in UTC format, e.g. 2021-10-01T00:00:00
+        utc_end: end time of the applicable time period in UTC format, e.g. 2021-10-02T23:59:00
+        bowshock: list of bowshock model names, all of them by default
+        magnetopause: list of magnetopause model names, all of them by default
+        method: 'grid' samples every second during 10000 seconds starting two hours before the closest approach,
+            'adaptive' scans the whole applicable time period every `step` seconds and refines every crossing found
+            down to `tolerance` seconds, and 'gf' runs the same search with the SPICE geometry finder
+        step: step size in seconds of the adaptive and gf methods, shorter than the shortest time spent inside or
+            outside
+        tolerance: time tolerance in seconds of the adaptive and gf methods
+        trajectory_step: if given, positions are interpolated from a cubic Hermite trajectory with nodes every
+            `trajectory_step` seconds across the search window instead of being computed by SPICE
+        events: if true the crossings are returned as CrossingEvents, with their MSM positions in Mercury radii
+        aberration: if true corrects MSM coordinates from solar-wind aberration, as given by the solar wind velocity
+            of every sample if known, otherwise by a mean solar wind velocity and the orbital velocity of Mercury
+        solar_wind: optional SolarWind time series, whose velocity sets the aberration angle of every sample and
+            whose dynamic pressure scales the boundaries of every sample
+    Returns:
+        Dictionary with the entry and exit UTC time arrays of each (boundary, model) pair,
+        e.g. {('bowshock', 'winslow'): (entries, exits)}, or the CrossingEvents of all of them.
+    """
+    bowshock = list(models('MERCURY', 'bowshock')) if bowshock is None else list(bowshock)
+    magnetopause = list(models('MERCURY', 'magnetopause')) if magnetopause is None else list(magnetopause)
+    keys, inside_models = _models_condition(bowshock, magnetopause)
+
+    with profiling.stage('mercury_crossings'), Spice.session(metakernel) as spice:
+        et_start, et_end = crossing_window(spice, 'MERCURY', utc_start, utc_end, method, 7200)
+        windows = covered_windows(spice, ('MPO', 'MERCURY', 'SUN'), et_start, et_end)
+        et_start, et_end = windows[0, 0], windows[-1, 1]
+        position = position_source(spice, 'BC_MSM', 'MERCURY', et_start, et_end, trajectory_step, windows)
+        speed = orbital_speed(spice, 'MERCURY', 0.5 * (et_start + et_end)) if aberration else None
+
+        def msm_positions(tt):
+            vv = _msm_positions(spice, tt, position)
+            if aberration:
+                with profiling.stage('rotation', len(vv)) as stage:
+                    angle = -np.arctan2(speed, mean_velocity) if solar_wind is None or solar_wind.velocity is None \
+                        else solar_wind.aberration(spice, tt, speed)
+                    vv = stage.output(aberrate(vv, angle))
+            return vv
+
+        def inside(tt):
+            vv = msm_positions(tt)
+            if solar_wind is not None and solar_wind.pressure is not None:
+                vv = vv / np.reshape(solar_wind.scale(spice, tt, 'MERCURY'), (-1, 1))
+            return inside_models(vv)
+
+        if events:
+            transitions = crossing_times(spice, inside, et_start, et_end, method, step, tolerance, windows)
+            return events_table(spice, 'MERCURY', keys, transitions, msm_positions,
+                                crossing_precision(method, tolerance))
+        result = crossings(spice, inside, et_start, et_end, method, step, tolerance, windows)
+
+    return dict(zip(keys, result))
+
+
+def mercury_crossing_events(metakernel, utc_start, utc_end, bowshock=None, magnetopause=None, step=60.,
+                            tolerance=1., chunk_size=86400):
+    """Finds the bowshock and magnetopause crossings of MPO over an arbitrarily long time period, walking it in
+    chunks so that memory use stays constant, and yields every crossing as soon as it is found.
+    Params:
+        metakernel: path to the metakernel
+        utc_start: start time of the time period in UTC format, e.g. 2021-10-01T00:00:00
+        utc_end: end time of the time period in UTC format, e.g. 2022-10-01T00:00:00
+        bowshock: list of bowshock model names, all of them by default
+        magnetopause: list of magnetopause model names, all of them by default
+        step: step size in seconds of the scan, shorter than the shortest time spent inside or outside
+        tolerance: time tolerance in seconds of the crossing times
+        chunk_size: number of samples evaluated at once
+    Yields:
+        Tuples (boundary, model, crossing, utc), with crossing either 'entry' or 'exit', in time order for every
+        model.
+    """
+    bowshock = list(models('MERCURY', 'bowshock')) if bowshock is None else list(bowshock)
+    magnetopause = list(models('MERCURY', 'magnetopause')) if magnetopause is None else list(magnetopause)
+    keys, inside_models = _models_condition(bowshock, magnetopause)
+
+    with Spice.session(metakernel) as spice:
+        def inside(tt):
+            return inside_models(_msm_positions(spice, tt))
+
+        for et_start, et_end in covered_windows(spice, ('MPO', 'MERCURY', 'SUN'), spice.utc2et(utc_start),
+                                                spice.utc2et(utc_end)):
+            yield from crossing_events(spice, inside, keys, et_start, et_end, step, tolerance, chunk_size)
+
+
+def mercury_bowshock_crossings(metakernel, utc_start, utc_end, model='winslow', method='grid', step=60.,
+                               tolerance=1., trajectory_step=None, events=False, aberration=False, solar_wind=None):
+    """Finds the bowshock crossings of MPO during a Mercury flyby.
+    Params:
+        metakernel: path to the metakernel
+        utc_start: start time of the applicable time period in UTC format, e.g. 2021-10-01T00:00:00
+        utc_end: end time of the applicable time period in UTC format, e.g. 2021-10-02T23:59:00
+        model: name of the bowshock model
+        method: 'grid', 'adaptive' or 'gf', see `mercury_crossings`
+        step: step size in seconds of the adaptive and gf methods
+        tolerance: time tolerance in seconds of the adaptive and gf methods
+        trajectory_step: step size in seconds of the interpolated trajectory, see `mercury_crossings`
+        events: if true the crossings are returned as CrossingEvents, see `mercury_crossings`
+        aberration: if true corrects MSM coordinates from solar-wind aberration, see `mercury_crossings`
+        solar_wind: optional SolarWind time series, see `mercury_crossings`
+    Returns:
+        Two arrays of UTC times, with the bowshock entry and exit times respectively, or the CrossingEvents.
+    """
+    result = mercury_crossings(metakernel, utc_start, utc_end, [model], [], method, step, tolerance, trajectory_step,
+                               events, aberration, solar_wind)
+    return result if events else result[('bowshock', model)]
+
+
+def mercury_magnetopause_crossings(metakernel, utc_start, utc_end, model='korth', method='grid', step=60.,
+                                   tolerance=1., trajectory_step=None, events=False, aberration=False,
+                                   solar_wind=None):
+    """Finds the magnetopause crossings of MPO during a Mercury flyby.
+    Params:
+        metakernel: path to the metakernel
+        utc_start: start time of the applicable time period in UTC format, e.g. 2021-10-01T00:00:00
+        utc_end: end time of the applicable time period in UTC format, e.g. 2021-10-02T23:59:00
+        model: name of the magnetopause model
+        method: 'grid', 'adaptive' or 'gf', see `mercury_crossings`
+        step: step size in seconds of the adaptive and gf methods
+        tolerance: time tolerance in seconds of the adaptive and gf methods
+        trajectory_step: step size in seconds of the interpolated trajectory, see `mercury_crossings`
+        events: if true the crossings are returned as CrossingEvents, see `mercury_crossings`
+        aberration: if true corrects MSM coordinates from solar-wind aberration, see `mercury_crossings`
+        solar_wind: optional SolarWind time series, see `mercury_crossings`
+    Returns:
+        Two arrays of UTC times, with the magnetopause entry and exit times respectively, or the CrossingEvents.
+    """
+    result = mercury_crossings(metakernel, utc_start, utc_end, [], [model], method, step, tolerance, trajectory_step,
+                               events, aberration, solar_wind)
+    return result if events else result[('magnetopause', model)]
@@ -0,0 +1,232 @@
+"""Opt-in profiling of the stages of the crossing pipeline.
+Instrumented code opens stages, e.g. `with profiling.stage('ephemeris', len(et)) as s:`, declares the arrays they
+produce with `s.output(array)` and counts the SPICE calls it makes with `profiling.count('spkpos')`. While no sink is
+installed stages are a shared no-op object and counts return at once, so the instrumentation costs a function call.
+Once a sink is installed, every stage reports a record with its wall time, samples processed, bytes of the arrays it
+produced and SPICE calls, those of its nested stages included:
+    with profiling.profile(profiling.MemorySink()) as sink:
+        mercury_crossings(metakernel, utc_start, utc_end, method='adaptive')
+    print(sink.totals())
+Setting the FLYBYS_PROFILE environment variable to a file path installs a JsonLinesSink appending to it at import,
+which also profiles the worker processes of batch runs.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+
+_sinks = []
+
+# stack of the stages running in every thread
+_local = threading.local()
+
+
+def _stack():
+    stack = getattr(_local, 'stack', None)
+    if stack is None:
+        stack = _local.stack = []
+    return stack
+
+
+class _Stage:
+    """Running stage, see `stage`.
+    """
+
+    __slots__ = ('name', 'samples', 'nbytes', 'calls', 'start', 'path')
+
+    def __init__(self, name, samples, nbytes):
+        self.name = name
+        self.samples = int(samples)
+        self.nbytes = int(nbytes)
+        self.calls = {}
+        self.start = None
+        self.path = name
+
+    def add(self, samples=0, nbytes=0):
+        """Adds samples processed and bytes produced to the stage.
+        """
+        self.samples += int(samples)
+        self.nbytes += int(nbytes)
+
+    def output(self, array):
+        """Adds the bytes of an array produced by the stage, and returns the array.
+        """
+        self.nbytes += array.nbytes
+        return array
+
+    def __enter__(self):
+        stack = _stack()
+        if stack:
+            self.path = stack[-1].path + '/' + self.name
+        stack.append(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        seconds = time.perf_counter() - self.start
+        stack = _stack()
+        stack.pop()
+        if stack:
+            parent = stack[-1].calls
+            for call, n in self.calls.items():
+                parent[call] = parent.get(call, 0) + n
+
+        record = {'stage': self.name, 'path': self.path, 'seconds': seconds, 'samples': self.samples,
+                  'bytes': self.nbytes, 'spice_calls': dict(self.calls)}
+        for sink in list(_sinks):
+            sink.emit(record)
+
+
+class _NullStage:
+    """Stage returned while profiling is disabled, doing nothing.
+    """
+
+    __slots__ = ()
+
+    def add(self, samples=0, nbytes=0):
+        pass
+
+    def output(self, array):
+        return array
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        pass
+
+
+_null_stage = _NullStage()
+
+
+def stage(name, samples=0, nbytes=0):
+    """Returns a context manager timing a stage of the pipeline.
+    Params:
+        name: name of the stage, e.g. 'ephemeris'
+        samples: number of samples processed by the stage, more can be added with `add`
+        nbytes: number of bytes of the arrays produced by the stage, more can be added with `add`
+    Returns:
+        The stage, or a no-op stage when profiling is disabled.
+    """
+    return _Stage(name, samples, nbytes) if _sinks else _null_stage
+
+
+def count(call, n=1):
+    """Counts calls into SPICE, attributed to the innermost stage running.
+    Params:
+        call: name of the SPICE routine, e.g. 'spkpos'
+        n: number of calls
+    """
+    if _sinks:
+        stack = _stack()
+        if stack:
+            calls = stack[-1].calls
+            calls[call] = calls.get(call, 0) + n
+
+
+def enabled():
+    """Returns whether any sink is installed.
+    """
+    return bool(_sinks)
+
+
+def add_sink(sink):
+    """Installs a sink, an object with an `emit(record)` method receiving the record of every stage finished.
+    """
+    _sinks.append(sink)
+    return sink
+
+
+def remove_sink(sink):
+    if sink in _sinks:
+        _sinks.remove(sink)
+
+
+@contextmanager
+def profile(sink):
+    """Installs a sink for the duration of a block.
+    Yields:
+        The sink.
+    """
+    add_sink(sink)
+    try:
+        yield sink
+    finally:
+        remove_sink(sink)
+
+
+class MemorySink:
+    """Sink keeping the records in memory, mostly for tests and interactive use.
+    Attributes:
+        records: list of the records received
+    """
+
+    def __init__(self):
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+    def totals(self):
+        """Returns the totals of every stage by name: number of runs, seconds, samples, bytes and SPICE calls.
+        Nested runs of a stage within itself are counted once.
+        """
+        totals = {}
+        for record in self.records:
+            if record['stage'] in record['path'].split('/')[:-1]:
+                continue
+            total = totals.setdefault(record['stage'], {'count': 0, 'seconds': 0., 'samples': 0, 'bytes': 0,
+                                                        'spice_calls': {}})
+            total['count'] += 1
+            total['seconds'] += record['seconds']
+            total['samples'] += record['samples']
+            total['bytes'] += record['bytes']
+            for call, n in record['spice_calls'].items():
+                total['spice_calls'][call] = total['spice_calls'].get(call, 0) + n
+        return totals
+
+    def clear(self):
+        self.records = []
+
+
+class LoggingSink:
+    """Sink logging every record, by default at debug level to the flybys.profiling logger.
+    """
+
+    def __init__(self, logger=None, level=logging.DEBUG):
+        self.logger = logger or logging.getLogger(__name__)
+        self.level = level
+
+    def emit(self, record):
+        if self.logger.isEnabledFor(self.level):
+            self.logger.log(self.level, '%s %.6f s, %d samples, %d bytes, SPICE calls %s', record['path'],
+                            record['seconds'], record['samples'], record['bytes'], record['spice_calls'])
+
+
+class JsonLinesSink:
+    """Sink appending every record as a JSON line to a file, together with the process identifier.
+    """
+
+    def __init__(self, file):
+        self.file = file
+        self._stream = open(file, 'a')
+
+    def emit(self, record):
+        self._stream.write(json.dumps(dict(record, pid=os.getpid())) + '\n')
+        self._stream.flush()
+
+    def close(self):
+        self._stream.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+if os.environ.get('FLYBYS_PROFILE'):
+    add_sink(JsonLinesSink(os.environ['FLYBYS_PROFILE']))
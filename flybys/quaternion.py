@@ -62,10 +62,25 @@ class Quaternion:
                 or 3-vector specified as any ordered sequence of 3 real numbers corresponding to
                 x, y, and z values (can be either a numpy array, list or tuple).
         Returns:
-            The rotated vector returned as the same type it was specified at input.
+            A 2d Numpy array with the rotated 3-vectors stacked vertically. All vectors are rotated at once
+            through the equivalent rotation matrix, and the Quaternion object is not modified.
+        """
+        vv = np.asarray(v).reshape((1, 3)) if np.shape(v) == (3, ) else np.asarray(v)
+        return np.dot(vv, self.rotation_matrix().T)
+
+    def rotation_matrix(self):
+        """Returns the 3x3 rotation matrix equivalent to the rotation stored in the Quaternion object.
+        The quaternion is normalized on a copy, so the Quaternion object itself is left unchanged.
+        Returns:
+            The rotation matrix as a 3x3 Numpy array.
         """
-        vv = np.asarray(v).reshape((1, 3)) if np.shape(v) == (3, ) else v
-        return np.apply_along_axis(Quaternion._rotate_vector, 1, vv, self)
+        n = np.linalg.norm(self.q)
+        if n == 0:
+            raise ValueError('A zero-norm quaternion cannot be normalized')
+        w, x, y, z = self.q / n
+        return np.array([[1 - 2 * (y * y + z * z), 2 * (x * y - w * z), 2 * (x * z + w * y)],
+                         [2 * (x * y + w * z), 1 - 2 * (x * x + z * z), 2 * (y * z - w * x)],
+                         [2 * (x * z - w * y), 2 * (y * z + w * x), 1 - 2 * (x * x + y * y)]])
 
     @staticmethod
     def multiply(q1, q2):
@@ -76,6 +91,8 @@ class Quaternion:
             q[2] = q1.q[0] * q2.q[2] + q1.q[2] * q2.q[0] + q1.q[3] * q2.q[1] - q1.q[1] * q2.q[3]
             q[3] = q1.q[0] * q2.q[3] + q1.q[3] * q2.q[0] + q1.q[1] * q2.q[2] - q1.q[2] * q2.q[1]
             return Quaternion(q)
+        if isinstance(q1, (Quaternion, QuaternionArray)) and isinstance(q2, (Quaternion, QuaternionArray)):
+            return QuaternionArray.multiply(q1, q2)
 
     @staticmethod
     def _rotate_vector(v, q):
@@ -86,9 +103,7 @@ class Quaternion:
         Returns:
             The rotated vector returned as the same type it was specified at input.
         """
-        p = Quaternion(np.hstack((0, np.asarray(v))))
-        q.normalize()
-        vp = Quaternion.multiply(Quaternion.multiply(q, p), q.inverse()).vector()
+        vp = q.rotate(v)[0]
 
         if isinstance(v, list):
             return [x for x in vp]
@@ -206,4 +221,242 @@ class Quaternion:
             "{:" + format_spec + "}i " + \
             "{:" + format_spec + "}j " + \
             "{:" + format_spec + "}k"
-        return string.format(self.q[0], self.q[1], self.q[2], self.q[3])
\ No newline at end of file
+        return string.format(self.q[0], self.q[1], self.q[2], self.q[3])
+
+
+class QuaternionArray:
+    """Class to represent an array of N quaternions.
+    The quaternions are stored in a single contiguous (N, 4) Numpy array, and every operation is applied to all of
+    them at once, so attitude time series can be handled without creating one Quaternion object per sample.
+    Operations between a QuaternionArray and a single Quaternion broadcast the single Quaternion over the array.
+    Attributes:
+        q: Quaternion array represented as a (N, 4) Numpy array of floats
+    """
+
+    def __init__(self, *args, **kwargs):
+        s = len(args)
+        if s == 0:
+            if ("axis" in kwargs) and (("degrees" in kwargs) or ("radians" in kwargs)):
+                angle = kwargs["radians"] if "radians" in kwargs else np.radians(kwargs["degrees"])
+                self.q = QuaternionArray.from_axis_angle(kwargs["axis"], angle).q
+            elif "matrix" in kwargs:
+                self.q = QuaternionArray.from_matrix(kwargs["matrix"]).q
+            else:
+                self.q = np.zeros((0, 4))
+        elif s == 1:
+            self.q = self._to_valid_array(args[0])
+        else:
+            raise TypeError("QuaternionArray cannot be initialised with multiple arguments")
+
+    def normalize(self):
+        n = np.linalg.norm(self.q, axis=1)
+        if (n > 0).all():
+            self.q = self.q / n[:, np.newaxis]
+        else:
+            raise ValueError('A zero-norm quaternion cannot be normalized')
+
+    def conjugate(self):
+        q = self.q.copy()
+        q[:, 1:] = -q[:, 1:]
+        return QuaternionArray(q)
+
+    def inverse(self):
+        q_inverse = self.conjugate()
+        n2 = np.einsum('ij,ij->i', self.q, self.q)
+        if (n2 > 0).all():
+            q_inverse.q = q_inverse.q / n2[:, np.newaxis]
+            return q_inverse
+        else:
+            raise ValueError('A zero-norm quaternion cannot be inverted')
+
+    def scalar(self):
+        return self.q[:, 0]
+
+    def vector(self):
+        return self.q[:, 1:]
+
+    def rotate(self, v):
+        """Rotate 3-vectors by the rotations stored in the QuaternionArray object.
+        Params:
+            v: A 2d array of N 3-vectors stacked vertically, each one rotated by the quaternion with the same index,
+                or a single 3-vector rotated by every quaternion in the array.
+        Returns:
+            A (N, 3) Numpy array with the rotated vectors.
+        """
+        vv = np.asarray(v, dtype=float)
+        return np.matmul(self.rotation_matrix(), vv[..., np.newaxis])[..., 0]
+
+    def rotation_matrix(self):
+        """Returns the rotation matrices equivalent to the rotations stored in the QuaternionArray object.
+        The quaternions are normalized on a copy, so the QuaternionArray object itself is left unchanged.
+        Returns:
+            The rotation matrices as a (N, 3, 3) Numpy array.
+        """
+        n = np.linalg.norm(self.q, axis=1)
+        if not (n > 0).all():
+            raise ValueError('A zero-norm quaternion cannot be normalized')
+        w, x, y, z = (self.q / n[:, np.newaxis]).T
+        return np.stack((1 - 2 * (y * y + z * z), 2 * (x * y - w * z), 2 * (x * z + w * y),
+                         2 * (x * y + w * z), 1 - 2 * (x * x + z * z), 2 * (y * z - w * x),
+                         2 * (x * z - w * y), 2 * (y * z + w * x), 1 - 2 * (x * x + y * y)), axis=1).reshape((-1, 3, 3))
+
+    def interpolate(self, times, new_times):
+        """Interpolates an attitude time series with spherical linear interpolation.
+        Params:
+            times: increasing sample times of the quaternions in the array, one per quaternion
+            new_times: times at which the interpolated quaternions are computed. Times outside the sampled range are
+                extrapolated from the first or last pair of samples.
+        Returns:
+            A QuaternionArray with one unit quaternion per new time.
+        """
+        times = np.asarray(times, dtype=float)
+        new_times = np.atleast_1d(np.asarray(new_times, dtype=float))
+        if times.shape != (len(self), ) or len(self) < 2:
+            raise ValueError("Interpolation needs at least two quaternions and one time per quaternion")
+        i = np.clip(np.searchsorted(times, new_times, side='right') - 1, 0, len(times) - 2)
+        t = (new_times - times[i]) / (times[i + 1] - times[i])
+        return QuaternionArray.slerp(self.q[i], self.q[i + 1], t)
+
+    @staticmethod
+    def multiply(q1, q2):
+        """Hamilton product of two quaternion arrays of the same length, or of a quaternion array and a single
+        quaternion, which is then multiplied with every quaternion in the array.
+        """
+        p = QuaternionArray._as_array(q1)
+        r = QuaternionArray._as_array(q2)
+        q = np.empty(np.broadcast(p, r).shape)
+        q[:, 0] = p[:, 0] * r[:, 0] - p[:, 1] * r[:, 1] - p[:, 2] * r[:, 2] - p[:, 3] * r[:, 3]
+        q[:, 1] = p[:, 0] * r[:, 1] + p[:, 1] * r[:, 0] + p[:, 2] * r[:, 3] - p[:, 3] * r[:, 2]
+        q[:, 2] = p[:, 0] * r[:, 2] + p[:, 2] * r[:, 0] + p[:, 3] * r[:, 1] - p[:, 1] * r[:, 3]
+        q[:, 3] = p[:, 0] * r[:, 3] + p[:, 3] * r[:, 0] + p[:, 1] * r[:, 2] - p[:, 2] * r[:, 1]
+        return QuaternionArray(q)
+
+    @staticmethod
+    def slerp(q1, q2, t):
+        """Spherical linear interpolation between two sets of rotations, always along the shortest path.
+        Params:
+            q1: rotations at t = 0, as a QuaternionArray, a Quaternion or a (N, 4) array
+            q2: rotations at t = 1, as a QuaternionArray, a Quaternion or a (N, 4) array
+            t: interpolation parameter, either a scalar or an array with one value per quaternion
+        Returns:
+            A QuaternionArray with the interpolated unit quaternions.
+        """
+        p = QuaternionArray(QuaternionArray._as_array(q1))
+        r = QuaternionArray(QuaternionArray._as_array(q2))
+        p.normalize()
+        r.normalize()
+        t = np.asarray(t, dtype=float).reshape((-1, 1))
+
+        dot = np.sum(p.q * r.q, axis=1, keepdims=True)
+        r.q = np.where(dot < 0, -r.q, r.q)  # q and -q represent the same rotation
+        dot = np.minimum(np.abs(dot), 1.0)
+
+        theta = np.arccos(dot)
+        sin_theta = np.sin(theta)
+        linear = sin_theta < 1e-6  # nearly identical rotations
+        sin_theta[linear] = 1.0
+        s1 = np.where(linear, 1 - t, np.sin((1 - t) * theta) / sin_theta)
+        s2 = np.where(linear, t, np.sin(t * theta) / sin_theta)
+
+        q = QuaternionArray(s1 * p.q + s2 * r.q)
+        q.normalize()
+        return q
+
+    @classmethod
+    def from_axis_angle(cls, axis, angle):
+        """Builds the quaternions of rotations around the given axes.
+        Params:
+            axis: a (N, 3) array of rotation axes, or a single axis shared by all the rotations
+            angle: rotation angles in radians, either a scalar or an array with one angle per axis
+        """
+        axis = np.atleast_2d(np.asarray(axis, dtype=float))
+        angle = np.asarray(angle, dtype=float).reshape((-1, 1))
+        n = np.linalg.norm(axis, axis=1, keepdims=True)
+        if (n == 0.0).any():
+            raise ZeroDivisionError("Rotation axis has zero length")
+
+        # normalize axis
+        axis = np.where(np.abs(1.0 - n) > 1e-12, axis / n, axis)
+
+        theta = angle / 2.0
+        vector = np.sin(theta) * axis
+        return cls(np.hstack((np.broadcast_to(np.cos(theta), (len(vector), 1)), vector)))
+
+    @classmethod
+    def from_matrix(cls, matrix):
+        """Builds the quaternions equivalent to the given rotation matrices.
+        Params:
+            matrix: a (N, 3, 3) array of rotation matrices, or a single 3x3 rotation matrix
+        """
+        m = np.asarray(matrix, dtype=float).reshape((-1, 3, 3))
+        a = m[:, 2, 1] - m[:, 1, 2]
+        b = m[:, 0, 2] - m[:, 2, 0]
+        c = m[:, 1, 0] - m[:, 0, 1]
+        e = m[:, 0, 1] + m[:, 1, 0]
+        f = m[:, 0, 2] + m[:, 2, 0]
+        g = m[:, 1, 2] + m[:, 2, 1]
+        zero = np.zeros(len(m))
+
+        # same case analysis as Quaternion._from_matrix, picking for each matrix the first component
+        # whose magnitude is large enough to divide by
+        cases = [((1, 1, 1), (zero, a, b, c)),
+                 ((1, -1, -1), (a, zero, e, f)),
+                 ((-1, 1, -1), (b, e, zero, g)),
+                 ((-1, -1, 1), (c, f, g, zero))]
+        q = np.zeros((len(m), 4))
+        pending = np.ones(len(m), dtype=bool)
+        tol = 0.01
+        for k, (signs, terms) in enumerate(cases):
+            d = 0.5 * np.sqrt(np.maximum(1 + signs[0] * m[:, 0, 0] + signs[1] * m[:, 1, 1] + signs[2] * m[:, 2, 2],
+                                         0))
+            selected = pending & (d > tol)
+            q[selected] = 0.25 / d[selected, np.newaxis] * np.stack(terms, axis=1)[selected]
+            q[selected, k] = d[selected]
+            pending &= ~selected
+        return cls(q)
+
+    @staticmethod
+    def _as_array(q):
+        if isinstance(q, (Quaternion, QuaternionArray)):
+            return np.atleast_2d(q.q)
+        return QuaternionArray._to_valid_array(q)
+
+    @staticmethod
+    def _to_valid_array(array):
+        if isinstance(array, QuaternionArray):
+            return array.q.copy()
+        if isinstance(array, Quaternion):
+            return np.array([array.q], dtype=float)
+        if isinstance(array, (list, tuple)) and array and all(isinstance(q, Quaternion) for q in array):
+            return np.array([q.q for q in array], dtype=float)
+        if Quaternion._is_numeric_array(array):
+            q = np.atleast_2d(np.asarray(array))
+            if q.ndim == 2 and q.shape[1] == 4:
+                return np.ascontiguousarray(q, dtype=float)
+        raise TypeError("Input {} is not a valid (N, 4) array".format(array))
+
+    def __len__(self):
+        return len(self.q)
+
+    def __getitem__(self, item):
+        if isinstance(item, (int, np.integer)):
+            return Quaternion(self.q[item])
+        return QuaternionArray(self.q[item])
+
+    def __eq__(self, other):
+        if isinstance(other, QuaternionArray):
+            return self.q.shape == other.q.shape and (self.q == other.q).all()
+        return False
+
+    def __hash__(self):
+        return hash(self.q.tobytes())
+
+    def __str__(self):
+        """An informal, nicely printable string representation of the QuaternionArray object, one quaternion per line.
+        """
+        return "\n".join(str(Quaternion(q)) for q in self.q)
+
+    def __repr__(self):
+        """The 'official' string representation of the QuaternionArray object.
+        """
+        return "QuaternionArray({!r})".format(self.q.tolist())
@@ -0,0 +1,135 @@
+"""Upstream solar wind conditions varying in time, which drive the boundaries of the crossing functions:
+- the solar wind velocity sets the aberration angle of every sample, -arctan(v_orbital / v_sw), instead of a fixed
+  angle, the orbital velocity being that of the body around the Sun;
+- the dynamic pressure scales the boundaries of every sample by (p / p_reference)^(-1/6), as from the pressure
+  balance with a dipole field, which is evaluated by scaling the positions instead.
+"""
+import csv
+import os.path as path
+import numpy as np
+from flybys.events import _import_pyarrow
+
+
+# mean dynamic pressure in nPa at 1 AU, about 2 nPa, scaled with the inverse square of the mean distance to the Sun,
+# taken as the conditions the static boundary models hold for
+reference_pressures = {'VENUS': 3.8, 'MERCURY': 13.4}
+
+# mean solar wind speed in km/s
+mean_velocity = 400.
+
+_formats = {'.csv': 'csv', '.parquet': 'parquet'}
+
+
+class SolarWind:
+    """Time series of upstream solar wind conditions, linearly interpolated at the epochs of every sample, and held
+    constant outside the time series.
+    Attributes:
+        times: ephemeris times, or UTC times as ISO strings or datetime64 values, increasing
+        velocity: array of solar wind speeds in km/s, or None
+        pressure: array of solar wind dynamic pressures in nPa, or None
+        reference: dynamic pressure in nPa of the static boundary models, by default the one of the body in
+            `reference_pressures`
+        exponent: exponent of the scaling of the boundaries with the dynamic pressure
+    """
+
+    def __init__(self, times, velocity=None, pressure=None, reference=None, exponent=-1 / 6):
+        self.times = np.atleast_1d(times)
+        self.velocity = None if velocity is None else np.asarray(velocity, dtype=float)
+        self.pressure = None if pressure is None else np.asarray(pressure, dtype=float)
+        self.reference = reference
+        self.exponent = exponent
+        if self.velocity is None and self.pressure is None:
+            raise ValueError("No solar wind velocity nor pressure given")
+        for values in (self.velocity, self.pressure):
+            if values is not None and values.shape != self.times.shape:
+                raise ValueError("Solar wind series of {} values for {} times".format(len(values), len(self.times)))
+
+        self._et = None if self.times.dtype.kind in 'USM' else self.times.astype(float)
+        if self._et is not None and np.any(np.diff(self._et) < 0):
+            raise ValueError("Solar wind times are not increasing")
+
+    @classmethod
+    def from_file(cls, file, format=None, time='utc', velocity='velocity', pressure='pressure', **kwargs):
+        """Reads the time series from a CSV or Parquet file (the latter needs pyarrow), with one row per epoch.
+        Params:
+            file: path of the file
+            format: 'csv' or 'parquet', guessed from the file extension by default
+            time: name of the column of times, either ephemeris times, ISO UTC strings or timestamps
+            velocity: name of the column of solar wind speeds in km/s, ignored if missing
+            pressure: name of the column of dynamic pressures in nPa, ignored if missing
+            kwargs: further arguments of `SolarWind`, i.e. reference and exponent
+        """
+        format = format or _formats.get(path.splitext(file)[1].lower())
+        if format == 'csv':
+            with open(file, newline='') as stream:
+                rows = list(csv.reader(stream))
+            columns = {name: np.array([row[i] for row in rows[1:]]) for i, name in enumerate(rows[0])}
+            for name in (velocity, pressure):
+                if name in columns:
+                    columns[name] = columns[name].astype(float)
+            try:
+                columns[time] = columns[time].astype(float)
+            except (KeyError, ValueError):
+                pass
+        elif format == 'parquet':
+            _import_pyarrow()
+            import pyarrow.parquet
+            table = pyarrow.parquet.read_table(file)
+            columns = {name: table.column(name).to_numpy(zero_copy_only=False) for name in table.column_names}
+        else:
+            raise ValueError("Unknown solar wind file format {}".format(format or file))
+
+        if time not in columns:
+            raise ValueError("Solar wind file {} lacks time column {}".format(file, time))
+        return cls(columns[time], columns.get(velocity), columns.get(pressure), **kwargs)
+
+    def epochs(self, spice):
+        """Returns the ephemeris times of the time series, converting UTC times once.
+        """
+        if self._et is None:
+            times = self.times.astype(str) if self.times.dtype.kind in 'US' else self.times
+            self._et = np.asarray(spice.leapseconds().utc2et(times), dtype=float)
+            if np.any(np.diff(self._et) < 0):
+                raise ValueError("Solar wind times are not increasing")
+        return self._et
+
+    def aberration(self, spice, et, orbital_speed):
+        """Returns the aberration angles in radians at the epochs given, None without velocities.
+        Params:
+            spice: the Spice object
+            et: array of ephemeris times
+            orbital_speed: orbital speed in km/s of the body around the Sun
+        """
+        if self.velocity is None:
+            return None
+        return -np.arctan2(orbital_speed, np.interp(et, self.epochs(spice), self.velocity))
+
+    def scale(self, spice, et, body):
+        """Returns the factors scaling the boundaries of a body at the epochs given, None without pressures.
+        """
+        if self.pressure is None:
+            return None
+        reference = reference_pressures[body.upper()] if self.reference is None else self.reference
+        return (np.interp(et, self.epochs(spice), self.pressure) / reference) ** self.exponent
+
+
+def orbital_speed(spice, body, et):
+    """Returns the orbital speed in km/s of a body around the Sun at an epoch.
+    """
+    return np.linalg.norm(spice.state('SUN', et, 'J2000', body)[1])
+
+
+def aberrate(vv, angle):
+    """Rotates vectors about the z axis by aberration angles, as the rotation correcting Venus Solar Orbital
+    coordinates from aberration in `venus._vso_rotation`, so that the x axis points against the aberrated flow.
+    Params:
+        vv: array of shape (n, 3) of vectors
+        angle: aberration angle in radians, or array of n angles
+    Returns:
+        Array of shape (n, 3) with the rotated vectors.
+    """
+    cos, sin = np.cos(angle), np.sin(angle)
+    rotated = np.array(vv, dtype=float)
+    rotated[:, 0] = cos * vv[:, 0] + sin * vv[:, 1]
+    rotated[:, 1] = cos * vv[:, 1] - sin * vv[:, 0]
+    return rotated
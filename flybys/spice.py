@@ -1,13 +1,190 @@
 import spiceypy as spice
 import spiceypy.utils.support_types as stypes
+import spiceypy.utils.callbacks as callbacks
 import numpy as np
+import logging
 import re
+import os
 import os.path as path
+import atexit
+import hashlib
+import shutil
 import tempfile
+from collections import OrderedDict
+from flybys.ephemeris import EphemerisCache
+from flybys.leapseconds import LeapSeconds
+from flybys.approach import DistanceIndex
+from flybys.coverage import Coverage, spk_coverages
+from flybys.dependencies import spk_segments, kernel_checksums, dependencies
+from flybys import profiling
+
+
+logger = logging.getLogger(__name__)
+
+
+class KernelSession:
+    """Reference-counted set of kernels loaded from a metakernel.
+    The kernels are furnished when the session is first acquired and unloaded when the last reference is released,
+    unless the session is persistent, in which case they stay loaded until the session is closed. Sessions are
+    context managers returning a Spice object, e.g.:
+        with KernelSession(metakernel) as spice:
+            spice.position('MPO', et, 'J2000', 'VENUS')
+    Attributes:
+        metakernel: absolute path of the metakernel
+        persistent: whether kernels stay loaded when no references are left
+        in_memory: whether kernels are furnished individually, see `Spice.load_metakernel`
+        references: number of current references to the session
+    """
+
+    def __init__(self, metakernel, persistent=False, in_memory=False):
+        self.metakernel = path.abspath(metakernel)
+        self.persistent = persistent
+        self.in_memory = in_memory
+        self.references = 0
+        self._kernels = None
+
+    @property
+    def loaded(self):
+        return self._kernels is not None
+
+    def acquire(self):
+        if self._kernels is None:
+            self._kernels = Spice.load_metakernel(self.metakernel, self.in_memory)
+        self.references += 1
+        return Spice()
+
+    def release(self):
+        if self.references > 0:
+            self.references -= 1
+        if self.references == 0 and not self.persistent:
+            self.close()
+
+    def close(self):
+        """Unloads the kernels of the session regardless of the number of references.
+        """
+        if self._kernels is not None:
+            Spice.unload(self._kernels)
+            self._kernels = None
+
+    def __enter__(self):
+        return self.acquire()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
+
+
+# process-wide registry of persistent kernel sessions, least recently used first
+_sessions = OrderedDict()
+
+# directory of rewritten metakernels, created on first use and removed on exit
+_metakernel_cache = None
+
+# leapseconds conversion of the last kernel set it was read for, as a (kernel set, LeapSeconds) pair
+_leapseconds = (None, None)
+
+_string_regexp = r"'((?:[^']|'')*)'"
+
+
+def _kernel_variables(content):
+    """Reads the string variables assigned in the data blocks of a text kernel.
+    Params:
+        content: the text kernel content
+    Returns:
+        Dictionary with the list of string values of each variable. Values appended with `+=` are concatenated and
+        strings continued with a trailing `+` are joined.
+    """
+    data = ''.join(re.findall(r'\\begindata(.*?)(?:\\begintext|$)', content, flags=re.S))
+    assignment = r'([^\s=+()]+)\s*(\+?=)\s*(\((?:[^()\']|' + _string_regexp + r')*\)|' + _string_regexp + ')'
+    variables = {}
+    for name, operator, values, _, _ in re.findall(assignment, data):
+        strings = []
+        for value in [v.replace("''", "'") for v in re.findall(_string_regexp, values)]:
+            if strings and strings[-1].endswith('+'):
+                strings[-1] = strings[-1][:-1] + value
+            else:
+                strings.append(value)
+        variables[name] = variables.get(name, []) + strings if operator == '+=' else strings
+    return variables
+
+
+def _resolve_path(value, directory):
+    return value if path.isabs(value) else path.abspath(path.join(directory, value))
+
+
+def _resolve_kernels(variables, directory):
+    """Returns the absolute paths of the kernels to load from a metakernel, with path symbols substituted.
+    Params:
+        variables: variables of the metakernel as returned by `_kernel_variables`
+        directory: directory of the metakernel, against which relative paths are resolved
+    """
+    symbols = dict(zip(variables.get('PATH_SYMBOLS', []),
+                       [_resolve_path(v, directory) for v in variables.get('PATH_VALUES', [])]))
+    kernels = []
+    for kernel in variables.get('KERNELS_TO_LOAD', []):
+        kernel = re.sub(r'\$(\w+)', lambda m: symbols.get(m.group(1), m.group(0)), kernel)
+        kernels.append(_resolve_path(kernel, directory))
+    return kernels
+
+
+def _kernel_strings(values, size=72):
+    """Formats string values for a text kernel, one per line, splitting long values with the `+` continuation
+    marker, since the kernel pool truncates strings longer than 80 characters.
+    """
+    chunks = []
+    for value in values:
+        parts = [value[i:i + size] for i in range(0, len(value), size)] or ['']
+        parts = [p.replace("'", "''") for p in parts]
+        chunks += ["'{}+'".format(p) for p in parts[:-1]] + ["'{}'".format(parts[-1])]
+    return '\n                   '.join(chunks)
+
+
+def _cached_metakernel(content, directory):
+    """Returns a metakernel with all its path values resolved against the directory given, reusing a previously
+    written one for the same content and directory.
+    """
+    global _metakernel_cache
+    if _metakernel_cache is None:
+        _metakernel_cache = tempfile.mkdtemp(prefix='flybys-')
+        atexit.register(shutil.rmtree, _metakernel_cache, True)
+
+    digest = hashlib.sha1((directory + '\0' + content).encode('utf-8')).hexdigest()
+    kernel = path.join(_metakernel_cache, digest + '.tm')
+    if not path.exists(kernel):
+        def resolve(match):
+            values = [_resolve_path(v.replace("''", "'"), directory)
+                      for v in re.findall(_string_regexp, match.group(2))]
+            return '{} {} ( {} )'.format(match.group(0).split()[0], match.group(1), _kernel_strings(values))
+
+        content_new = re.sub(r'PATH_VALUES\s*(\+?=)\s*(\((?:[^()\']|' + _string_regexp + r')*\)|' +
+                             _string_regexp + ')', resolve, content)
+        # write and rename so that concurrent processes never load a partially written file
+        fd, kernel_tmp = tempfile.mkstemp(dir=_metakernel_cache, suffix='.tmp')
+        with os.fdopen(fd, 'w') as mk:
+            mk.write(content_new)
+        os.replace(kernel_tmp, kernel)
+        logger.debug('Temporary metakernel %s created', kernel)
+    return kernel
 
 
 class Spice:
 
+    # Maximum number of metakernels kept loaded by the session registry. All loaded kernels share the same kernel
+    # pool, where data from the latest kernels take precedence, so by default switching metakernels evicts the
+    # previous one.
+    max_sessions = 1
+
+    # Memoizing cache of the positions and states sampled on large time grids, None to disable it
+    ephemeris_cache = EphemerisCache()
+
+    # Distance indexes of the closest approach searches, by target, observer and kernel set
+    distance_indexes = {}
+
+    # SPK coverage of every body, by kernel set
+    coverages = {}
+
+    # SPK segments and checksums of the other kernels, by kernel set
+    kernel_data = {}
+
     def __init__(self):
         pass
 
@@ -17,41 +194,101 @@ class Spice:
 
     @staticmethod
     def load(kernels):
+        profiling.count('furnsh')
         spice.furnsh(kernels)
 
     @staticmethod
-    def load_metakernel(kernel):
+    def unload(kernels):
+        profiling.count('unload')
+        spice.unload(kernels)
+
+    @staticmethod
+    def session(metakernel):
+        """Returns the process-wide kernel session of a metakernel, creating it if needed.
+        Registry sessions are persistent: the metakernel is loaded the first time the session is acquired and stays
+        loaded across calls until it is evicted, either explicitly or to keep at most `Spice.max_sessions` metakernels
+        loaded.
+        Params:
+            metakernel: path to the metakernel
+        Returns:
+            The KernelSession of the metakernel.
+        """
+        key = path.abspath(metakernel)
+        session = _sessions.get(key)
+        if session is None:
+            session = KernelSession(key, persistent=True)
+            _sessions[key] = session
+        _sessions.move_to_end(key)
 
-        with open(kernel, 'r') as f:
-            content = f.read()
+        # evict least recently used sessions which are not in use
+        for k in [k for k, s in _sessions.items() if k != key and s.references == 0]:
+            if len(_sessions) <= Spice.max_sessions:
+                break
+            _sessions.pop(k).close()
+        return session
 
-            # read kernel path values
-            regexp = r'(PATH_VALUES\s+=\s+\(\s+\')(.*?)(\'\s+\))'
-            result = re.search(regexp, content)
-            path_values = result.group(2)
+    @staticmethod
+    def evict(metakernel=None):
+        """Unloads and removes sessions from the process-wide registry.
+        Params:
+            metakernel: path to the metakernel whose session is evicted, or None to evict all sessions
+        """
+        keys = list(_sessions) if metakernel is None else [path.abspath(metakernel)]
+        for key in keys:
+            session = _sessions.pop(key, None)
+            if session is not None:
+                session.close()
 
-            if path_values == '..':
-                # copy kernel to temporary file with updated path value
-                path_values_new = path.abspath(path.join(kernel, '../..'))
-                content_new = re.sub(regexp, r'\1' + path_values_new + r'\3', content, flags=re.M)
-                kernel_new = tempfile.NamedTemporaryFile(mode='w', delete=False)
-                with kernel_new as mk:
-                    mk.write(content_new)
-                    print('Temporary metakernel {} created'.format(mk.name))
-                Spice.load(kernel_new.name)
-            else:
+    @staticmethod
+    def load_metakernel(kernel, in_memory=False):
+        """Loads a metakernel, resolving relative path values against the directory of the metakernel.
+        Metakernels with relative path values are rewritten with absolute paths into a temporary file, which is
+        cached by content and removed when the process exits, or, in memory mode, their kernels are furnished one by
+        one so that nothing is written to disk.
+        Params:
+            kernel: path to the metakernel
+            in_memory: if true furnishes the resolved kernels individually instead of a rewritten metakernel
+        Returns:
+            The list of kernel files furnished, to be passed to `Spice.unload`.
+        """
+        with profiling.stage('load_metakernel'):
+            with open(kernel, 'r') as f:
+                content = f.read()
+
+            directory = path.dirname(path.abspath(kernel))
+            variables = _kernel_variables(content)
+            path_values = variables.get('PATH_VALUES', [])
+
+            if in_memory:
+                kernels = _resolve_kernels(variables, directory)
+                Spice.load(kernels)
+                return kernels
+            elif all(path.isabs(v) for v in path_values):
                 Spice.load(kernel)
+                return [kernel]
+            else:
+                kernel_new = _cached_metakernel(content, directory)
+                Spice.load(kernel_new)
+                return [kernel_new]
 
     @staticmethod
     def clear():
         spice.kclear()
+        for session in _sessions.values():
+            session._kernels = None
+        _sessions.clear()
+        Spice.distance_indexes.clear()
+        Spice.coverages.clear()
+        Spice.kernel_data.clear()
 
     @staticmethod
-    def et2utc(et):
-        return spice.et2utc(et, 'ISOC', 0)
+    def et2utc(et, precision=0):
+        profiling.count('et2utc')
+        return spice.et2utc(et, 'ISOC', precision)
 
     @staticmethod
     def utc2et(utc):
+        profiling.count('utc2et')
         return spice.utc2et(utc)
 
     @staticmethod
@@ -77,8 +314,12 @@ class Spice:
         Returns:
             Array of position vectors of the target body relative to an observing body.
         """
-        pos, lt = spice.spkpos(target, et, frame, 'NONE', observer)
-        return pos
+        def compute():
+            profiling.count('spkpos')
+            return spice.spkpos(target, et, frame, 'NONE', observer)[0]
+
+        with profiling.stage('ephemeris', np.size(et)) as stage:
+            return stage.output(Spice._cached(('position', target, frame, observer), et, compute))
 
     @staticmethod
     def state(target, et, frame, observer):
@@ -92,15 +333,59 @@ class Spice:
         Returns:
             Tuple of position and velocity vectors of the target body relative to an observing body.
         """
-        state, lt = spice.spkezr(target, et, frame, 'NONE', observer)
+        def compute():
+            profiling.count('spkezr')
+            return np.asarray(spice.spkezr(target, et, frame, 'NONE', observer)[0])
+
+        with profiling.stage('ephemeris', np.size(et)) as stage:
+            state = stage.output(Spice._cached(('state', target, frame, observer), et, compute))
 
-        if isinstance(state, list):
-            state = np.asarray(state)
+        if state.ndim == 2:
             return state[:, 0:3], state[:, 3:6]
         else:
             return state[0:3], state[3:6]
 
-    def closest_approach(self, target, observer, utc_start, utc_end, multiple, step):
+    @staticmethod
+    def kernel_set():
+        """Returns an identifier of the set of kernels loaded, which changes whenever kernels are loaded or unloaded,
+        or their files are modified. Metakernels are left out since the kernels they load are listed individually.
+        """
+        kernels = []
+        for i in range(spice.ktotal('ALL')):
+            file, kind, source, handle = spice.kdata(i, 'ALL')
+            if kind != 'META':
+                stat = os.stat(file)
+                kernels.append((path.abspath(file), stat.st_size, stat.st_mtime_ns))
+        return hashlib.sha1(repr(kernels).encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def leapseconds():
+        """Returns the conversion between ephemeris time and UTC of the leapseconds kernel loaded, read from the kernel
+        pool once per kernel set, which converts whole arrays at once, e.g. Spice.leapseconds().et2utc(et, 3).
+        """
+        global _leapseconds
+        kernels = Spice.kernel_set()
+        if _leapseconds[0] != kernels:
+            profiling.count('gdpool', 5)
+            variables = {name: list(spice.gdpool(name, 0, 1000)) for name in
+                         ('DELTET/DELTA_T_A', 'DELTET/K', 'DELTET/EB', 'DELTET/M', 'DELTET/DELTA_AT')}
+            _leapseconds = (kernels, LeapSeconds.from_variables(variables))
+        return _leapseconds[1]
+
+    @staticmethod
+    def _cached(query, et, compute):
+        cache = Spice.ephemeris_cache
+        if cache is None or not cache.cacheable(et):
+            return compute()
+
+        key = cache.key(query, Spice.kernel_set(), et)
+        array = cache.get(key)
+        if array is None:
+            array = compute()
+            cache.put(key, array)
+        return array
+
+    def closest_approach(self, target, observer, utc_start, utc_end, multiple, step=None):
         """Finds closest approaches of the target to the observer during the time period specified.
         Params:
             target: name of the target body
@@ -109,24 +394,137 @@ class Spice:
             utc_end: end time of the applicable time period in UTC format, e.g. 2021-08-11T14:00:00
             multiple: if true computes all closest distances at a local minima for the applicable time period,
                 if false computes the closest approach at the absolute minimum.
-            step: step size for this search in seconds. The step must be shorter than the shortest interval over which
-                the target-observer distance is increasing or decreasing.
+            step: step size for a plain search over the whole time period in seconds. The step must be shorter than
+                the shortest interval over which the target-observer distance is increasing or decreasing. If None,
+                the candidates are taken from the cached distance index of the target and observer (see
+                `DistanceIndex`), which adapts its step to the orbital motion, and only they are refined.
         Returns:
             Array of ephemeris times for the closest approaches matching the search criteria, None if no closest
-            approach is found.
+            approach is found. Only the parts of the time period covered by the SPK kernels of both bodies are
+            searched.
         """
-        et_start = self.utc2et(utc_start)
-        et_end = self.utc2et(utc_end)
+        with profiling.stage('closest_approach'):
+            return self._closest_approach(target, observer, self.utc2et(utc_start), self.utc2et(utc_end), multiple,
+                                          step)
+
+    def _closest_approach(self, target, observer, et_start, et_end, multiple, step):
+        windows = self.coverage(target, observer).clip(et_start, et_end)
+        if len(windows) == 0:
+            return None
+
+        confine = stypes.SPICEDOUBLE_CELL(2 * len(windows))
+        if step is None:
+            index = self.distance_index(target, observer)
+            brackets = np.concatenate([index.candidates(self, start, end) for start, end in windows])
+            confine = stypes.SPICEDOUBLE_CELL(2 * max(len(brackets), 1))
+            for start, end in brackets:
+                spice.wninsd(start, end, confine)
+            step = (brackets[:, 1] - brackets[:, 0]).min() if len(brackets) else et_end - et_start
+            relate = 'LOCMIN'
+        else:
+            for start, end in windows:
+                spice.wninsd(start, end, confine)
+            relate = 'LOCMIN' if multiple else 'ABSMIN'
+
+        profiling.count('gfdist')
+        ca_win = spice.gfdist(target, 'NONE', observer, relate, 0.0, 0.0, step, 1000, confine)
+        approaches = [spice.wnfetd(ca_win, i)[0] for i in range(spice.wncard(ca_win))]
+
+        if relate == 'LOCMIN' and not multiple:
+            # the absolute minimum is either the smallest local minimum or at an end of a covered part
+            candidates = np.array(approaches + list(windows.ravel()))
+            distances = np.linalg.norm(np.reshape(self.position(target, candidates, 'J2000', observer), (-1, 3)),
+                                       axis=1)
+            approaches = [candidates[np.argmin(distances)]]
 
+        return approaches if approaches else None
+
+    @staticmethod
+    def distance_index(target, observer):
+        """Returns the distance index of a target and an observer for the kernels loaded, created on first use.
+        """
+        key = (target, observer, Spice.kernel_set())
+        if key not in Spice.distance_indexes:
+            Spice.distance_indexes[key] = DistanceIndex(target, observer)
+        return Spice.distance_indexes[key]
+
+    @staticmethod
+    def coverage(*bodies):
+        """Returns the time coverage of the SPK kernels loaded for all the bodies given, read from the kernels once
+        per kernel set. Bodies without SPK data of their own, e.g. the solar system barycenter, do not restrict it.
+        Params:
+            bodies: names of the bodies
+        Returns:
+            The Coverage of the times when all the bodies are covered.
+        """
+        kernels = Spice.kernel_set()
+        if kernels not in Spice.coverages:
+            profiling.count('spkcov')
+            Spice.coverages[kernels] = spk_coverages()
+        coverage = Coverage.unbounded()
+        for body in bodies:
+            body_coverage = Spice.coverages[kernels].get(spice.bods2c(body))
+            if body_coverage is not None:
+                coverage = coverage.intersect(body_coverage)
+        return coverage
+
+    @staticmethod
+    def dependencies(bodies, et_start, et_end):
+        """Returns the record of the kernel data a result computed for some bodies over a time window depends on,
+        reading the SPK segments and the checksums of the other kernels once per kernel set.
+        Params:
+            bodies: names of the bodies
+            et_start: start ephemeris time of the time window
+            et_end: end ephemeris time of the time window
+        Returns:
+            The dependencies record, see `dependencies.dependencies`, whose `digest` changes with the data.
+        """
+        kernels = Spice.kernel_set()
+        if kernels not in Spice.kernel_data:
+            Spice.kernel_data[kernels] = (spk_segments(), kernel_checksums())
+        return dependencies(*Spice.kernel_data[kernels], [spice.bods2c(body) for body in bodies], et_start, et_end)
+
+    @staticmethod
+    def condition_window(condition, et_start, et_end, step, tolerance=1e-6, intervals=1000):
+        """Finds the time intervals where a user-defined boolean condition holds using the SPICE geometry finder.
+        Params:
+            condition: function returning the boolean condition array for an array of ephemeris times
+            et_start: start ephemeris time of the confinement window
+            et_end: end ephemeris time of the confinement window
+            step: step size for this search in seconds. The step must be shorter than the shortest interval over which
+                the condition keeps the same value.
+            tolerance: convergence tolerance in seconds of the interval endpoints
+            intervals: maximum number of intervals of the result window
+        Returns:
+            SPICE window with the intervals where the condition holds. Its complement within the confinement window,
+            e.g. `spiceypy.wncomd(et_start, et_end, window)`, holds the intervals where it does not.
+        """
         confine = stypes.SPICEDOUBLE_CELL(2)
         spice.wninsd(et_start, et_end, confine)
+        result = stypes.SPICEDOUBLE_CELL(2 * intervals)
 
-        ca_win = spice.gfdist(target, 'NONE', observer, 'LOCMIN' if multiple else 'ABSMIN', 0.0, 0.0, step, 1000,
-                              confine)
-        win_size = spice.wncard(ca_win)
+        @callbacks.SpiceUDFUNS
+        def udfuns(et):
+            return 0.0
 
-        if win_size == 0:
-            return None
-        else:
-            return [spice.wnfetd(ca_win, i)[0] for i in range(win_size)]
+        @callbacks.SpiceUDFUNB
+        def udfunb(udf, et):
+            return condition(np.array([et]))[0]
 
+        spice.gfstol(tolerance)
+        profiling.count('gfudb')
+        try:
+            spice.gfudb(udfuns, udfunb, step, confine, result)
+        finally:
+            spice.gfstol(1e-6)  # SPICE default convergence tolerance
+        return result
+
+    @staticmethod
+    def window_intervals(window):
+        """Returns the intervals of a SPICE window.
+        Params:
+            window: the SPICE window
+        Returns:
+            Array of shape (n, 2) with the start and end times of the n intervals of the window.
+        """
+        return np.array([spice.wnfetd(window, i) for i in range(spice.wncard(window))]).reshape((-1, 2))
@@ -0,0 +1,68 @@
+import numpy as np
+
+
+class Trajectory:
+    """Piecewise cubic Hermite model of the trajectory of a target relative to an observer.
+    The state is queried from SPICE at coarse nodes, and positions are interpolated in between with the cubic
+    polynomial matching the positions and velocities at both ends of each segment, so that dense resampling runs at
+    NumPy speed without further SPICE calls. The error bound is estimated against SPICE at the middle of every
+    segment, where the interpolation error of a cubic Hermite segment is largest.
+    Attributes:
+        target: name of the target body
+        frame: reference frame of the positions
+        observer: name of the observing body
+        nodes: ephemeris times of the nodes
+        positions: position vectors at the nodes
+        velocities: velocity vectors at the nodes
+        error: maximum distance in km between the interpolated and the SPICE positions at the segment midpoints
+    """
+
+    def __init__(self, spice, target, et_start, et_end, frame, observer, step=60.):
+        """Builds the trajectory from the SPICE states at nodes every `step` seconds.
+        Params:
+            spice: the Spice object, with the kernels loaded
+            target: name of the target body
+            et_start: start ephemeris time of the trajectory
+            et_end: end ephemeris time of the trajectory
+            frame: reference frame of the positions
+            observer: name of the observing body
+            step: step size in seconds between nodes
+        """
+        if et_end <= et_start:
+            raise ValueError("Trajectory end time must be later than its start time")
+        self.target = target
+        self.frame = frame
+        self.observer = observer
+        self.nodes = np.append(np.arange(et_start, et_end, step), et_end)
+        if len(self.nodes) > 2 and self.nodes[-1] - self.nodes[-2] < 1e-3 * step:  # avoid a degenerate last segment
+            self.nodes = np.delete(self.nodes, -2)
+        self.positions, self.velocities = spice.state(target, self.nodes, frame, observer)
+
+        midpoints = 0.5 * (self.nodes[1:] + self.nodes[:-1])
+        reference = spice.position(target, midpoints, frame, observer)
+        self.error = np.linalg.norm(self.position(midpoints) - np.reshape(reference, (-1, 3)), axis=1).max()
+
+    def position(self, et):
+        """Interpolates the position of the target relative to the observer.
+        Params:
+            et: array of ephemeris times within the trajectory time span
+        Returns:
+            Array of shape (n, 3) with the position vectors.
+        """
+        et = np.atleast_1d(np.asarray(et, dtype=float))
+        if et.size and (et.min() < self.nodes[0] or et.max() > self.nodes[-1]):
+            raise ValueError("Epochs out of the trajectory time span")
+
+        i = np.clip(np.searchsorted(self.nodes, et, side='right') - 1, 0, len(self.nodes) - 2)
+        h = (self.nodes[i + 1] - self.nodes[i])[:, np.newaxis]
+        s = (et - self.nodes[i])[:, np.newaxis] / h
+        s2 = s * s
+        s3 = s2 * s
+
+        # cubic Hermite basis functions
+        h00 = 2 * s3 - 3 * s2 + 1
+        h10 = s3 - 2 * s2 + s
+        h01 = 3 * s2 - 2 * s3
+        h11 = s3 - s2
+        return h00 * self.positions[i] + h10 * h * self.velocities[i] + \
+            h01 * self.positions[i + 1] + h11 * h * self.velocities[i + 1]
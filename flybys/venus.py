@@ -1,37 +1,21 @@
 import numpy as np
-from flybys.quaternion import Quaternion
+from flybys.quaternion import Quaternion, QuaternionArray
 from flybys.spice import Spice
-from flybys.helper import normalize, closest_approach, find_switch
-
-
-# Martinecz et al. 2008
-_bowshock_models = {"martinecz": {"l": 1.303, "eps": 1.056, "x0": 0.788},
-                    "slavin": {"l": 1.68, "eps": 1.03, "x0": 0.45},
-                    "russell": {"l": 2.14, "eps": 0.609, "x0": 0.},
-                    "zhang": {"l": 2.131, "eps": 0.66, "x0": 0.},
-                    "tricicle": {"l": 1.515, "eps": 1.018, "x0": 0.664}}
-
-
-def _inside_bowshock(vv, model):
-    xx = vv[:, 0] - model["x0"]
-    yy = np.sqrt(vv[:, 1] ** 2 + vv[:, 2] ** 2)
-    rr2 = xx ** 2 + yy ** 2
-    theta = np.arctan2(yy, xx)
-    rb = np.divide(model["l"], 1 + model["eps"] * np.cos(theta))
-    rb2 = rb ** 2
-    return rr2 < rb2
+from flybys import profiling
+from flybys.boundaries import BoundarySet, models
+from flybys.solarwind import orbital_speed, aberrate
+from flybys.helper import normalize, closest_approach, crossing_window, crossings, \
+    crossing_events, position_source, crossing_times, crossing_precision, events_table, approach_time, covered_windows
 
 
 def venus_closest_approach(metakernel, utc_start, utc_end):
     return closest_approach('VENUS', metakernel, utc_start, utc_end)
 
 
-def venus_bowshock_crossings(metakernel, utc_start, utc_end, model='martinecz', aberration=False):
-    spice = Spice()
-    spice.load_metakernel(metakernel)
-
-    # closest approach
-    etc = spice.closest_approach('MPO', 'VENUS', utc_start, utc_end, False, 100)[0]
+def _vso_rotation(spice, etc, aberration):
+    """Returns the quaternion rotating J2000 vectors into Venus Solar Orbital coordinates at the epoch given,
+    optionally corrected from solar-wind aberration.
+    """
     rs, vs = spice.state('SUN', etc, 'J2000', 'VENUS')
 
     # build quaternion from rotation matrix to convert to Venus Solar Orbital coordinates
@@ -44,22 +28,178 @@ def venus_bowshock_crossings(metakernel, utc_start, utc_end, model='martinecz',
     # assuming average solar wind and mean orbital velocity values (400 and 35 km/s respectively)
     # aberration ~ -5 deg
     qa = Quaternion(axis=np.array([0, 0, 1]), degrees=-5 * aberration).inverse()
+    return Quaternion.multiply(qa, qv)
 
-    # compute spacecraft positions in Venus Solar Orbital coordinates corrected from solar-wind aberration
-    # starting half an hour before the closest approach
-    tt = etc - 1800 + np.arange(10000)
-    rm = spice.position('MPO', tt, 'J2000', 'VENUS')
-    vv = Quaternion.multiply(qa, qv).rotate(rm) / spice.body_radius('VENUS')
-
-    bowshock_model = _bowshock_models.get(model)
-    if bowshock_model is None:
-        raise ValueError("Unknown bowshock model {}".format(model))
 
-    inside = _inside_bowshock(vv, bowshock_model)
-    _entry, _exit = find_switch(inside)
+def _vso_rotations(spice, et, aberration):
+    """Returns the quaternions rotating J2000 vectors into Venus Solar Orbital coordinates at every epoch given,
+    optionally corrected from solar-wind aberration. Same construction as `_vso_rotation`, vectorized over epochs.
+    """
+    rs, vs = spice.state('SUN', et, 'J2000', 'VENUS')
 
-    tte = spice.et2utc(tt[_entry])
-    ttx = spice.et2utc(tt[_exit])
+    vx = rs / np.linalg.norm(rs, axis=1, keepdims=True)  # venus-sun direction
+    vy = vs / np.linalg.norm(vs, axis=1, keepdims=True)  # sun orbital velocity
+    vz = np.cross(vx, vy)
+    vz = vz / np.linalg.norm(vz, axis=1, keepdims=True)
+    qv = QuaternionArray.from_matrix(np.stack((vx, vy, vz), axis=2)).inverse()
 
-    spice.clear()
-    return tte, ttx
+    qa = Quaternion(axis=np.array([0, 0, 1]), degrees=-5 * aberration).inverse()
+    return QuaternionArray.multiply(qa, qv)
+
+
+def venus_crossings(metakernel, utc_start, utc_end, bowshock=None, aberration=False, method='grid', step=60.,
+                    tolerance=1., frame='ca', frame_step=None, trajectory_step=None, events=False, solar_wind=None):
+    """Finds the bowshock crossings of MPO during a Venus flyby for several models at once.
+    The trajectory is sampled and transformed once, and every model is evaluated against it in a single vectorized
+    operation.
+    Params:
+        metakernel: path to the metakernel
+        utc_start: start time of the applicable time period in UTC format, e.g. 2021-08-09T14:00:00
+        utc_end: end time of the applicable time period in UTC format, e.g. 2021-08-11T14:00:00
+        bowshock: list of bowshock model names, all of them by default
+        aberration: if true corrects Venus Solar Orbital coordinates from solar-wind aberration, of -5 degrees or
+            as given by the solar wind velocity of every sample if known
+        method: 'grid' samples every second during 10000 seconds starting half an hour before the closest approach,
+            'adaptive' scans the whole applicable time period every `step` seconds and refines every crossing found
+            down to `tolerance` seconds, and 'gf' runs the same search with the SPICE geometry finder
+        step: step size in seconds of the adaptive and gf methods, shorter than the shortest time spent inside or
+            outside
+        tolerance: time tolerance in seconds of the adaptive and gf methods
+        frame: 'ca' for Venus Solar Orbital coordinates fixed at the closest approach, 'epoch' for coordinates
+            computed at the epoch of every position
+        frame_step: for the 'epoch' frame, if given the frame is computed every `frame_step` seconds across the
+            search window and interpolated at the epoch of every position
+        trajectory_step: if given, positions are interpolated from a cubic Hermite trajectory with nodes every
+            `trajectory_step` seconds across the search window instead of being computed by SPICE
+        events: if true the crossings are returned as CrossingEvents, with their positions in Venus radii
+        solar_wind: optional SolarWind time series, whose velocity sets the aberration angle of every sample and
+            whose dynamic pressure scales the boundaries of every sample
+    Returns:
+        Dictionary with the entry and exit UTC time arrays of each (boundary, model) pair,
+        e.g. {('bowshock', 'martinecz'): (entries, exits)}, or the CrossingEvents of all of them.
+    """
+    bowshock = list(models('VENUS', 'bowshock')) if bowshock is None else list(bowshock)
+    boundaries = BoundarySet('VENUS', [('bowshock', model) for model in bowshock])
+    if frame not in ('ca', 'epoch'):
+        raise ValueError("Unknown Venus Solar Orbital frame {}".format(frame))
+
+    # the aberration of every sample, if known, replaces the fixed one
+    dynamic_aberration = aberration and solar_wind is not None and solar_wind.velocity is not None
+    fixed_aberration = aberration and not dynamic_aberration
+    scaled = solar_wind is not None and solar_wind.pressure is not None
+
+    with profiling.stage('venus_crossings'), Spice.session(metakernel) as spice:
+        # closest approach
+        etc = approach_time(spice, 'VENUS', utc_start, utc_end)
+
+        # compute spacecraft positions in Venus Solar Orbital coordinates corrected from solar-wind aberration
+        # by default starting half an hour before the closest approach
+        et_start, et_end = crossing_window(spice, 'VENUS', utc_start, utc_end, method, 1800, etc)
+        windows = covered_windows(spice, ('MPO', 'VENUS', 'SUN'), et_start, et_end)
+        et_start, et_end = windows[0, 0], windows[-1, 1]
+        radius = spice.body_radius('VENUS')
+        position = position_source(spice, 'J2000', 'VENUS', et_start, et_end, trajectory_step, windows)
+
+        if frame == 'ca':
+            q = _vso_rotation(spice, etc, fixed_aberration)
+
+            def rotate(tt, vv):
+                return q.rotate(vv)
+        elif frame_step is None:
+            def rotate(tt, vv):
+                return _vso_rotations(spice, tt, fixed_aberration).rotate(vv)
+        else:
+            nodes = np.append(np.arange(et_start, et_end, frame_step), et_end)
+            qn = _vso_rotations(spice, nodes, fixed_aberration)
+
+            def rotate(tt, vv):
+                return qn.interpolate(nodes, tt).rotate(vv)
+
+        if dynamic_aberration:
+            speed = orbital_speed(spice, 'VENUS', etc)
+
+        def vso_positions(tt):
+            tt = np.asarray(tt)
+            vv = position(tt)
+            with profiling.stage('rotation', tt.size) as stage:
+                vv = rotate(tt, vv) / radius
+                if dynamic_aberration:
+                    vv = aberrate(vv, solar_wind.aberration(spice, tt, speed))
+                return stage.output(vv)
+
+        def inside(tt):
+            vv = vso_positions(tt)
+            with profiling.stage('boundary', len(vv)) as stage:
+                if scaled:
+                    vv = vv / np.reshape(solar_wind.scale(spice, tt, 'VENUS'), (-1, 1))
+                return stage.output(boundaries.inside(vv))
+
+        if events:
+            transitions = crossing_times(spice, inside, et_start, et_end, method, step, tolerance, windows)
+            return events_table(spice, 'VENUS', boundaries.keys, transitions, vso_positions,
+                                crossing_precision(method, tolerance))
+        result = crossings(spice, inside, et_start, et_end, method, step, tolerance, windows)
+
+    return dict(zip(boundaries.keys, result))
+
+
+def venus_bowshock_crossings(metakernel, utc_start, utc_end, model='martinecz', aberration=False, method='grid',
+                             step=60., tolerance=1., frame='ca', frame_step=None, trajectory_step=None, events=False,
+                             solar_wind=None):
+    """Finds the bowshock crossings of MPO during a Venus flyby.
+    Params:
+        metakernel: path to the metakernel
+        utc_start: start time of the applicable time period in UTC format, e.g. 2021-08-09T14:00:00
+        utc_end: end time of the applicable time period in UTC format, e.g. 2021-08-11T14:00:00
+        model: name of the bowshock model
+        aberration: if true corrects Venus Solar Orbital coordinates from solar-wind aberration
+        method: 'grid', 'adaptive' or 'gf', see `venus_crossings`
+        step: step size in seconds of the adaptive and gf methods
+        tolerance: time tolerance in seconds of the adaptive and gf methods
+        frame: 'ca' or 'epoch', see `venus_crossings`
+        frame_step: step size in seconds of the interpolated 'epoch' frame, see `venus_crossings`
+        trajectory_step: step size in seconds of the interpolated trajectory, see `venus_crossings`
+        events: if true the crossings are returned as CrossingEvents, see `venus_crossings`
+        solar_wind: optional SolarWind time series, see `venus_crossings`
+    Returns:
+        Two arrays of UTC times, with the bowshock entry and exit times respectively, or the CrossingEvents.
+    """
+    result = venus_crossings(metakernel, utc_start, utc_end, [model], aberration, method, step, tolerance, frame,
+                             frame_step, trajectory_step, events, solar_wind)
+    return result if events else result[('bowshock', model)]
+
+
+def venus_crossing_events(metakernel, utc_start, utc_end, bowshock=None, aberration=False, step=60., tolerance=1.,
+                          chunk_size=86400):
+    """Finds the bowshock crossings of MPO over an arbitrarily long time period, walking it in chunks so that memory
+    use stays constant, and yields every crossing as soon as it is found. Positions are given in Venus Solar Orbital
+    coordinates computed at the epoch of every position.
+    Params:
+        metakernel: path to the metakernel
+        utc_start: start time of the time period in UTC format, e.g. 2021-08-01T00:00:00
+        utc_end: end time of the time period in UTC format, e.g. 2022-08-01T00:00:00
+        bowshock: list of bowshock model names, all of them by default
+        aberration: if true corrects Venus Solar Orbital coordinates from solar-wind aberration
+        step: step size in seconds of the scan, shorter than the shortest time spent inside or outside
+        tolerance: time tolerance in seconds of the crossing times
+        chunk_size: number of samples evaluated at once
+    Yields:
+        Tuples (boundary, model, crossing, utc), with crossing either 'entry' or 'exit', in time order for every
+        model.
+    """
+    bowshock = list(models('VENUS', 'bowshock')) if bowshock is None else list(bowshock)
+    boundaries = BoundarySet('VENUS', [('bowshock', model) for model in bowshock])
+
+    with Spice.session(metakernel) as spice:
+        radius = spice.body_radius('VENUS')
+
+        def inside(tt):
+            vv = spice.position('MPO', tt, 'J2000', 'VENUS')
+            with profiling.stage('rotation', len(tt)) as stage:
+                vv = stage.output(_vso_rotations(spice, tt, aberration).rotate(vv) / radius)
+            with profiling.stage('boundary', len(tt)) as stage:
+                return stage.output(boundaries.inside(vv))
+
+        for et_start, et_end in covered_windows(spice, ('MPO', 'VENUS', 'SUN'), spice.utc2et(utc_start),
+                                                spice.utc2et(utc_end)):
+            yield from crossing_events(spice, inside, boundaries.keys, et_start, et_end, step, tolerance, chunk_size)
@@ -20,5 +20,7 @@ setuptools.setup(
     setup_requires=["pytest-runner"],
     tests_require=["pytest", "pytest-cov"],
 	install_requires=install_requires,
+    extras_require={'arrow': ['pyarrow'], 'pandas': ['pandas'], 'yaml': ['pyyaml']},
+    entry_points={'console_scripts': ['flybys = flybys.cli:main']},
     license='MIT'
 )
\ No newline at end of file
@@ -1,7 +1,10 @@
 import pytest
 import os.path as path
 import numpy as np
+import spiceypy
 from flybys.spice import Spice
+from flybys.boundaries import Conic, get
+from benchmarks.kernels import generate, _planets, _flyby_state
 
 
 @pytest.fixture
@@ -19,6 +22,22 @@ def spice():
     spice.clear()
 
 
+@pytest.fixture
+def metakernel(tmp_path):
+    kernels = path.join(path.dirname(path.abspath(__file__)), 'data/kernels')
+    metakernel = tmp_path / 'lsk_pck.tm'
+    metakernel.write_text("KPL/MK\n"
+                          "\\begindata\n"
+                          "PATH_VALUES = ( '{}' )\n"
+                          "PATH_SYMBOLS = ( 'KERNELS' )\n"
+                          "KERNELS_TO_LOAD = ( '$KERNELS/lsk/naif0012.tls'\n"
+                          "                    '$KERNELS/pck/pck00010.tpc' )\n"
+                          "\\begintext\n".format(kernels))
+    Spice.clear()
+    yield str(metakernel)
+    Spice.clear()
+
+
 @pytest.fixture
 def et():
     return np.array([681875583.1830401, 681789692.1830631])
@@ -33,3 +52,82 @@ def position():
 @pytest.fixture
 def velocity():
     return np.array([[0.53402401, 12.14407062, 3.82433007], [3.75210387, 6.59233577, 2.73393529]])
+
+
+@pytest.fixture
+def synthetic_kernels(tmp_path):
+    """Returns a function writing a synthetic kernel set (see `benchmarks.kernels.generate`) into a directory of the
+    test, taking the number of flybys, the half span, the directory name and the Mercury orbit span, and clears the
+    Spice sessions and caches afterwards.
+    """
+    def write(flybys=2, half_span=3 * 86400., directory='kernels', orbit=0.):
+        return generate(str(tmp_path / directory), flybys, half_span, orbit)
+    yield write
+    Spice.evict()
+    Spice.distance_indexes.clear()
+    Spice.coverages.clear()
+    Spice.kernel_data.clear()
+
+
+def _flyby_positions(body, tca, state, et):
+    """Returns the positions of MPO during a synthetic flyby in body radii, in the frame of the boundary models, from
+    its two-body trajectory and the Sun direction.
+    """
+    gm, radius = _planets[body][3:5]
+    positions = []
+    for t in et:
+        rr = spiceypy.prop2b(gm, state, t - tca)[:3]
+        # Venus Solar Orbital coordinates are fixed at the closest approach, MSM coordinates follow the Sun
+        sun = spiceypy.spkezr('SUN', tca if body == 'VENUS' else t, 'J2000', 'NONE', body)[0]
+        x = sun[:3] / np.linalg.norm(sun[:3])
+        y = sun[3:] - np.dot(sun[3:], x) * x
+        y /= np.linalg.norm(y)
+        positions.append([np.dot(x, rr), np.dot(y, rr), np.dot(np.cross(x, y), rr)])
+    positions = np.array(positions)
+    if body == 'MERCURY':
+        positions[:, 2] -= 479.  # dipole offset
+    return positions / radius
+
+
+def _inside(model, vv):
+    """Returns whether positions are inside a boundary model, evaluated in polar form.
+    """
+    if isinstance(model, Conic):
+        # directions the hyperbolic boundary never reaches are inside, down the tail
+        r = np.linalg.norm(vv - [model.x0, 0., 0.], axis=1)
+        denominator = 1 + model.eps * (vv[:, 0] - model.x0) / r
+        return (denominator <= 0) | (r * denominator < model.l)
+    r = np.linalg.norm(vv, axis=1)
+    return r < model.rss * (2 / (1 + vv[:, 0] / r)) ** model.alpha
+
+
+@pytest.fixture
+def expected_crossings():
+    """Returns a function computing the entry and exit ephemeris times of a boundary model during a synthetic flyby
+    independently of the crossing functions, taking the body, the closest approach UTC time, the boundary, the
+    model and the search window, with the kernels of the synthetic set loaded.
+    """
+    grids = {}
+
+    def crossings(body, utc, boundary, model, et_start, et_end, step=120., tolerance=1e-3):
+        tca = spiceypy.utc2et(utc)
+        state = _flyby_state(body, tca)
+        key = (body, utc, et_start, et_end, step)
+        if key not in grids:
+            et = np.arange(et_start, et_end, step)
+            grids[key] = et, _flyby_positions(body, tca, state, et)
+        et, positions = grids[key]
+        model = get(body, boundary, model)
+        values = _inside(model, positions)
+        entries, exits = [], []
+        for i in np.flatnonzero(np.diff(values)):
+            a, b = et[i], et[i + 1]
+            while b - a > tolerance:
+                middle = 0.5 * (a + b)
+                if _inside(model, _flyby_positions(body, tca, state, [middle]))[0] == values[i]:
+                    a = middle
+                else:
+                    b = middle
+            (entries if values[i + 1] else exits).append(0.5 * (a + b))
+        return np.array(entries), np.array(exits)
+    return crossings
@@ -0,0 +1,52 @@
+import numpy as np
+from flybys.approach import DistanceIndex
+
+
+class _Orbit:
+    """Keplerian elliptical orbit with an eccentricity of 0.5 and a period of 10000 seconds, with the periapsis
+    passages at multiples of the period. Counts the states queried.
+    """
+    period = 10000.
+    a = 5000.
+    e = 0.5
+
+    def __init__(self):
+        self.samples = 0
+
+    def state(self, target, et, frame, observer):
+        et = np.atleast_1d(np.asarray(et, dtype=float))
+        self.samples += len(et)
+        n = 2 * np.pi / self.period
+        m = n * et
+        ea = m.copy()
+        for _ in range(50):
+            ea = m + self.e * np.sin(ea)
+        b = self.a * np.sqrt(1 - self.e ** 2)
+        position = np.column_stack((self.a * (np.cos(ea) - self.e), b * np.sin(ea), np.zeros_like(ea)))
+        rate = n / (1 - self.e * np.cos(ea))
+        velocity = np.column_stack((-self.a * np.sin(ea) * rate, b * np.cos(ea) * rate, np.zeros_like(ea)))
+        return position, velocity
+
+
+def test_candidates():
+    orbit = _Orbit()
+    index = DistanceIndex('MPO', 'MERCURY', max_step=86400.)
+    brackets = index.candidates(orbit, 5000., 45000.)
+    periapsis = np.array([10000., 20000., 30000., 40000.])
+    assert len(brackets) == len(periapsis)
+    assert ((brackets[:, 0] < periapsis) & (periapsis < brackets[:, 1])).all()
+    assert (brackets[:, 1] - brackets[:, 0]).max() < 1000.
+
+
+def test_candidates_reuse_index():
+    orbit = _Orbit()
+    index = DistanceIndex('MPO', 'MERCURY')
+    index.candidates(orbit, 5000., 25000.)
+    samples = orbit.samples
+    # a query within the indexed period only evaluates its end points
+    assert len(index.candidates(orbit, 6000., 24000.)) == 2
+    assert orbit.samples == samples + 2
+    # an overlapping query only indexes the part not indexed yet
+    assert len(index.candidates(orbit, 15000., 35000.)) == 2
+    assert index.covered == [(5000., 35000.)]
+    assert orbit.samples < 2 * samples
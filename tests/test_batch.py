@@ -0,0 +1,19 @@
+import numpy as np
+from flybys.batch import flyby_windows, scan
+from benchmarks.kernels import orbit_start
+
+
+def test_flyby_windows():
+    windows = flyby_windows([100., 200., 400.], 0., 1000.)
+    assert (windows == np.array([[0., 150.], [150., 300.], [300., 1000.]])).all()
+
+
+def test_scan_orbits(synthetic_kernels):
+    # the grid search windows of 10000 seconds are longer than the orbits of about 8500 seconds
+    metakernel = synthetic_kernels(1, orbit=86400.)
+    start = orbit_start(1)
+    end = str(np.datetime64(start) + np.timedelta64(86400, 's'))
+    events = scan(metakernel, 'MERCURY', start, end, models=[('magnetopause', 'korth')], processes=1)
+    assert list(np.unique(events['flyby'])) == list(range(10))
+    assert (np.diff(events['et']) > 60.).all()
+    assert list(events['crossing']) == ['exit', 'entry'] * 10
@@ -0,0 +1,39 @@
+import numpy as np
+from flybys.spice import Spice
+from flybys.venus import venus_crossings
+from flybys.mercury import mercury_crossings
+from benchmarks.kernels import flyby_schedule
+
+
+def test_synthetic_flybys(synthetic_kernels, expected_crossings):
+    metakernel = synthetic_kernels(2)
+    schedule = flyby_schedule(2)
+    assert [body for body, _ in schedule] == ['VENUS', 'MERCURY']
+
+    with Spice.session(metakernel) as spice:
+        for (body, utc), function in zip(schedule, (venus_crossings, mercury_crossings)):
+            center = np.datetime64(utc)
+            utc_start, utc_end = str(center - np.timedelta64(1, 'D')), str(center + np.timedelta64(1, 'D'))
+            approach = spice.closest_approach('MPO', body, utc_start, utc_end, False)
+            assert abs(approach[0] - spice.utc2et(utc)) < 1.
+
+            utc_start, utc_end = str(center - np.timedelta64(2, 'D')), str(center + np.timedelta64(2, 'D'))
+            events = function(metakernel, utc_start, utc_end, method='adaptive', tolerance=0.1, events=True)
+            keys = sorted(set(zip(events['boundary'], events['model'])))
+            assert len(keys) == (5 if body == 'VENUS' else 3)
+            for boundary, model in keys:
+                entries, exits = expected_crossings(body, utc, boundary, model, spice.utc2et(utc_start),
+                                                    spice.utc2et(utc_end))
+                assert len(entries) == len(exits) == 1
+                selected = events.data[(events['boundary'] == boundary) & (events['model'] == model)]
+                np.testing.assert_allclose(selected['et'][selected['crossing'] == 'entry'], entries, atol=0.2)
+                np.testing.assert_allclose(selected['et'][selected['crossing'] == 'exit'], exits, atol=0.2)
+
+
+def test_generate_in_session(synthetic_kernels):
+    with Spice.session(synthetic_kernels(1)) as spice:
+        et = spice.utc2et(flyby_schedule(1)[0][1])
+        position = spice.position('MPO', et, 'J2000', 'VENUS')
+        # writing another kernel set leaves the kernels of the open session loaded
+        synthetic_kernels(2, directory='other')
+        assert (spice.position('MPO', et, 'J2000', 'VENUS') == position).all()
@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+from flybys import boundaries
+from flybys.boundaries import Conic, Shue, BoundarySet
+
+
+def _positions(n=10000):
+    vv = np.random.default_rng(1).normal(size=(n, 3)) * 3
+    vv[0] = 0.
+    return vv
+
+
+def test_conic():
+    model = Conic(l=2.96, eps=1.02, x0=0.5)
+    vv = _positions()
+    xx = vv[:, 0] - 0.5
+    yy = np.sqrt(vv[:, 1] ** 2 + vv[:, 2] ** 2)
+    rb = 2.96 / (1 + 1.02 * np.cos(np.arctan2(yy, xx)))
+    np.testing.assert_array_equal(model.inside(vv), xx ** 2 + yy ** 2 < rb ** 2)
+    np.testing.assert_array_equal(model.distance(vv) < 0, model.inside(vv))
+    np.testing.assert_allclose(model.distance(np.array([[0.5 + 2.96 / 2.02 + 0.1, 0., 0.]])), [0.1])
+
+
+def test_shue():
+    vv = _positions()
+    r = np.linalg.norm(vv, axis=1)
+    cos = np.divide(vv[:, 0], r, out=np.ones(len(r)), where=r > 0)
+    for alpha in (0.5, 0.6):
+        model = Shue(rss=1.42, alpha=alpha)
+        with np.errstate(divide='ignore'):
+            rm = 1.42 * (2 / (1 + cos)) ** alpha
+        np.testing.assert_array_equal(model.inside(vv), r < rm)
+        np.testing.assert_array_equal(model.distance(vv) < 0, model.inside(vv))
+
+
+def test_boundary_set():
+    vv = _positions()
+    keys = [('magnetopause', 'korth'), ('bowshock', 'winslow'), ('bowshock', 'slavin')]
+    models = BoundarySet('mercury', keys)
+    assert models.keys == keys
+    inside = models.inside(vv)
+    assert inside.shape == (3, len(vv))
+    for row, (boundary, name) in zip(inside, keys):
+        np.testing.assert_array_equal(row, boundaries.get('MERCURY', boundary, name).inside(vv))
+    np.testing.assert_array_equal(models.distance(vv) < 0, inside)
+
+    pytest.raises(ValueError, BoundarySet, 'MERCURY', [('bowshock', 'martinecz')])
+    pytest.raises(ValueError, BoundarySet, 'MERCURY', [])
+
+
+def test_register():
+    assert boundaries.boundaries('MERCURY') == ['bowshock', 'magnetopause']
+    assert list(boundaries.models('VENUS', 'bowshock')) == ['martinecz', 'slavin', 'russell', 'zhang', 'tricicle']
+
+    boundaries.register('MERCURY', 'magnetopause', 'shue', Shue(rss=1.45, alpha=0.6))
+    try:
+        pytest.raises(ValueError, boundaries.register, 'MERCURY', 'magnetopause', 'shue', Shue(1.5, 0.5))
+        models = BoundarySet('MERCURY', [('magnetopause', 'korth'), ('magnetopause', 'shue')])
+        assert models.inside(np.array([[1.43, 0., 0.]])).tolist() == [[False], [True]]
+    finally:
+        boundaries.unregister('MERCURY', 'magnetopause', 'shue')
+    assert 'shue' not in boundaries.models('MERCURY', 'magnetopause')
+
+    # the Venus crossing functions only evaluate the bowshock
+    pytest.raises(ValueError, boundaries.register, 'VENUS', 'magnetopause', 'shue', Shue(rss=1.5, alpha=0.5))
+    pytest.raises(ValueError, boundaries.register, 'MARS', 'bowshock', 'slavin', Conic(l=1.5, eps=1.0))
+    # the name would be truncated in the crossing events
+    pytest.raises(ValueError, boundaries.register, 'MERCURY', 'magnetopause', 'shue_rss_1.45_alpha_0.6',
+                  Shue(rss=1.45, alpha=0.6))
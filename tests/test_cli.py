@@ -0,0 +1,100 @@
+import json
+import os
+import numpy as np
+import pytest
+from flybys.spice import Spice
+from flybys.events import read_events
+from flybys.cli import main, read_manifest
+from benchmarks.kernels import flyby_schedule
+
+
+def test_read_manifest(tmp_path):
+    file = tmp_path / 'manifest.csv'
+    file.write_text('body,start,end,models,method,tolerance\n'
+                    'venus,2021-08-09T00:00:00,2021-08-12T00:00:00,bowshock/slavin bowshock/zhang,adaptive,0.5\n'
+                    'MERCURY,2021-10-01T00:00:00,2021-10-03T00:00:00,,,\n')
+    items = read_manifest(str(file))['items']
+    assert items[0] == {'body': 'VENUS', 'start': '2021-08-09T00:00:00', 'end': '2021-08-12T00:00:00',
+                        'models': [('bowshock', 'slavin'), ('bowshock', 'zhang')], 'method': 'adaptive',
+                        'tolerance': 0.5, 'approach_step': None}
+    assert items[1]['models'] is None and 'method' not in items[1]
+
+    file = tmp_path / 'manifest.json'
+    file.write_text(json.dumps({'defaults': {'method': 'adaptive'},
+                                'items': [{'body': 'MERCURY', 'start': 'a', 'end': 'b',
+                                           'models': {'magnetopause': ['korth']}}]}))
+    assert read_manifest(str(file))['items'][0]['models'] == [('magnetopause', 'korth')]
+    assert read_manifest(str(file))['items'][0]['method'] == 'adaptive'
+
+    file.write_text(json.dumps([{'body': 'MERCURY', 'start': 'a', 'end': 'b', 'color': 'red'}]))
+    pytest.raises(ValueError, read_manifest, str(file))
+    file.write_text(json.dumps([{'body': 'MARS', 'start': 'a', 'end': 'b'}]))
+    pytest.raises(ValueError, read_manifest, str(file))
+
+
+def test_resume(tmp_path, capsys, synthetic_kernels):
+    metakernel = synthetic_kernels(2)
+    (_, utc_venus), (_, utc_mercury) = flyby_schedule(2)
+    end = str(np.datetime64(utc_mercury) + np.timedelta64(1, 'D'))
+    manifest = tmp_path / 'manifest.json'
+    output = str(tmp_path / 'crossings.csv')
+    manifest.write_text(json.dumps({'metakernel': metakernel, 'output': output, 'defaults': {'method': 'adaptive'},
+                                    'items': [{'body': 'VENUS', 'start': utc_venus[:10], 'end': utc_mercury[:10]},
+                                              {'body': 'MERCURY', 'start': utc_venus[:10], 'end': end}]}))
+    assert main([str(manifest), '--processes', '2']) == 0
+    lines = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert [line['body'] for line in lines] == ['VENUS', 'MERCURY']
+    assert not any(line.get('reused') for line in lines)
+    events = read_events(output)
+    assert len(events) == sum(line['crossings'] for line in lines) > 0
+    assert list(np.unique(events['flyby'])) == [0, 1]
+
+    # an interrupted run loses the flybys not saved to the checkpoint
+    checkpoint = output + '.checkpoint'
+    os.remove(os.path.join(checkpoint, sorted(os.listdir(checkpoint))[0]))  # the record of a flyby
+    os.remove(output)
+    assert main([str(manifest), '--processes', '1']) == 0
+    lines = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert sorted(bool(line.get('reused')) for line in lines) == [False, True]
+    assert read_events(output) == events
+
+
+def test_kernel_update(tmp_path, capsys, synthetic_kernels):
+    (_, utc_venus), (_, utc_mercury), (_, utc_last) = flyby_schedule(3)
+    manifest = tmp_path / 'manifest.json'
+    manifest.write_text(json.dumps([{'body': 'VENUS', 'start': utc_venus[:10], 'end': utc_last[:10] + 'T23:59:59'},
+                                    {'body': 'MERCURY', 'start': utc_venus[:10], 'end': utc_last[:10]}]))
+    output = str(tmp_path / 'crossings.csv')
+    # a new release extending the trajectory with a third flyby leaves the results of the former ones unchanged
+    for directory, flybys in (('old', 2), ('new', 3)):
+        metakernel = synthetic_kernels(flybys, directory=directory)
+        assert main([str(manifest), '--metakernel', metakernel, '--output', output, '--processes', '1']) == 0
+        Spice.evict()
+    lines = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert [(line['body'], bool(line.get('reused'))) for line in lines[2:]] == \
+           [('VENUS', True), ('VENUS', False), ('MERCURY', True)]
+
+    # an edited frames kernel
+    metakernel = synthetic_kernels(3, directory='edited')
+    with open(str(tmp_path / 'edited' / 'fk' / 'synth.tf'), 'a') as stream:
+        stream.write('\nEdited\n')
+    assert main([str(manifest), '--metakernel', metakernel, '--output', output, '--processes', '1']) == 0
+    lines = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert all(line.get('changed') and not line.get('reused') for line in lines)
+
+
+def test_clock_update(tmp_path, capsys, synthetic_kernels):
+    (_, utc_venus), (_, utc_mercury) = flyby_schedule(2)
+    manifest = tmp_path / 'manifest.json'
+    manifest.write_text(json.dumps([{'body': 'VENUS', 'start': utc_venus[:10], 'end': utc_mercury[:10]}]))
+    output = str(tmp_path / 'crossings.csv')
+    metakernel = synthetic_kernels(2)
+    assert main([str(manifest), '--metakernel', metakernel, '--output', output, '--processes', '1']) == 0
+    Spice.evict()
+
+    # a new clock kernel, as in every kernel release, leaves the results unchanged
+    with open(str(tmp_path / 'kernels' / 'sclk' / 'synth.tsc'), 'a') as stream:
+        stream.write('\\begindata\nSCLK01_COEFFICIENTS_121 += ( 65536.0 1.0 1.0 )\n\\begintext\n')
+    assert main([str(manifest), '--metakernel', metakernel, '--output', output, '--processes', '1']) == 0
+    lines = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert [(line.get('reused'), line.get('changed')) for line in lines] == [(None, None), (True, None)]
@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+from flybys.spice import Spice
+from flybys.coverage import Coverage
+from flybys.venus import venus_crossings
+from flybys.mercury import mercury_crossing_events
+from benchmarks.kernels import flyby_schedule
+
+
+def test_coverage():
+    coverage = Coverage([[0., 10.], [20., 30.], [40., 50.]])
+    assert len(coverage) == 3
+    assert list(coverage.contains([-1., 0., 5., 15., 30., 45., 60.])) == [False, True, True, False, True, True, False]
+    np.testing.assert_array_equal(coverage.clip(5., 45.), [[5., 10.], [20., 30.], [40., 45.]])
+    np.testing.assert_array_equal(coverage.clip(12., 18.), np.empty((0, 2)))
+    np.testing.assert_array_equal(coverage.clip(25., 27.), [[25., 27.]])
+    np.testing.assert_array_equal(coverage.intersect(Coverage([[5., 25.], [45., 60.]])).intervals,
+                                  [[5., 10.], [20., 25.], [45., 50.]])
+    np.testing.assert_array_equal(Coverage.unbounded().intersect(coverage).intervals, coverage.intervals)
+
+
+def test_spk_gaps(synthetic_kernels, expected_crossings):
+    metakernel = synthetic_kernels(2)
+    (venus, utc_venus), (mercury, utc_mercury) = flyby_schedule(2)
+    with Spice.session(metakernel) as spice:
+        et_venus, et_mercury = spice.utc2et(utc_venus), spice.utc2et(utc_mercury)
+        coverage = spice.coverage('MPO', 'VENUS')
+        assert len(coverage) == 2
+        assert coverage.contains(et_venus) and not coverage.contains(0.5 * (et_venus + et_mercury))
+
+        # a time period over the gap between the flybys finds the approach of the covered part
+        utc_end = spice.et2utc(et_venus + 5 * 86400)
+        assert abs(spice.closest_approach('MPO', 'VENUS', utc_venus, utc_end, False)[0] - et_venus) < 1.
+        assert spice.closest_approach('MPO', 'VENUS', spice.et2utc(et_venus + 4 * 86400), utc_end, False) is None
+
+        # the crossings of a time period over the gaps are those of the covered part, three days around the flyby
+        center = np.datetime64(utc_venus)
+        crossings = venus_crossings(metakernel, str(center - np.timedelta64(5, 'D')),
+                                    str(center + np.timedelta64(5, 'D')), method='adaptive', tolerance=0.1)
+        assert len(crossings) == 5
+        for (boundary, model), (entries, exits) in crossings.items():
+            expected = expected_crossings('VENUS', utc_venus, boundary, model, et_venus - 3 * 86400,
+                                          et_venus + 3 * 86400)
+            np.testing.assert_allclose([spice.utc2et(utc) for utc in entries], expected[0], atol=0.2)
+            np.testing.assert_allclose([spice.utc2et(utc) for utc in exits], expected[1], atol=0.2)
+
+        # streamed over both flybys, the Mercury crossings are only found in the covered part of its flyby
+        events = list(mercury_crossing_events(metakernel, utc_venus, str(np.datetime64(utc_mercury)
+                                                                         + np.timedelta64(5, 'D'))))
+        assert len(events) == 6
+        expected = {(boundary, model): expected_crossings('MERCURY', utc_mercury, boundary, model,
+                                                          et_mercury - 3 * 86400, et_mercury + 3 * 86400)
+                    for boundary, model, _, _ in events}
+        for boundary, model, crossing, utc in events:
+            entries, exits = expected[(boundary, model)]
+            assert abs(spice.utc2et(utc) - (entries if crossing == 'entry' else exits)[0]) < 1.
+
+    with pytest.raises(ValueError):
+        venus_crossings(metakernel, str(center + np.timedelta64(4, 'D')), str(center + np.timedelta64(5, 'D')))
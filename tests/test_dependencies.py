@@ -0,0 +1,20 @@
+from flybys.spice import Spice
+from benchmarks.kernels import flyby_schedule
+
+
+def test_dependencies(synthetic_kernels):
+    digests = []
+    for directory, half_span in (('long', 3 * 86400.), ('short', 2 * 86400.)):
+        with Spice.session(synthetic_kernels(2, half_span, directory)) as spice:
+            et = spice.utc2et(flyby_schedule(2)[0][1])
+            record = spice.dependencies(('MPO', 'VENUS', 'SUN'), et - 86400., et + 86400.)
+            assert [(segment['body'], segment['center']) for segment in record['segments']] == \
+                   [(299, 10), (-121, 299)]
+            assert [kernel['file'] for kernel in record['kernels']] == ['naif0012.tls', 'pck00010.tpc', 'synth.tf']
+            digests.append((record['digest'],
+                            spice.dependencies(('MPO', 'VENUS', 'SUN'), et - 3 * 86400., et)['digest']))
+        Spice.evict()
+
+    # the trajectories only differ more than two days away from the closest approach
+    assert digests[0][0] == digests[1][0]
+    assert digests[0][1] != digests[1][1]
@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+from flybys.ephemeris import EphemerisCache
+
+
+def test_cache():
+    cache = EphemerisCache(max_bytes=2 * 3000 * 8, min_samples=10)
+    et = np.arange(1000.)
+    assert cache.cacheable(et) and not cache.cacheable(et[:5]) and not cache.cacheable(1.)
+
+    key = cache.key(('position', 'MPO', 'J2000', 'VENUS'), 'kernels', et)
+    assert key != cache.key(('position', 'MPO', 'J2000', 'VENUS'), 'other kernels', et)
+    assert key != cache.key(('position', 'MPO', 'J2000', 'VENUS'), 'kernels', et + 1)
+    assert cache.get(key) is None
+
+    pos = np.random.rand(1000, 3)
+    cache.put(key, pos)
+    cached = cache.get(key)
+    assert (cached == pos).all() and cache.hits == 1 and cache.misses == 1
+
+    # callers get copies they can modify
+    cached[:, 2] -= 479
+    assert (cache.get(key) == pos).all()
+
+    # least recently used arrays are evicted beyond the memory cap
+    cache.put('other', pos)
+    cache.get(key)
+    cache.put('another', pos)
+    assert cache.get('other') is None and cache.get(key) is not None and cache.nbytes == 2 * pos.nbytes
+
+
+def test_cache_directory(tmp_path):
+    pos = np.random.rand(1000, 3)
+    EphemerisCache(directory=str(tmp_path)).put('key', pos)
+    cache = EphemerisCache(directory=str(tmp_path))
+    assert (cache.get('key') == pos).all() and cache.hits == 1
+    assert sorted(file.name for file in tmp_path.iterdir()) == ['key.npy']
+
+
+def test_cache_interrupted_write(tmp_path, monkeypatch):
+    def save(stream, array):
+        stream.write(b'\x93NUMPY')
+        raise OSError('No space left on device')
+
+    monkeypatch.setattr(np, 'save', save)
+    pytest.raises(OSError, EphemerisCache(directory=str(tmp_path)).put, 'key', np.random.rand(1000, 3))
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+from flybys.events import CrossingEvents, EventsWriter, read_events
+
+
+@pytest.fixture
+def events():
+    data = np.zeros(3, dtype=CrossingEvents.dtype)
+    data['flyby'] = [1, 0, 0]
+    data['body'] = 'MERCURY'
+    data['boundary'] = ['bowshock', 'magnetopause', 'bowshock']
+    data['model'] = ['winslow', 'korth', 'winslow']
+    data['crossing'] = ['exit', 'entry', 'entry']
+    data['et'] = [686406754.477, 686402259.14, 686401641.8843794]
+    data['utc'] = ['2021-10-02T00:31:24.477', '2021-10-01T23:16:30.140', '2021-10-01T23:06:12.702379417']
+    data['position'] = np.arange(9.).reshape(3, 3) / 7.
+    return CrossingEvents(data)
+
+
+def test_columns(events):
+    assert events.to_numpy() is events.data
+    assert events['utc'][2] == '2021-10-01T23:06:12.702379417'
+    columns = events.columns()
+    assert np.shares_memory(columns['x'], events.data) and (columns['z'] == events['position'][:, 2]).all()
+    assert list(events.sort()['et']) == sorted(events['et'][1:]) + [events['et'][0]]
+    assert len(CrossingEvents.concatenate([events, events[:1]])) == 4
+
+
+def test_write_csv(events, tmp_path):
+    events.write(str(tmp_path / 'events.csv'))
+    assert read_events(str(tmp_path / 'events.csv')) == events
+
+    with EventsWriter(str(tmp_path / 'batches.csv')) as writer:
+        writer.write(events[:1])
+        writer.write(CrossingEvents())
+        writer.write(events[1:])
+    assert writer.count == 3 and read_events(str(tmp_path / 'batches.csv')) == events
+    pytest.raises(ValueError, EventsWriter, str(tmp_path / 'events.txt'))
+
+
+def test_write_parquet(events, tmp_path):
+    pytest.importorskip('pyarrow')
+    for file in ('events.parquet', 'events.arrow'):
+        events.write(str(tmp_path / file))
+        assert read_events(str(tmp_path / file)) == events
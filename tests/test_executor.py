@@ -0,0 +1,17 @@
+import asyncio
+import numpy as np
+import pytest
+from flybys.executor import SpiceExecutor
+
+
+def test_executor(metakernel):
+    with SpiceExecutor(metakernel, 3) as executor:
+        assert len(executor._executor._processes) == 3
+        assert executor.submit('body_radius', 'VENUS').result() == 6051.8
+        assert list(executor.map('body_radius', ['VENUS', 'MERCURY'])) == [6051.8, 2439.7]
+        pytest.raises(ValueError, executor.submit, 'clear')
+
+        async def query():
+            return await asyncio.gather(*[executor.call('utc2et', utc) for utc in ['2021-08-10T13:51:54'] * 4])
+
+        assert np.allclose(asyncio.run(query()), 681875583.1830401)
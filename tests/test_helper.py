@@ -10,3 +10,67 @@ def test_find_switch():
     condition = np.array([False, False, False, True, True, True, False, True, False, False, True])
     positive, negative = find_switch(condition)
     assert (positive == np.array([3, 7, 10])).all() and (negative == np.array([6, 8])).all()
+
+
+def test_find_switch_rows():
+    condition = np.array([[False, True, True, False, True],
+                          [True, True, False, False, True]])
+    out = np.empty((2, 4), dtype=bool)
+    (positive_row, positive), (negative_row, negative) = find_switch(condition, out=out)
+    assert (positive_row == [0, 0, 1]).all() and (positive == [1, 4, 4]).all()
+    assert (negative_row == [0, 1]).all() and (negative == [3, 2]).all()
+    assert (out == (condition[:, 1:] != condition[:, :-1])).all()
+
+    # along the first axis, same as the transposed array
+    (positive_col, positive_row), _ = find_switch(condition.T, axis=0)
+    assert (positive_row == [0, 0, 1]).all() and (positive_col == [1, 4, 4]).all()
+
+    # 1d results are unchanged by the output buffer
+    positive, negative = find_switch(condition[0], out=np.empty(4, dtype=bool))
+    assert (positive == [1, 4]).all() and (negative == [3]).all()
+
+
+def test_find_transitions():
+    def condition(tt):
+        return np.sin(tt / 1000.) > 0.5
+
+    positive, negative = find_transitions(condition, 0., 10000., 60., 1e-3)
+    assert np.allclose(positive, 1000. * np.array([np.pi / 6, 2 * np.pi + np.pi / 6]), atol=1e-3)
+    assert np.allclose(negative, 1000. * np.array([5 * np.pi / 6, 2 * np.pi + 5 * np.pi / 6]), atol=1e-3)
+    assert (condition(positive)).all() and (~condition(negative)).all()
+
+    # a unit step and tolerance match find_switch on the sampled condition
+    tt = np.arange(0., 10000.)
+    positive, negative = find_transitions(condition, 0., 9999., 1, 1)
+    _positive, _negative = find_switch(condition(tt))
+    assert (positive == tt[_positive]).all() and (negative == tt[_negative]).all()
+
+
+def test_find_transitions_rows():
+    def condition(tt):
+        return np.sin(tt / 1000.) > np.array([[0.5], [-0.5]])
+
+    transitions = find_transitions(condition, 0., 10000., 60., 1e-3)
+    assert len(transitions) == 2
+    assert np.allclose(transitions[0][0], find_transitions(lambda tt: condition(tt)[0], 0., 10000., 60., 1e-3)[0])
+    assert np.allclose(transitions[1][1], 1000. * np.array([7 * np.pi / 6, 2 * np.pi + 7 * np.pi / 6]), atol=1e-3)
+
+
+def test_stream_transitions():
+    def condition(tt):
+        return np.sin(tt / 1000.) > np.array([[0.5], [-0.5]])
+
+    transitions = find_transitions(condition, 0., 10000., 60., 1e-3)
+    # chunks of a single sample, an edge right at a switch bracket, and a single chunk
+    for chunk_size in (1, 9, 10000):
+        events = list(stream_transitions(condition, 0., 10000., 60., 1e-3, chunk_size))
+        assert [et for _, et, _ in events] == sorted(et for _, et, _ in events)
+        for i, (positive, negative) in enumerate(transitions):
+            assert np.array_equal([et for row, et, value in events if row == i and value], positive)
+            assert np.array_equal([et for row, et, value in events if row == i and not value], negative)
+
+
+def test_crossing_precision():
+    assert crossing_precision('grid', 0.001) == 0
+    assert crossing_precision('adaptive', 0.001) == 3
+    assert crossing_precision('gf', 1e-12) == 9
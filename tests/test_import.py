@@ -0,0 +1,30 @@
+import subprocess
+import sys
+import os.path as path
+import flybys
+
+
+def _modules(code):
+    """Returns the modules loaded after running some code in a fresh interpreter.
+    """
+    code += '; import sys; print(" ".join(sys.modules))'
+    root = path.dirname(path.dirname(path.abspath(__file__)))
+    return subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True,
+                          cwd=root).stdout.split()
+
+
+def test_lazy_import():
+    assert 'spiceypy' not in _modules('import flybys')
+    assert 'spiceypy' not in _modules('from flybys.quaternion import Quaternion')
+    assert 'spiceypy' not in _modules('from flybys import boundaries, profiling, solarwind, events')
+    assert 'numpy' not in _modules('import flybys')
+    assert 'spiceypy' in _modules('from flybys import venus_crossings')
+
+
+def test_public_names():
+    namespace = {}
+    exec('from flybys import *', namespace)
+    assert sorted(name for name in namespace if not name.startswith('__')) == sorted(flybys.__all__)
+    assert 'Spice' not in namespace and 'np' not in namespace
+    assert flybys.mercury_crossings is flybys.mercury.mercury_crossings
+    assert set(flybys.__all__) <= set(dir(flybys))
@@ -0,0 +1,35 @@
+import os.path as path
+import numpy as np
+import spiceypy
+from flybys.spice import Spice
+from flybys.leapseconds import LeapSeconds
+
+
+lsk = path.join(path.dirname(path.abspath(__file__)), 'data/kernels/lsk/naif0012.tls')
+
+
+def test_from_kernel():
+    leapseconds = LeapSeconds.from_kernel(lsk)
+    assert leapseconds.delta_t_a == 32.184 and leapseconds.k == 1.657e-3
+    assert leapseconds.delta_at[0] == 10 and leapseconds.delta_at[-1] == 37
+    assert leapseconds.epochs[0] == -883656000.  # 1972-01-01T00:00:00
+
+
+def test_et2utc(metakernel):
+    leapseconds = LeapSeconds.from_kernel(lsk)
+    et = np.concatenate((np.linspace(-1e9, 1e9, 2001),
+                         504878467.1839 + np.linspace(-2., 3., 501)))  # around the 2016-12-31 leap second
+    with Spice.session(metakernel):
+        for precision in (0, 1, 3):
+            assert (leapseconds.et2utc(et, precision) == spiceypy.et2utc(et, 'ISOC', precision)).all()
+            assert leapseconds.et2utc(et[0], precision) == spiceypy.et2utc(et[0], 'ISOC', precision)
+        assert Spice.leapseconds().et2utc(et[-1], 3) == spiceypy.et2utc(et[-1], 'ISOC', 3)
+
+
+def test_utc2et(metakernel):
+    leapseconds = LeapSeconds.from_kernel(lsk)
+    utc = ['1968-01-01T00:00:00', '2000-01-01T12:00:00', '2016-12-31T23:59:60.500', '2021-08-10T13:51:54.123']
+    with Spice.session(metakernel):
+        assert np.allclose(leapseconds.utc2et(utc), [spiceypy.utc2et(u) for u in utc], rtol=0, atol=1e-6)
+    assert leapseconds.utc2et(np.datetime64('2000-01-01T12:00:00')) == leapseconds.utc2et('2000-01-01T12:00:00')
+    assert leapseconds.et2datetime(leapseconds.utc2et('2016-12-31T23:59:60.5')) == np.datetime64('2017-01-01')
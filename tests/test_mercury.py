@@ -0,0 +1,21 @@
+import numpy as np
+from flybys.events import CrossingEvents
+from flybys.venus import venus_bowshock_crossings
+from flybys.mercury import mercury_bowshock_crossings, mercury_magnetopause_crossings
+from benchmarks.kernels import flyby_schedule
+
+
+def test_single_model_events(synthetic_kernels):
+    metakernel = synthetic_kernels(2)
+    for function, flyby, boundary, model in ((venus_bowshock_crossings, 0, 'bowshock', 'martinecz'),
+                                             (mercury_bowshock_crossings, 1, 'bowshock', 'winslow'),
+                                             (mercury_magnetopause_crossings, 1, 'magnetopause', 'korth')):
+        center = np.datetime64(flyby_schedule(2)[flyby][1])
+        utc_start, utc_end = str(center - np.timedelta64(1, 'D')), str(center + np.timedelta64(1, 'D'))
+        events = function(metakernel, utc_start, utc_end, method='adaptive', events=True)
+        assert isinstance(events, CrossingEvents)
+        assert set(zip(events['boundary'], events['model'])) == {(boundary, model)}
+
+        entries, exits = function(metakernel, utc_start, utc_end, method='adaptive')
+        assert list(events['utc'][events['crossing'] == 'entry']) == list(entries)
+        assert list(events['utc'][events['crossing'] == 'exit']) == list(exits)
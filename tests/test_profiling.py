@@ -0,0 +1,56 @@
+import json
+import logging
+import numpy as np
+from flybys import profiling
+from flybys.spice import Spice
+
+
+def test_stages_disabled():
+    assert not profiling.enabled()
+    with profiling.stage('ephemeris', 10) as stage:
+        profiling.count('spkpos')
+        array = np.zeros(3)
+        assert stage.output(array) is array
+    assert stage is profiling.stage('boundary')
+
+
+def test_stages_nested():
+    with profiling.profile(profiling.MemorySink()) as sink:
+        with profiling.stage('search'):
+            for _ in range(2):
+                with profiling.stage('ephemeris', 100) as stage:
+                    profiling.count('spkpos')
+                    stage.output(np.zeros((100, 3)))
+            profiling.count('gfdist')
+    assert not profiling.enabled()
+
+    assert [r['path'] for r in sink.records] == ['search/ephemeris', 'search/ephemeris', 'search']
+    totals = sink.totals()
+    assert totals['ephemeris']['count'] == 2
+    assert totals['ephemeris']['samples'] == 200
+    assert totals['ephemeris']['bytes'] == 4800
+    assert totals['search']['spice_calls'] == {'spkpos': 2, 'gfdist': 1}
+    assert totals['search']['seconds'] >= totals['ephemeris']['seconds']
+
+
+def test_sinks(tmp_path, caplog):
+    file = str(tmp_path / 'profile.jsonl')
+    with profiling.JsonLinesSink(file) as sink, profiling.profile(sink):
+        with profiling.profile(profiling.LoggingSink(level=logging.INFO)):
+            with caplog.at_level(logging.INFO, logger='flybys.profiling'):
+                with profiling.stage('format', 2):
+                    profiling.count('et2utc', 2)
+
+    with open(file) as lines:
+        records = [json.loads(line) for line in lines]
+    assert len(records) == 1
+    assert records[0]['stage'] == 'format' and records[0]['spice_calls'] == {'et2utc': 2}
+    assert 'format' in caplog.text and 'et2utc' in caplog.text
+
+
+def test_spice_calls(metakernel):
+    with Spice.session(metakernel) as spice, profiling.profile(profiling.MemorySink()) as sink:
+        with profiling.stage('conversion'):
+            spice.et2utc(spice.utc2et('2021-08-10T13:51:54'))
+    assert sink.totals()['conversion']['spice_calls'] == {'utc2et': 1, 'et2utc': 1}
+    Spice.evict()
@@ -1,7 +1,7 @@
 import pytest
 import math
 import numpy as np
-from flybys.quaternion import Quaternion
+from flybys.quaternion import Quaternion, QuaternionArray
 
 
 def test_init():
@@ -105,3 +105,71 @@ def test_format():
     q = Quaternion()
     assert q.__format__('+.3f') == '+0.000 +0.000i +0.000j +0.000k'
 
+
+def test_rotate_input_types():
+    q = Quaternion([1, 4, 4, -4])
+    q_copy = Quaternion(q.q)
+    vv = np.array([[2.5, -1, 0.3], [0, 7, -2], [1e3, 2e-3, 5]])
+    rotated = q.rotate(vv)
+    assert q == q_copy
+    assert np.array_equal(q.rotate(vv.tolist()), rotated)
+    assert np.array_equal(q.rotate(tuple(vv[1])), rotated[1:2])
+    assert Quaternion._rotate_vector(tuple(vv[1]), q) == tuple(rotated[1])
+    assert Quaternion._rotate_vector(list(vv[2]), q) == list(rotated[2])
+    assert q == q_copy
+
+    # same result as the Hamilton product q * v * q^-1
+    q.normalize()
+    for v, vr in zip(vv, rotated):
+        p = Quaternion.multiply(Quaternion.multiply(q, Quaternion(np.hstack((0, v)))), q.inverse())
+        assert np.allclose(p.vector(), vr, rtol=1e-14, atol=1e-12)
+
+
+def test_array_init():
+    qa = QuaternionArray([Quaternion([1, 0, 0, 0]), Quaternion([0, 1, 0, 0])])
+    assert qa.q.shape == (2, 4) and qa.q.flags['C_CONTIGUOUS']
+    assert qa[1] == Quaternion([0., 1., 0., 0.])
+    assert qa[:1] == QuaternionArray([[1., 0., 0., 0.]])
+    pytest.raises(TypeError, QuaternionArray, np.zeros((3, 3)))
+
+    m = np.array([[[0, 0, 1], [0, 1, 0], [-1, 0, 0]], np.eye(3), np.diag([1, -1, -1]), np.diag([-1, -1, 1])])
+    qa = QuaternionArray(matrix=m)
+    for i in range(len(m)):
+        assert np.allclose(qa[i].q, Quaternion(matrix=m[i]).q)
+
+    axis = [[2, 0, 0], [1 / math.sqrt(2), 0, 1 / math.sqrt(2)]]
+    qa = QuaternionArray(axis=axis, degrees=[180, 90])
+    assert np.allclose(qa[0].q, Quaternion(axis=axis[0], degrees=180).q)
+    assert np.allclose(qa[1].q, Quaternion(axis=axis[1], degrees=90).q)
+
+
+def test_array_operations():
+    q1 = Quaternion([2, -2, 3, -4])
+    q2 = Quaternion([1, -2, 5, -6])
+    qa = QuaternionArray([q1, q2])
+    assert QuaternionArray.multiply(qa, QuaternionArray([q2, q1])) == \
+        QuaternionArray([Quaternion.multiply(q1, q2), Quaternion.multiply(q2, q1)])
+    assert Quaternion.multiply(q1, qa) == QuaternionArray([Quaternion.multiply(q1, q1), Quaternion.multiply(q1, q2)])
+    assert qa.conjugate() == QuaternionArray([q1.conjugate(), q2.conjugate()])
+    assert np.allclose(qa.inverse().q, [q1.inverse().q, q2.inverse().q])
+
+    qa.normalize()
+    q1.normalize()
+    assert np.allclose(qa[0].q, q1.q)
+
+    vv = np.array([[1, 2, 3], [-4, 5, 0.5]])
+    assert np.allclose(qa.rotate(vv), [qa[0].rotate(vv[0])[0], qa[1].rotate(vv[1])[0]])
+    assert np.allclose(qa.rotate(vv[0]), [qa[0].rotate(vv[0])[0], qa[1].rotate(vv[0])[0]])
+
+
+def test_array_slerp():
+    qa = QuaternionArray(axis=[0, 0, 1], degrees=[0, 90])
+    qi = QuaternionArray.slerp(qa[0], qa[1], [0, 0.5, 1])
+    assert np.allclose(qi.q, QuaternionArray(axis=[0, 0, 1], degrees=[0, 45, 90]).q)
+
+    qi = qa.interpolate([0., 60.], [15., 30.])
+    assert np.allclose(qi.q, QuaternionArray(axis=[0, 0, 1], degrees=[22.5, 45]).q)
+
+    # shortest path is taken regardless of the sign of the quaternions
+    qi = QuaternionArray.slerp(qa[0], Quaternion(-qa[1].q), 0.5)
+    assert np.allclose(qi.rotate([1, 0, 0]), [[math.sqrt(2) / 2, math.sqrt(2) / 2, 0]])
@@ -0,0 +1,76 @@
+import numpy as np
+import pytest
+from flybys.spice import Spice
+from flybys.quaternion import Quaternion
+from flybys.solarwind import SolarWind, aberrate, reference_pressures
+from flybys.venus import venus_crossings
+from flybys.mercury import mercury_crossings
+from benchmarks.kernels import generate, flyby_schedule
+
+
+def test_aberrate():
+    vv = np.random.default_rng(2).normal(size=(10, 3))
+    q = Quaternion(axis=np.array([0, 0, 1]), degrees=-5).inverse()
+    np.testing.assert_allclose(aberrate(vv, np.radians(-5)), np.array([q.rotate(v) for v in vv]).reshape((-1, 3)),
+                               atol=1e-12)
+
+    angles = np.radians(np.linspace(-10, 0, 10))
+    expected = [Quaternion(axis=np.array([0, 0, 1]), degrees=np.degrees(a)).inverse().rotate(v)
+                for v, a in zip(vv, angles)]
+    np.testing.assert_allclose(aberrate(vv, angles), np.reshape(expected, (-1, 3)), atol=1e-12)
+
+
+def test_solar_wind():
+    wind = SolarWind([0., 100.], velocity=[400., 600.], pressure=[13.4, 13.4 * 64])
+    np.testing.assert_allclose(wind.aberration(None, [-50., 50., 150.], 47.), -np.arctan2(47., [400., 500., 600.]))
+    np.testing.assert_allclose(wind.scale(None, [0., 100.], 'MERCURY'), [1., 0.5])
+    assert SolarWind([0.], velocity=[400.]).scale(None, [0.], 'MERCURY') is None
+
+    pytest.raises(ValueError, SolarWind, [0., 100.])
+    pytest.raises(ValueError, SolarWind, [0., 100.], velocity=[400.])
+    pytest.raises(ValueError, SolarWind, [100., 0.], velocity=[400., 400.])
+
+
+def test_solar_wind_file(tmp_path, metakernel):
+    file = tmp_path / 'wind.csv'
+    file.write_text('utc,velocity,pressure\n2021-08-10T00:00:00,400,4\n2021-08-11T00:00:00,500,5\n')
+    wind = SolarWind.from_file(str(file))
+    with Spice.session(metakernel) as spice:
+        et = spice.utc2et('2021-08-10T12:00:00')
+        np.testing.assert_allclose(wind.epochs(spice), [spice.utc2et('2021-08-10T00:00:00'),
+                                                    spice.utc2et('2021-08-11T00:00:00')])
+        np.testing.assert_allclose(wind.aberration(spice, [et], 35.), -np.arctan2(35., [450.]))
+        np.testing.assert_allclose(wind.scale(spice, [et], 'venus'), (4.5 / reference_pressures['VENUS']) ** (-1 / 6))
+    Spice.evict()
+    pytest.raises(ValueError, SolarWind.from_file, str(file), time='epoch')
+
+
+def test_dynamic_boundaries(tmp_path):
+    metakernel = generate(str(tmp_path), 2)
+    try:
+        for (body, utc), function in zip(flyby_schedule(2), (venus_crossings, mercury_crossings)):
+            center = np.datetime64(utc)
+            window = str(center - np.timedelta64(2, 'D')), str(center + np.timedelta64(2, 'D'))
+            static = function(metakernel, *window, method='adaptive', events=True)
+            times = [str(center - np.timedelta64(3, 'D')), str(center + np.timedelta64(3, 'D'))]
+
+            # at the reference pressure boundaries keep their size, and compress at higher pressures
+            reference = SolarWind(times, pressure=[reference_pressures[body]] * 2)
+            assert function(metakernel, *window, method='adaptive', events=True, solar_wind=reference) == static
+            compressed = SolarWind(times, pressure=[reference_pressures[body] * 64] * 2)
+            events = function(metakernel, *window, method='adaptive', events=True, solar_wind=compressed)
+            assert len(events) == len(static)
+            inbound = static['crossing'] == 'entry'
+            assert np.all(events['et'][inbound] > static['et'][inbound])
+            assert np.all(events['et'][~inbound] < static['et'][~inbound])
+
+            # a slower solar wind tilts the flow further
+            fast = function(metakernel, *window, method='adaptive', events=True, aberration=True,
+                            solar_wind=SolarWind(times, velocity=[800., 800.]))
+            slow = function(metakernel, *window, method='adaptive', events=True, aberration=True,
+                            solar_wind=SolarWind(times, velocity=[200., 200.]))
+            assert len(fast) == len(slow) == len(static)
+            assert not np.array_equal(fast['et'], slow['et'])
+    finally:
+        Spice.evict()
+        Spice.distance_indexes.clear()
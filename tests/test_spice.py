@@ -1,5 +1,9 @@
 import pytest
+import os
+import shutil
 import numpy as np
+import spiceypy
+from flybys.spice import Spice, KernelSession
 
 
 def test_version(spice):
@@ -33,3 +37,67 @@ def test_closest_approach(spice):
     et = spice.closest_approach('MPO', 'VENUS', '2021-08-09T14:00:00', '2021-08-11T14:00:00', False, 100)[0]
     assert et == 681875582.8367949
 
+
+
+def test_kernel_session(metakernel):
+    session = KernelSession(metakernel)
+    with session as spice:
+        with session:
+            assert session.references == 2 and spiceypy.ktotal('ALL') == 3
+        assert spice.body_radius('MERCURY') == 2439.7
+    assert session.references == 0 and not session.loaded and spiceypy.ktotal('ALL') == 0
+
+
+def test_session_registry(metakernel, tmp_path):
+    with Spice.session(metakernel):
+        pass
+    session = Spice.session(metakernel)
+    assert session.loaded and session.references == 0 and spiceypy.ktotal('ALL') == 3
+
+    # sessions are evicted when switching metakernels
+    other = tmp_path / 'other.tm'
+    other.write_text(open(metakernel).read())
+    with Spice.session(str(other)):
+        assert not session.loaded and spiceypy.ktotal('ALL') == 3
+
+    Spice.evict()
+    assert spiceypy.ktotal('ALL') == 0
+
+
+def test_load_relative_metakernel(tmp_path):
+    kernels = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data/kernels')
+    for k in ['lsk/naif0012.tls', 'pck/pck00010.tpc']:
+        (tmp_path / os.path.dirname(k)).mkdir()
+        shutil.copy(os.path.join(kernels, k), str(tmp_path / k))
+    (tmp_path / 'mk').mkdir()
+    metakernel = tmp_path / 'mk' / 'relative.tm'
+    metakernel.write_text("KPL/MK\n"
+                          "\\begindata\n"
+                          "PATH_VALUES = ( '..' '../lsk' )\n"
+                          "PATH_SYMBOLS = ( 'KERNELS' 'LSK' )\n"
+                          "KERNELS_TO_LOAD = ( '$LSK/naif0012.tls'\n"
+                          "                    '$KERNELS/pck/pck+'\n"
+                          "                    '00010.tpc' )\n"
+                          "\\begintext\n")
+    Spice.clear()
+
+    loaded = Spice.load_metakernel(str(metakernel))
+    assert spiceypy.ktotal('ALL') == 3
+    assert Spice.load_metakernel(str(metakernel)) == loaded
+    Spice.clear()
+
+    loaded = Spice.load_metakernel(str(metakernel), in_memory=True)
+    assert loaded == [str(tmp_path / 'lsk/naif0012.tls'), str(tmp_path / 'pck/pck00010.tpc')]
+    assert spiceypy.ktotal('ALL') == 2
+    Spice.unload(loaded)
+    assert spiceypy.ktotal('ALL') == 0
+
+
+def test_condition_window():
+    def condition(tt):
+        return np.sin(tt / 1000.) > 0.5
+
+    window = Spice.condition_window(condition, 0., 10000., 60., 1e-3)
+    intervals = Spice.window_intervals(window)
+    expected = 1000. * np.array([[np.pi / 6, 5 * np.pi / 6], [2 * np.pi + np.pi / 6, 2 * np.pi + 5 * np.pi / 6]])
+    assert np.allclose(intervals, expected, atol=1e-3)
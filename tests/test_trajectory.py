@@ -0,0 +1,41 @@
+import numpy as np
+import pytest
+from flybys.trajectory import Trajectory
+
+
+class _Orbit:
+    """Circular orbit of radius 3000 km and period 2 hours.
+    """
+    w = 2 * np.pi / 7200.
+
+    def position(self, target, et, frame, observer):
+        et = np.atleast_1d(et)
+        return 3000. * np.column_stack((np.cos(self.w * et), np.sin(self.w * et), np.zeros_like(et)))
+
+    def state(self, target, et, frame, observer):
+        et = np.atleast_1d(et)
+        velocity = 3000. * self.w * np.column_stack((-np.sin(self.w * et), np.cos(self.w * et), np.zeros_like(et)))
+        return self.position(target, et, frame, observer), velocity
+
+
+def test_trajectory_position():
+    orbit = _Orbit()
+    trajectory = Trajectory(orbit, 'MPO', 0., 3600., 'J2000', 'VENUS', 60.)
+    et = np.linspace(0., 3600., 1001)
+    error = np.linalg.norm(trajectory.position(et) - orbit.position('MPO', et, 'J2000', 'VENUS'), axis=1)
+    assert error.max() < 1e-3
+    assert error.max() <= trajectory.error * 1.01
+    np.testing.assert_allclose(trajectory.position(trajectory.nodes), trajectory.positions, atol=1e-9)
+
+
+def test_trajectory_error_bound():
+    orbit = _Orbit()
+    coarse = Trajectory(orbit, 'MPO', 0., 3600., 'J2000', 'VENUS', 600.)
+    fine = Trajectory(orbit, 'MPO', 0., 3600., 'J2000', 'VENUS', 60.)
+    assert fine.error < coarse.error
+
+
+def test_trajectory_out_of_span():
+    trajectory = Trajectory(_Orbit(), 'MPO', 0., 3600., 'J2000', 'VENUS', 60.)
+    with pytest.raises(ValueError):
+        trajectory.position([3601.])
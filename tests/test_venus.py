@@ -0,0 +1,45 @@
+import numpy as np
+from flybys.venus import _vso_rotation, _vso_rotations
+
+
+class _SunState:
+    """Circular heliocentric orbit of Venus with a year of 225 days, enough to exercise the VSO frame.
+    """
+
+    def state(self, target, et, frame, observer):
+        et = np.atleast_1d(np.asarray(et, dtype=float))
+        phase = 2 * np.pi * et / (225 * 86400.)
+        rs = 1.08e8 * np.column_stack((np.cos(phase), np.sin(phase), 0.05 * np.ones_like(phase)))
+        vs = 35. * np.column_stack((-np.sin(phase), np.cos(phase), np.zeros_like(phase)))
+        if len(et) == 1:
+            return rs[0], vs[0]
+        return rs, vs
+
+
+def test_vso_rotations_match_single_epoch():
+    spice = _SunState()
+    et = np.array([0., 3600., 86400.])
+    vv = np.array([[1., 2., 3.]] * len(et))
+    for aberration in (False, True):
+        rotated = _vso_rotations(spice, et, aberration).rotate(vv)
+        for i, t in enumerate(et):
+            np.testing.assert_allclose(rotated[i], _vso_rotation(spice, t, aberration).rotate(vv[i])[0], atol=1e-12)
+
+
+def test_vso_rotations_sun_along_x():
+    spice = _SunState()
+    et = np.linspace(0., 10 * 86400., 5)
+    rs, _ = spice.state('SUN', et, 'J2000', 'VENUS')
+    rotated = _vso_rotations(spice, et, False).rotate(rs)
+    np.testing.assert_allclose(rotated[:, 1:], 0., atol=1e-6 * np.linalg.norm(rs[0]))
+    assert np.all(rotated[:, 0] > 0)
+
+
+def test_vso_rotations_interpolated():
+    spice = _SunState()
+    nodes = np.arange(0., 7201., 600.)
+    et = np.linspace(0., 7200., 97)
+    vv = np.array([[1., 2., 3.]] * len(et))
+    exact = _vso_rotations(spice, et, True).rotate(vv)
+    interpolated = _vso_rotations(spice, nodes, True).interpolate(nodes, et).rotate(vv)
+    np.testing.assert_allclose(interpolated, exact, atol=1e-9)